@@ -0,0 +1,268 @@
+"""
+缩小的 alpha 遮罩
+渲染线程每隔 config.ALPHA_MASK_INTERVAL 帧把帧缓冲区缩小到遮罩分辨率（glBlitFramebuffer），
+再经两个 PBO 交替异步回读 alpha 通道；鼠标事件、点击穿透区域和 POST /model/hit_pixel 都只读取缓存的遮罩，
+不访问 GL 线程。遮罩比画面最多落后 2 * ALPHA_MASK_INTERVAL 帧
+"""
+import ctypes
+import sys
+import time
+
+import numpy as np
+
+from config import config
+from log_utils import get_logger, throttle
+
+try:
+    import OpenGL.GL as gl
+    GL_AVAILABLE = True
+except ImportError:
+    gl = None
+    GL_AVAILABLE = False
+
+logger = get_logger('遮罩')
+
+
+class MaskSnapshot:
+    """一次回读得到的遮罩（只读，整体替换）"""
+    __slots__ = ('alpha', 'width', 'height', 'frame', 'captured_at')
+
+    def __init__(self, alpha, width, height, frame):
+        self.alpha = alpha          # uint8 数组，形状 (遮罩高, 遮罩宽)，第 0 行为窗口顶部
+        self.width = width          # 对应的窗口逻辑宽高
+        self.height = height
+        self.frame = frame
+        self.captured_at = time.time()
+
+    def alpha_at(self, x, y):
+        """窗口坐标处的 alpha（0-1），超出窗口返回 0"""
+        if x < 0 or y < 0 or x >= self.width or y >= self.height:
+            return 0.0
+        mask_h, mask_w = self.alpha.shape
+        return int(self.alpha[int(y * mask_h / self.height), int(x * mask_w / self.width)]) / 255.0
+
+    def opaque_runs(self, threshold):
+        """按行列出不透明区间 (x, y, 宽, 高)，坐标为窗口像素"""
+        mask_h, mask_w = self.alpha.shape
+        opaque = self.alpha >= int(threshold * 255)
+        scale_x = self.width / mask_w
+        scale_y = self.height / mask_h
+        # 每行前后补 0，差分得到区间起止
+        padded = np.zeros((mask_h, mask_w + 2), dtype=np.int8)
+        padded[:, 1:-1] = opaque
+        edges = np.diff(padded, axis=1)
+        rows, starts = np.nonzero(edges == 1)
+        _, ends = np.nonzero(edges == -1)
+        runs = []
+        for row, start, end in zip(rows.tolist(), starts.tolist(), ends.tolist()):
+            x0 = int(start * scale_x)
+            y0 = int(row * scale_y)
+            runs.append((x0, y0, int(np.ceil(end * scale_x)) - x0, int(np.ceil((row + 1) * scale_y)) - y0))
+        return runs
+
+
+class AlphaMask:
+    """在渲染线程上异步回读缩小的 alpha 遮罩"""
+
+    def __init__(self):
+        self.enabled = config.ALPHA_MASK_ENABLED and GL_AVAILABLE
+        self.snapshot = None   # 最新的 MaskSnapshot，读者直接取引用，无需加锁
+        self.captures = 0
+        self.errors = 0
+        self.last_readback_ms = 0.0
+
+        self._frame = 0
+        self._fbo = None
+        self._renderbuffer = None
+        self._size = None        # (遮罩宽, 遮罩高)
+        self._pbos = None
+        self._pbo_index = 0
+        self._pending = [None, None]   # 每个 PBO 中尚未取出的遮罩 (帧号, 窗口宽, 窗口高)
+
+    def capture(self, source_fbo, fb_width, fb_height, window_width, window_height):
+        """每隔若干帧回读一次；返回本次是否得到了新的遮罩（需在渲染线程、绘制完成后调用）"""
+        if not self.enabled or fb_width <= 0 or fb_height <= 0:
+            return False
+        self._frame += 1
+        if self._frame % max(1, config.ALPHA_MASK_INTERVAL):
+            return False
+        start = time.perf_counter()
+        try:
+            updated = self._capture(source_fbo, fb_width, fb_height, window_width, window_height)
+        except Exception as e:
+            self.errors += 1
+            logger.error("遮罩回读失败: %s", e, extra=throttle("alpha_mask"))
+            updated = False
+        finally:
+            gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, 0)
+            gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, source_fbo)
+        self.last_readback_ms = (time.perf_counter() - start) * 1000.0
+        return updated
+
+    def _capture(self, source_fbo, fb_width, fb_height, window_width, window_height):
+        scale = config.ALPHA_MASK_SCALE
+        size = (max(1, int(fb_width * scale)), max(1, int(fb_height * scale)))
+        if size != self._size:
+            self._release()
+            self._create(size)
+        mask_w, mask_h = size
+
+        # 在 GPU 上缩小到遮罩分辨率
+        gl.glBindFramebuffer(gl.GL_READ_FRAMEBUFFER, source_fbo)
+        gl.glBindFramebuffer(gl.GL_DRAW_FRAMEBUFFER, self._fbo)
+        gl.glBlitFramebuffer(0, 0, fb_width, fb_height, 0, 0, mask_w, mask_h,
+                             gl.GL_COLOR_BUFFER_BIT, gl.GL_LINEAR)
+
+        # 发起异步回读
+        current = self._pbo_index
+        previous = 1 - current
+        gl.glBindFramebuffer(gl.GL_READ_FRAMEBUFFER, self._fbo)
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, self._pbos[current])
+        gl.glPixelStorei(gl.GL_PACK_ALIGNMENT, 4)
+        gl.glReadPixels(0, 0, mask_w, mask_h, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        self._pending[current] = (self._frame, window_width, window_height)
+        self._pbo_index = previous
+
+        # 取出上一次回读的结果
+        pending = self._pending[previous]
+        if pending is None:
+            return False
+        self._pending[previous] = None
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, self._pbos[previous])
+        address = gl.glMapBuffer(gl.GL_PIXEL_PACK_BUFFER, gl.GL_READ_ONLY)
+        if not address:
+            return False
+        try:
+            address = ctypes.cast(address, ctypes.c_void_p).value
+            pixels = np.ctypeslib.as_array((ctypes.c_ubyte * (mask_w * mask_h * 4)).from_address(address))
+            # 取 alpha 通道并翻转为自上而下（复制后才能解除映射）
+            alpha = np.ascontiguousarray(pixels.reshape(mask_h, mask_w, 4)[::-1, :, 3])
+        finally:
+            gl.glUnmapBuffer(gl.GL_PIXEL_PACK_BUFFER)
+
+        frame, width, height = pending
+        self.snapshot = MaskSnapshot(alpha, width, height, frame)
+        self.captures += 1
+        return True
+
+    def _create(self, size):
+        mask_w, mask_h = size
+        self._renderbuffer = gl.glGenRenderbuffers(1)
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, self._renderbuffer)
+        gl.glRenderbufferStorage(gl.GL_RENDERBUFFER, gl.GL_RGBA8, mask_w, mask_h)
+        gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, 0)
+
+        self._fbo = gl.glGenFramebuffers(1)
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self._fbo)
+        gl.glFramebufferRenderbuffer(gl.GL_FRAMEBUFFER, gl.GL_COLOR_ATTACHMENT0,
+                                     gl.GL_RENDERBUFFER, self._renderbuffer)
+
+        self._pbos = list(gl.glGenBuffers(2))
+        for pbo in self._pbos:
+            gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, pbo)
+            gl.glBufferData(gl.GL_PIXEL_PACK_BUFFER, mask_w * mask_h * 4, None, gl.GL_STREAM_READ)
+        self._size = size
+        self._pbo_index = 0
+        self._pending = [None, None]
+
+    def _release(self):
+        if self._size is None:
+            return
+        try:
+            gl.glDeleteBuffers(2, self._pbos)
+            gl.glDeleteFramebuffers(1, [self._fbo])
+            gl.glDeleteRenderbuffers(1, [self._renderbuffer])
+        except Exception as e:
+            logger.warning("释放遮罩资源失败: %s", e)
+        self._fbo = self._renderbuffer = self._pbos = self._size = None
+
+    def hit(self, x, y, threshold=None):
+        """窗口坐标处是否为模型像素；尚无遮罩时返回 None"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+        if threshold is None:
+            threshold = config.MODEL_HIT_THRESHOLD
+        return snapshot.alpha_at(x, y) >= threshold
+
+    def get_stats(self):
+        snapshot = self.snapshot
+        return {
+            'enabled': self.enabled,
+            'available': GL_AVAILABLE,
+            'size': list(self._size) if self._size else None,
+            'interval_frames': config.ALPHA_MASK_INTERVAL,
+            'captures': self.captures,
+            'errors': self.errors,
+            'last_readback_ms': round(self.last_readback_ms, 3),
+            'frame': snapshot.frame if snapshot else None,
+            'age_ms': round((time.time() - snapshot.captured_at) * 1000.0, 1) if snapshot else None
+        }
+
+
+# X11 输入形状（XShape 扩展），只影响鼠标输入区域，不裁剪窗口绘制
+_SHAPE_INPUT = 2
+_SHAPE_SET = 0
+_UNSORTED = 0
+
+
+class _XRectangle(ctypes.Structure):
+    _fields_ = [('x', ctypes.c_short), ('y', ctypes.c_short),
+                ('width', ctypes.c_ushort), ('height', ctypes.c_ushort)]
+
+
+class X11InputShape:
+    """通过 XShapeCombineRectangles 设置窗口的输入区域（透明处鼠标穿透到下层窗口）"""
+
+    def __init__(self):
+        self._display = None
+        self._xext = None
+        self._x11 = None
+        self.available = sys.platform.startswith('linux')
+
+    def _open(self):
+        if self._display is not None:
+            return True
+        try:
+            self._x11 = ctypes.CDLL('libX11.so.6')
+            self._xext = ctypes.CDLL('libXext.so.6')
+            self._x11.XOpenDisplay.restype = ctypes.c_void_p
+            self._x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+            self._x11.XFlush.argtypes = [ctypes.c_void_p]
+            self._xext.XShapeCombineRectangles.argtypes = [
+                ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                ctypes.POINTER(_XRectangle), ctypes.c_int, ctypes.c_int, ctypes.c_int]
+            self._xext.XShapeCombineMask.argtypes = [
+                ctypes.c_void_p, ctypes.c_ulong, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+                ctypes.c_ulong, ctypes.c_int]
+            self._display = self._x11.XOpenDisplay(None)
+        except (OSError, AttributeError) as e:
+            logger.warning("XShape 不可用: %s", e)
+            self._display = None
+        if not self._display:
+            self.available = False
+            return False
+        return True
+
+    def set_region(self, window_id, rects):
+        """把输入区域设为给定矩形列表 [(x, y, 宽, 高)]"""
+        if not self.available or not self._open():
+            return False
+        array = (_XRectangle * len(rects))(*[_XRectangle(x, y, w, h) for x, y, w, h in rects])
+        self._xext.XShapeCombineRectangles(self._display, window_id, _SHAPE_INPUT, 0, 0,
+                                           array, len(rects), _SHAPE_SET, _UNSORTED)
+        self._x11.XFlush(self._display)
+        return True
+
+    def reset(self, window_id):
+        """恢复为整个窗口接收输入"""
+        if self._display is None:
+            return False
+        # 传入 None 位图表示取消输入形状
+        self._xext.XShapeCombineMask(self._display, window_id, _SHAPE_INPUT, 0, 0, 0, _SHAPE_SET)
+        self._x11.XFlush(self._display)
+        return True
+
+
+# 创建全局实例
+alpha_mask = AlphaMask()
@@ -0,0 +1,33 @@
+"""
+参数二进制编码
+所有数值均为小端序：
+- 稠密格式: 按参数索引顺序排列的 float32，NaN 表示保持不变
+- 索引格式: 连续的 (uint32 索引, float32 值) 记录
+其余非有限值（无穷大，以及索引格式中的 NaN）由写入方 set_parameters_by_index 拒绝
+"""
+import numpy as np
+
+VALUE_DTYPE = np.dtype('<f4')
+RECORD_DTYPE = np.dtype([('index', '<u4'), ('value', '<f4')])
+
+
+def encode_values(values):
+    """将参数值编码为小端 float32 字节串"""
+    return np.asarray(values, dtype=VALUE_DTYPE).tobytes()
+
+
+def decode_dense(payload, count):
+    """解码稠密格式，返回 (索引数组, 值数组)，跳过 NaN"""
+    if len(payload) != count * VALUE_DTYPE.itemsize:
+        raise ValueError(f'稠密格式长度应为 {count * VALUE_DTYPE.itemsize} 字节，实际 {len(payload)} 字节')
+    values = np.frombuffer(payload, dtype=VALUE_DTYPE)
+    indices = np.flatnonzero(~np.isnan(values))
+    return indices, values[indices].astype(np.float32)
+
+
+def decode_records(payload):
+    """解码索引格式，返回 (索引数组, 值数组)"""
+    if len(payload) % RECORD_DTYPE.itemsize:
+        raise ValueError(f'索引格式长度必须是 {RECORD_DTYPE.itemsize} 字节的整数倍')
+    records = np.frombuffer(payload, dtype=RECORD_DTYPE)
+    return records['index'].astype(np.intp), records['value'].astype(np.float32)
@@ -74,6 +74,8 @@ def check_all_dependencies():
     optional_dependencies = [
         ("PyOpenGL-accelerate", "OpenGL_accelerate", False),
         ("psutil", "psutil", False),
+        ("websockets", "websockets", False),
+        ("waitress", "waitress", False),
     ]
     
     all_good = True
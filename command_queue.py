@@ -0,0 +1,91 @@
+"""
+帧同步命令队列
+API 线程只负责入队，渲染线程在每帧开始时统一取出执行，保证所有原生模型调用都发生在持有 GL 上下文的线程上
+"""
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class CommandQueue:
+    """API 线程与渲染线程之间的命令队列"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._commands = []  # [(func, args, future)]
+        self._generation = None
+        self._values = np.zeros(0, dtype=np.float32)
+        self._pending = np.zeros(0, dtype=bool)
+        self._locking = np.zeros(0, dtype=bool)
+        self.listeners = []  # 入队回调，例如唤醒渲染循环
+
+    def reset(self, size, generation):
+        """按新的参数表重建参数写入缓冲区，旧参数表上的未处理写入全部丢弃"""
+        with self._lock:
+            self._generation = generation
+            self._values = np.zeros(size, dtype=np.float32)
+            self._pending = np.zeros(size, dtype=bool)
+            self._locking = np.zeros(size, dtype=bool)
+
+    def _notify(self):
+        for listener in self.listeners:
+            listener()
+
+    def submit(self, func, *args):
+        """排入一个在渲染线程执行的调用，返回 Future"""
+        future = Future()
+        with self._lock:
+            self._commands.append((func, args, future))
+        self._notify()
+        return future
+
+    def set_parameter(self, generation, index, value, lock=True):
+        """排入单个参数写入；同一帧内对同一参数的多次写入只保留最后一次"""
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._values[index] = value
+            self._pending[index] = True
+            self._locking[index] |= lock
+        self._notify()
+        return True
+
+    def set_parameters(self, generation, indices, values, lock=True):
+        """排入一组参数写入，在同一帧内整体生效"""
+        with self._lock:
+            if generation != self._generation:
+                return False
+            self._values[indices] = values
+            self._pending[indices] = True
+            self._locking[indices] |= lock
+        self._notify()
+        return True
+
+    @property
+    def pending_count(self):
+        with self._lock:
+            return len(self._commands) + int(np.count_nonzero(self._pending))
+
+    def drain(self):
+        """取出本帧所有命令和合并后的参数写入: (commands, indices, values, locking)"""
+        with self._lock:
+            commands = self._commands
+            self._commands = []
+            indices = np.flatnonzero(self._pending)
+            values = self._values[indices]
+            locking = self._locking[indices]
+            self._pending[indices] = False
+            self._locking[indices] = False
+        return commands, indices, values, locking
+
+    @staticmethod
+    def run(commands):
+        """执行取出的命令，并把结果或异常写回 Future"""
+        for func, args, future in commands:
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
@@ -12,20 +12,89 @@ class Config:
     
     # 渲染配置
     FPS = 60
+    IDLE_FPS = 15             # 模型无变化时的帧率（保留原生呼吸/眨眼）
+    HEARTBEAT_FPS = 1         # 窗口隐藏或无模型时的心跳帧率
+    ACTIVE_HOLD_TIME = 1.0    # 变化停止后继续满帧渲染的时间（秒），覆盖表情过渡
+    HEARTBEAT_DELAY = None    # 空闲超过该秒数后降为心跳帧率（会冻结呼吸动画），None 表示不启用
+    FRAME_TIMING_ENABLED = True   # 记录逐帧分阶段耗时（GET /debug/frames）
+    FRAME_TIMING_CAPACITY = 600   # 保留最近多少帧的计时
+    FRAME_RING_ENABLED = False    # 把每帧像素发布到共享内存帧环（GET /frames/ring 查询映射布局）
+    FRAME_RING_PATH = None        # 帧环映射文件，None 时按 API 端口命名（Linux 为 /dev/shm/live2d_frame_ring_<端口>，其余系统在 temp 目录）
+    FRAME_RING_SLOTS = 3          # 帧环槽位数
+    FRAME_ENCODER_WORKERS = 2     # PNG/JPEG 编码线程数（占满时视频流丢帧）
+    FRAME_STREAM_FPS = 15         # GET /stream.mjpeg 默认帧率
+    FRAME_STREAM_QUALITY = 80     # JPEG 质量
+    FRAME_STREAM_MAX_CLIENTS = 4  # 同时观看视频流的客户端上限
+    FRAME_PNG_COMPRESS_LEVEL = 1  # PNG 压缩级别（0-9，越低编码越快）
+    FRAME_JPEG_BACKGROUND = (1.0, 1.0, 1.0)  # JPEG 无透明通道，透明区域填充的背景色
+    FRAME_SNAPSHOT_TIMEOUT = 2.0  # 等待渲染出快照帧的超时时间（秒）
     BACKGROUND_COLOR = (0.0, 0.0, 0.0, 0.0)  # 透明背景
     
+    # 渲染模式: "window"（桌面窗口与托盘）或 "headless"（离屏渲染，无窗口，适用于无显示器的服务器）
+    RENDER_MODE = "window"
+    HEADLESS_QPA_PLATFORM = "offscreen"  # 无头模式使用的 Qt 平台插件（环境变量 QT_QPA_PLATFORM 优先）
+    HEADLESS_SOFTWARE_GL = False         # 无头模式强制使用软件 OpenGL，无 GPU 时开启（Windows: opengl32sw；Linux: 设置 LIBGL_ALWAYS_SOFTWARE=1 使用 Mesa llvmpipe）
+    
     # API配置
     API_HOST = "127.0.0.1"
     API_PORT = None  # 自动选择可用端口
     API_DEBUG = True
     
+    # API服务器后端: "werkzeug"（开发服务器，默认，便于调试）或 "waitress"（生产服务器）
+    API_SERVER_BACKEND = "werkzeug"
+    API_SERVER_THREADS = 8                 # 生产服务器工作线程数
+    API_SERVER_BACKLOG = 128               # 监听队列长度
+    API_SERVER_CONNECTION_LIMIT = 100      # 最大并发连接数
+    API_SERVER_KEEPALIVE_TIMEOUT = 120     # 空闲 keep-alive 连接保持时间（秒）
+    
+    METRICS_ENABLED = True  # 统计请求次数与耗时（GET /metrics）
+    
+    COMMAND_TIMEOUT = 1.0  # 等待渲染线程执行命令的超时时间（秒）
+    
+    # WebSocket 参数流配置
+    WEBSOCKET_ENABLED = True
+    WEBSOCKET_PORT = None  # 自动选择API端口之后的可用端口
+    WEBSOCKET_MAX_MESSAGE_SIZE = 64 * 1024
+    
+    # UDP 追踪数据监听配置（OSC/VMC 或紧凑二进制）
+    UDP_ENABLED = False
+    UDP_HOST = "127.0.0.1"
+    UDP_PORT = 39539
+    UDP_RECEIVE_BUFFER = 64 * 1024  # 接收缓冲区较小，宁可丢包也不积压
+    UDP_SENDER_TIMEOUT = 1.0  # 发送端静默超过该时间后重新开始序列号计数（秒）
+    
     # 模型配置
     MODELS_DIR = os.path.join(os.path.dirname(__file__), "models")
     DEFAULT_MODEL = None
+    MODEL_CATALOG_CACHE = os.path.join(os.path.dirname(__file__), "temp", "model_catalog.json")  # 模型索引磁盘缓存
+    MODEL_CATALOG_REFRESH_INTERVAL = 5.0  # 后台检查模型目录变化的间隔（秒）
+    MODEL_POOL_MAX_MODELS = 3             # 常驻内存的模型数量上限（含当前模型）
+    MODEL_POOL_MEMORY_BUDGET_MB = 1024    # 模型池内存预算（按 moc 与纹理 RGBA 尺寸估算）
+    MODEL_LOAD_TIMEOUT = 30.0             # 等待渲染线程加载模型的超时时间（秒）
+    MODEL_LOAD_FRAME_BUDGET_MS = 4.0      # 分阶段加载每帧在渲染线程上最多占用的时间（毫秒）
+    
+    # 日志配置
+    LOG_LEVEL = "INFO"             # DEBUG 时输出每次参数设置等热路径日志
+    LOG_THROTTLE_INTERVAL = 5.0    # 热路径错误日志的最小输出间隔（秒）
     
     # 动画配置
     ANIMATION_SMOOTHING = 0.1
     PARAMETER_SMOOTHING = 0.2
+    PARAMETER_APPLY_EPSILON = 1e-4  # 参数变化小于该值时不再调用原生模型（通过 API 设置过的参数每帧都推送）
+    TIMELINE_MAX_ACTIVE = 32       # 同时播放的关键帧时间轴上限（超出时停止最早开始的）
+    TIMELINE_MAX_KEYFRAMES = 4096  # 单个时间轴的关键帧总数上限
+    TIMELINE_HISTORY = 64          # 保留多少个已结束时间轴的状态供查询
+    
+    # 口型同步配置（POST /model/lip_sync）
+    LIP_SYNC_FPS = 60              # 口型曲线的采样率（每秒点数）
+    LIP_SYNC_PARAMETER = "ParamMouthOpenY"      # 张嘴参数
+    LIP_SYNC_FORM_PARAMETER = "ParamMouthForm"  # 口型参数（mode=bands 时驱动，模型没有时忽略）
+    LIP_SYNC_SILENCE_DB = -50.0    # 低于该电平视为闭嘴（dBFS）
+    LIP_SYNC_FULL_DB = -15.0       # 达到该电平时完全张嘴（dBFS）
+    LIP_SYNC_MAX_SECONDS = 600     # 单段音频的最大时长（秒）
+    LIP_SYNC_CACHE_MB = 64         # 已解码音频的 LRU 缓存上限（动作音频等按路径读取的文件）
+    LIP_SYNC_AUDIO_DIRS = []       # 允许按路径读取音频的额外目录（如 TTS 输出目录），模型目录始终允许
+    LIP_SYNC_TIMEOUT = 5.0         # 等待音频分析完成的超时时间（秒）
     
     # OBS 兼容模式配置
     OBS_COMPATIBLE_MODE = False  # 设置为 True 可让 OBS 捕获窗口
@@ -34,7 +103,13 @@ class Config:
     
     # 鼠标穿透配置
     CLICK_THROUGH_ENABLED = False   # 是否启用鼠标穿透
+    CLICK_THROUGH_TRANSPARENT = True  # 透明像素处鼠标穿透到下层窗口（基于 alpha 遮罩，X11 用 XShape，Windows 按光标位置切换）
+    CLICK_THROUGH_POLL_MS = 50     # Windows 下检查光标所在像素的间隔（毫秒）
     MODEL_HIT_THRESHOLD = 0.1      # 模型点击检测阈值（透明度）
+    ALPHA_MASK_ENABLED = True      # 缓存缩小的 alpha 遮罩（像素级点击检测与穿透）
+    ALPHA_MASK_SCALE = 0.25        # 遮罩分辨率相对帧缓冲区的比例
+    ALPHA_MASK_INTERVAL = 6        # 每隔多少帧回读一次遮罩
+    HIT_BATCH_MAX_POINTS = 256     # POST /model/hit_batch 单次最多检测的点数（渲染线程上逐点调用原生接口，这是批量检测唯一的上限）
     
     @staticmethod
     def find_available_port(start_port=6000, max_attempts=100):
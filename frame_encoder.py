@@ -0,0 +1,100 @@
+"""
+帧编码
+把帧环中的 RGBA 像素编码为 PNG/JPEG，在有界线程池中执行，渲染线程只负责回读；
+线程池占满时新的流帧直接丢弃，不排队，慢客户端只会少收帧而不会拖慢渲染
+"""
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import config
+from frame_ring import FLAG_BOTTOM_UP
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    Image = None
+    PIL_AVAILABLE = False
+
+# 编码格式 -> (Pillow 格式名, MIME 类型)
+FORMATS = {
+    'png': ('PNG', 'image/png'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+
+def frame_to_image(fields, data, max_width=None, max_height=None):
+    """帧环中的一帧转为 Pillow 图像（翻转为自上而下，按最大宽高等比缩小）"""
+    _, _, _, width, height, stride, _, flags = fields
+    orientation = -1 if flags & FLAG_BOTTOM_UP else 1
+    # 帧缓冲区为预乘 alpha（RGBa），转换为普通 RGBA
+    image = Image.frombuffer('RGBa', (width, height), data, 'raw', 'RGBa', stride, orientation)
+    image = image.convert('RGBA')
+    if max_width or max_height:
+        image.thumbnail((max_width or width, max_height or height), Image.BILINEAR)
+    return image
+
+
+def encode_frame(fields, data, fmt='png', max_width=None, max_height=None, quality=None):
+    """编码一帧，返回图像字节"""
+    pil_format, _ = FORMATS[fmt]
+    image = frame_to_image(fields, data, max_width, max_height)
+    buffer = io.BytesIO()
+    if fmt == 'jpeg':
+        # JPEG 没有透明通道，透明区域合成到背景色上
+        background = Image.new('RGB', image.size, tuple(int(c * 255) for c in config.FRAME_JPEG_BACKGROUND))
+        background.paste(image, mask=image.getchannel('A'))
+        background.save(buffer, pil_format, quality=quality or config.FRAME_STREAM_QUALITY)
+    else:
+        image.save(buffer, pil_format, compress_level=config.FRAME_PNG_COMPRESS_LEVEL)
+    return buffer.getvalue()
+
+
+class FrameEncoder:
+    """有界编码线程池"""
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or config.FRAME_ENCODER_WORKERS
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+        self._executor = None
+        self._lock = threading.Lock()
+        self.encoded = 0
+        self.dropped = 0
+
+    def submit(self, fields, data, fmt='png', max_width=None, max_height=None, quality=None,
+               blocking=False, timeout=None):
+        """提交编码任务，返回 Future；线程池已满且不等待时丢弃并返回 None"""
+        if not PIL_AVAILABLE:
+            raise RuntimeError("帧编码需要安装 Pillow（pip install Pillow）")
+        if not self._slots.acquire(blocking, timeout if blocking else None):
+            self.dropped += 1
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='frame-encoder')
+        try:
+            future = self._executor.submit(encode_frame, fields, data, fmt, max_width, max_height, quality)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        self._slots.release()
+        if future.exception() is None:
+            self.encoded += 1
+
+    def get_stats(self):
+        return {
+            'available': PIL_AVAILABLE,
+            'workers': self.max_workers,
+            'encoded': self.encoded,
+            'dropped': self.dropped
+        }
+
+
+# 创建全局实例
+frame_encoder = FrameEncoder()
@@ -0,0 +1,398 @@
+"""
+共享内存帧环
+渲染线程把每帧 RGBA 像素写入内存映射文件中的 N 个槽位，本机的 OBS 插件、录制或编码程序直接映射同一文件读取，
+无需截取整个窗口；像素经两个 PBO 异步回读（本帧发起 glReadPixels，下一帧再映射读取），渲染线程不会等待 GPU
+
+文件布局（小端）:
+    文件头 HEADER_SIZE 字节: magic b'L2DF', 版本, 槽位数, 文件头大小, 槽位头大小, 槽位像素容量,
+                             代号（映射重建后旧文件的代号置 0，读者应重新打开路径）, 最新槽位, 最新帧号
+    槽位 i 起始于 HEADER_SIZE + i * (SLOT_HEADER_SIZE + 槽位像素容量):
+        槽位头: 序号, 帧号, 时间戳（纳秒）, 宽, 高, 行跨度, 像素字节数, 标志
+        像素: RGBA8（预乘 alpha），FLAG_BOTTOM_UP 表示行序自下而上（OpenGL 原点在左下角）
+读者先读槽位序号，为奇数表示正在写入；读完像素后再读一次序号，与之前不同则丢弃该帧
+"""
+import ctypes
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+
+from config import config
+from log_utils import get_logger, throttle
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: 仍被其他进程映射的文件无法删除，由 os.remove 报错判断
+    fcntl = None
+
+try:
+    import OpenGL.GL as gl
+    GL_AVAILABLE = True
+except ImportError:
+    gl = None
+    GL_AVAILABLE = False
+
+logger = get_logger('帧环')
+
+MAGIC = b'L2DF'
+VERSION = 1
+
+# magic, 版本, 槽位数, 文件头大小, 槽位头大小, 槽位像素容量, 代号, 最新槽位, 最新帧号
+HEADER = struct.Struct('<4sHHIIIIIQ')
+HEADER_SIZE = 64
+# 代号、最新槽位与最新帧号在文件头中的偏移
+_GENERATION_OFFSET = struct.calcsize('<4sHHIII')
+_LATEST_OFFSET = struct.calcsize('<4sHHIIII')
+_LATEST = struct.Struct('<IQ')
+
+# 序号, 帧号, 时间戳（纳秒）, 宽, 高, 行跨度, 像素字节数, 标志
+SLOT_HEADER = struct.Struct('<QQQIIIII')
+SLOT_HEADER_SIZE = 64
+
+FLAG_BOTTOM_UP = 1
+
+# 槽位像素区按 64 字节对齐
+_ALIGN = 64
+
+
+def default_path(instance=None):
+    """每个实例一个文件（按 API 端口区分，缺省用进程号）
+    Linux 上优先使用 /dev/shm（内存文件系统，不会回写磁盘），其余系统使用 temp 目录
+    """
+    instance = instance or os.getpid()
+    if sys.platform.startswith('linux') and os.path.isdir('/dev/shm'):
+        return f'/dev/shm/live2d_frame_ring_{instance}'
+    return os.path.join(os.path.dirname(__file__), 'temp', f'frame_ring_{instance}.bin')
+
+
+def _remove_unowned(path):
+    """删除上次运行遗留的映射文件；文件仍被其他进程的帧环持有时抛出 FileExistsError"""
+    if fcntl is not None:
+        with open(path, 'rb') as f:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                raise FileExistsError(f"帧环文件正被其他进程使用: {path}")
+    try:
+        os.remove(path)
+    except PermissionError:
+        raise FileExistsError(f"帧环文件正被其他进程使用: {path}")
+
+
+class FrameRing:
+    """内存映射的帧槽位环（单写者）"""
+
+    def __init__(self, path, slot_count, slot_capacity, generation=1):
+        self.path = path
+        self.slot_count = slot_count
+        self.slot_capacity = -(-slot_capacity // _ALIGN) * _ALIGN
+        self.slot_stride = SLOT_HEADER_SIZE + self.slot_capacity
+        self.size = HEADER_SIZE + self.slot_count * self.slot_stride
+        self.generation = generation
+        self.latest_slot = 0
+        self.latest_frame = 0
+        self._next_slot = 0
+        self._seqs = [0] * slot_count
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 先删除旧文件再新建，仍映射旧文件的读者不会因文件被截断而出错；其他进程的帧环文件不删除
+        if os.path.exists(path):
+            _remove_unowned(path)
+        # 写者在帧环存续期间持有文件锁，标明文件仍在使用
+        self._file = open(path, 'w+b')
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._file.truncate(self.size)
+        self._mm = mmap.mmap(self._file.fileno(), self.size)
+        self._base = ctypes.addressof(ctypes.c_char.from_buffer(self._mm))
+        HEADER.pack_into(self._mm, 0, MAGIC, VERSION, slot_count, HEADER_SIZE, SLOT_HEADER_SIZE,
+                         self.slot_capacity, self.generation, 0, 0)
+
+    def slot_offset(self, index):
+        return HEADER_SIZE + index * self.slot_stride
+
+    def _begin(self):
+        index = self._next_slot
+        self._next_slot = (index + 1) % self.slot_count
+        self._seqs[index] += 1
+        struct.pack_into('<Q', self._mm, self.slot_offset(index), self._seqs[index])
+        return index
+
+    def _commit(self, index, frame_number, width, height, stride, size, flags):
+        self._seqs[index] += 1
+        SLOT_HEADER.pack_into(self._mm, self.slot_offset(index), self._seqs[index], frame_number,
+                              time.time_ns(), width, height, stride, size, flags)
+        self.latest_slot = index
+        self.latest_frame = frame_number
+        _LATEST.pack_into(self._mm, _LATEST_OFFSET, index, frame_number)
+
+    def write_from_address(self, address, frame_number, width, height, stride, flags=0):
+        """从内存地址（如映射的 PBO）复制一帧到下一个槽位"""
+        size = stride * height
+        if size > self.slot_capacity:
+            raise ValueError(f"帧大小 {size} 超出槽位容量 {self.slot_capacity}")
+        index = self._begin()
+        ctypes.memmove(self._base + self.slot_offset(index) + SLOT_HEADER_SIZE, address, size)
+        self._commit(index, frame_number, width, height, stride, size, flags)
+        return index
+
+    def write(self, data, frame_number, width, height, stride, flags=0):
+        """从 bytes 类对象写入一帧"""
+        size = stride * height
+        if size > self.slot_capacity:
+            raise ValueError(f"帧大小 {size} 超出槽位容量 {self.slot_capacity}")
+        index = self._begin()
+        start = self.slot_offset(index) + SLOT_HEADER_SIZE
+        self._mm[start:start + size] = memoryview(data)[:size]
+        self._commit(index, frame_number, width, height, stride, size, flags)
+        return index
+
+    def read_latest(self):
+        """读取最新一帧，返回 (槽位头字段, 像素字节)；写入过程中被覆盖时返回 None"""
+        index, _ = _LATEST.unpack_from(self._mm, _LATEST_OFFSET)
+        offset = self.slot_offset(index)
+        fields = SLOT_HEADER.unpack_from(self._mm, offset)
+        if fields[0] % 2:
+            return None
+        start = offset + SLOT_HEADER_SIZE
+        data = bytes(self._mm[start:start + fields[6]])
+        if struct.unpack_from('<Q', self._mm, offset)[0] != fields[0]:
+            return None
+        return fields, data
+
+    def layout(self):
+        return {
+            'magic': MAGIC.decode('ascii'),
+            'version': VERSION,
+            'generation': self.generation,
+            'file_size': self.size,
+            'header_size': HEADER_SIZE,
+            'header_format': HEADER.format,
+            'slot_count': self.slot_count,
+            'slot_header_size': SLOT_HEADER_SIZE,
+            'slot_header_format': SLOT_HEADER.format,
+            'slot_capacity': self.slot_capacity,
+            'slot_stride': self.slot_stride,
+            'pixel_format': 'RGBA8',
+            'flags': {'bottom_up': FLAG_BOTTOM_UP}
+        }
+
+    def close(self):
+        """关闭映射，并把代号置 0 通知读者"""
+        struct.pack_into('<I', self._mm, _GENERATION_OFFSET, 0)
+        # _base 只是映射区的裸地址（from_buffer 的临时对象已释放，不会阻止关闭），
+        # 置空后关闭之后的误写入会抛出异常，而不是 memmove 到已解除映射的内存
+        self._base = None
+        try:
+            self._mm.close()
+        except BufferError:
+            pass
+        # 关闭文件即释放文件锁
+        self._file.close()
+
+
+class FramePublisher:
+    """在渲染线程上异步回读帧缓冲区并发布到帧环"""
+
+    def __init__(self, path=None, slot_count=None):
+        self.enabled = config.FRAME_RING_ENABLED
+        self.path = path or config.FRAME_RING_PATH or default_path(config.API_PORT)
+        self.slot_count = slot_count or config.FRAME_RING_SLOTS
+        self.ring = None
+        self._lock = threading.Lock()
+        self._frame_ready = threading.Condition()
+        self._consumers = 0   # 快照、视频流等进程内读者的数量，有读者时即使未开启也发布
+
+        # 两个 PBO 交替使用: 本帧读入一个，同时映射上一帧读入的另一个
+        self._pbos = None
+        self._pbo_size = None
+        self._pbo_index = 0
+        self._pending = [None, None]   # 每个 PBO 中尚未取出的帧 (帧号, 宽, 高)
+        self._was_active = False
+
+        self.frame_number = 0
+        self.published = 0
+        self.latest_frame = 0
+        self.errors = 0
+        self.last_copy_ms = 0.0
+
+    @property
+    def active(self):
+        """渲染线程本帧是否需要回读"""
+        return self.enabled or self._consumers > 0
+
+    def set_enabled(self, enabled):
+        """开关发布；关闭时下一帧在渲染线程上释放 PBO"""
+        self.enabled = bool(enabled)
+
+    def acquire(self):
+        """登记一个进程内读者，返回登记时已发起回读的最大帧号
+
+        PBO 中可能还留有登记之前的旧帧，读者应等待帧号大于返回值的帧
+        """
+        with self._frame_ready:
+            self._consumers += 1
+            return self.frame_number
+
+    def release(self):
+        with self._frame_ready:
+            self._consumers = max(0, self._consumers - 1)
+
+    def publish(self, width, height):
+        """读取当前绑定的帧缓冲区（需在渲染线程、GL 上下文有效时调用，每帧调用）
+
+        未开启且没有读者时直接返回，并释放 PBO 和其中尚未取出的旧帧
+        """
+        if not self.active:
+            if self._pbos is not None:
+                self._release_pbos()
+            self._was_active = False
+            return
+        if not self._was_active:
+            # 重新开始发布时丢弃停止前留在 PBO 中的旧帧
+            self._pending = [None, None]
+            self._was_active = True
+        if not GL_AVAILABLE or width <= 0 or height <= 0:
+            return
+        try:
+            self._publish(width, height)
+        except Exception as e:
+            self.errors += 1
+            logger.error("发布帧失败: %s", e, extra=throttle("frame_ring_publish"))
+
+    def _publish(self, width, height):
+        stride = width * 4
+        size = stride * height
+        if self._pbo_size != size:
+            self._release_pbos()
+            self._create_pbos(size)
+        self._ensure_ring(size)
+
+        self.frame_number += 1
+        current = self._pbo_index
+        previous = 1 - current
+
+        # 发起异步回读，立即返回
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, self._pbos[current])
+        gl.glPixelStorei(gl.GL_PACK_ALIGNMENT, 4)
+        gl.glReadPixels(0, 0, width, height, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, ctypes.c_void_p(0))
+        self._pending[current] = (self.frame_number, width, height)
+
+        # 取出上一帧（GPU 已有一帧时间完成传输）
+        pending = self._pending[previous]
+        if pending is not None:
+            start = time.perf_counter()
+            gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, self._pbos[previous])
+            address = gl.glMapBuffer(gl.GL_PIXEL_PACK_BUFFER, gl.GL_READ_ONLY)
+            if address:
+                address = ctypes.cast(address, ctypes.c_void_p).value
+                try:
+                    frame_number, frame_width, frame_height = pending
+                    with self._lock:
+                        self.ring.write_from_address(address, frame_number, frame_width, frame_height,
+                                                     frame_width * 4, FLAG_BOTTOM_UP)
+                    self.published += 1
+                finally:
+                    gl.glUnmapBuffer(gl.GL_PIXEL_PACK_BUFFER)
+                self._notify(frame_number)
+            self._pending[previous] = None
+            self.last_copy_ms = (time.perf_counter() - start) * 1000.0
+
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, 0)
+        self._pbo_index = previous
+
+    def _create_pbos(self, size):
+        self._pbos = list(gl.glGenBuffers(2))
+        for pbo in self._pbos:
+            gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, pbo)
+            gl.glBufferData(gl.GL_PIXEL_PACK_BUFFER, size, None, gl.GL_STREAM_READ)
+        gl.glBindBuffer(gl.GL_PIXEL_PACK_BUFFER, 0)
+        self._pbo_size = size
+        self._pending = [None, None]
+        self._pbo_index = 0
+
+    def _release_pbos(self):
+        if self._pbos is not None:
+            try:
+                gl.glDeleteBuffers(2, self._pbos)
+            except Exception as e:
+                logger.warning("释放 PBO 失败: %s", e)
+        self._pbos = None
+        self._pbo_size = None
+        self._pending = [None, None]
+
+    def _ensure_ring(self, size):
+        """首次发布或帧变大时（重新）创建映射文件"""
+        if self.ring is not None and self.ring.slot_capacity >= size:
+            return
+        with self._lock:
+            generation = 1
+            if self.ring is not None:
+                generation = self.ring.generation + 1
+                self.ring.close()
+            try:
+                self.ring = FrameRing(self.path, self.slot_count, size, generation)
+            except FileExistsError as e:
+                # 配置的路径与其他实例冲突时改用带进程号的路径（GET /frames/ring 可查到实际路径）
+                path = f'{self.path}_{os.getpid()}'
+                logger.warning("%s，改用 %s", e, path)
+                self.path = path
+                self.ring = FrameRing(self.path, self.slot_count, size, generation)
+        logger.info("帧环已映射: %s (%d 槽位, 每槽 %d 字节)", self.path, self.slot_count, self.ring.slot_capacity)
+
+    def _notify(self, frame_number):
+        with self._frame_ready:
+            self.latest_frame = frame_number
+            if self._consumers:
+                self._frame_ready.notify_all()
+
+    def wait_frame(self, after=0, timeout=None):
+        """等待帧号大于 after 的帧，返回 (槽位头字段, 像素字节)，超时返回 None
+
+        读者不持有写锁，槽位在读取过程中被覆盖时重试（环中有多个槽位，最新帧很少被立即覆盖）
+        """
+        with self._frame_ready:
+            if not self._frame_ready.wait_for(lambda: self.latest_frame > after, timeout):
+                return None
+        for _ in range(3):
+            ring = self.ring
+            try:
+                frame = ring.read_latest() if ring is not None else None
+            except (ValueError, TypeError):
+                # 映射在读取时被重建
+                frame = None
+            if frame is not None:
+                return frame
+        return None
+
+    def get_info(self):
+        """映射文件路径、布局和发布统计（供外部程序发现）"""
+        with self._lock:
+            ring = self.ring
+            info = {
+                'enabled': self.enabled,
+                'consumers': self._consumers,
+                'available': GL_AVAILABLE,
+                'path': self.path,
+                'pid': os.getpid(),
+                'api_port': config.API_PORT,
+                'mapped': ring is not None,
+                'published': self.published,
+                'errors': self.errors,
+                'last_copy_ms': round(self.last_copy_ms, 3),
+                'latency_frames': 1
+            }
+            if ring is not None:
+                info['layout'] = ring.layout()
+                info['latest_slot'] = ring.latest_slot
+                info['latest_frame'] = ring.latest_frame
+            return info
+
+
+# 创建全局实例
+frame_publisher = FramePublisher()
@@ -0,0 +1,109 @@
+"""
+自适应帧调度
+根据模型是否在变化决定渲染频率，避免空闲时持续满帧重绘：
+- active: 参数正在平滑、动作在播放、用户正在交互或刚收到API命令，按 config.FPS 满帧渲染
+- idle: 无变化时降到 config.IDLE_FPS（仍保留原生呼吸/眨眼等自动动画）
+- heartbeat: 窗口隐藏、没有模型，或空闲超过 config.HEARTBEAT_DELAY 秒后，只保留 config.HEARTBEAT_FPS 的心跳
+API 线程写入命令时通过 wake() 立即切回 active
+本模块不依赖 Qt，由渲染器负责把 next_interval() 应用到定时器上
+"""
+import threading
+import time
+from collections import deque
+
+from config import config
+
+MODE_ACTIVE = 'active'
+MODE_IDLE = 'idle'
+MODE_HEARTBEAT = 'heartbeat'
+
+
+class FrameScheduler:
+    """帧调度器"""
+
+    def __init__(self):
+        self.mode = MODE_ACTIVE
+        self.wake_callback = None  # 由渲染器设置，例如 Qt 信号的 emit
+        self._wake_pending = threading.Event()
+        self._last_activity = time.monotonic()
+        self._last_busy = self._last_activity
+        self._frame_times = deque(maxlen=max(2, int(config.FPS)))
+
+        # 统计
+        self.frames = 0
+        self.wakeups = 0
+        self.mode_frames = {MODE_ACTIVE: 0, MODE_IDLE: 0, MODE_HEARTBEAT: 0}
+
+    def target_fps(self, mode=None):
+        """各模式的目标帧率"""
+        mode = mode or self.mode
+        if mode == MODE_ACTIVE:
+            return config.FPS
+        if mode == MODE_IDLE:
+            return config.IDLE_FPS
+        return config.HEARTBEAT_FPS
+
+    def interval_ms(self, mode=None):
+        """各模式对应的定时器间隔（毫秒）"""
+        return max(1, int(1000 / self.target_fps(mode)))
+
+    def notify_activity(self):
+        """记录一次用户交互（鼠标拖拽、调整大小等）"""
+        self._last_activity = time.monotonic()
+
+    def wake(self):
+        """API 线程收到命令时调用；非满帧模式下通知渲染器立即重绘
+
+        同一帧内的多次写入只触发一次唤醒，避免高频参数流刷满事件队列
+        """
+        self._last_activity = time.monotonic()
+        if self.mode == MODE_ACTIVE or self._wake_pending.is_set():
+            return
+        self._wake_pending.set()
+        self.wakeups += 1
+        callback = self.wake_callback
+        if callback is not None:
+            callback()
+
+    def frame_done(self, busy, visible=True, has_model=True):
+        """每帧绘制完成后调用，返回下一帧应使用的模式"""
+        now = time.monotonic()
+        self._wake_pending.clear()
+        self._frame_times.append(now)
+        self.frames += 1
+        self.mode_frames[self.mode] += 1
+
+        if busy:
+            self._last_busy = now
+        last_change = max(self._last_busy, self._last_activity)
+
+        if not visible or not has_model:
+            self.mode = MODE_HEARTBEAT
+        elif now - last_change < config.ACTIVE_HOLD_TIME:
+            # 变化结束后保持一小段满帧，覆盖表情淡入淡出等无法直接观测的过渡
+            self.mode = MODE_ACTIVE
+        elif config.HEARTBEAT_DELAY is not None and now - last_change >= config.HEARTBEAT_DELAY:
+            self.mode = MODE_HEARTBEAT
+        else:
+            self.mode = MODE_IDLE
+        return self.mode
+
+    @property
+    def measured_fps(self):
+        """最近若干帧的实际帧率"""
+        if len(self._frame_times) < 2:
+            return 0.0
+        # 空闲降频后，以当前时刻为终点，避免沿用旧的满帧数据
+        elapsed = max(time.monotonic(), self._frame_times[-1]) - self._frame_times[0]
+        return (len(self._frame_times) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def get_stats(self):
+        """获取调度状态"""
+        return {
+            'mode': self.mode,
+            'target_fps': self.target_fps(),
+            'measured_fps': round(self.measured_fps, 2),
+            'frames': self.frames,
+            'wakeups': self.wakeups,
+            'mode_frames': dict(self.mode_frames)
+        }
@@ -0,0 +1,131 @@
+"""
+逐帧分阶段计时
+渲染线程把每帧各阶段耗时写入预分配的环形缓冲区（只做数组赋值，不产生新的容器对象），
+API 线程读取快照后再计算分位数和直方图
+"""
+import bisect
+import time
+
+import numpy as np
+
+from config import config
+
+# 阶段列索引
+TICK_INTERVAL = 0   # 两次定时器触发的实际间隔
+CLEAR = 1           # glClear
+DRAIN = 2           # 执行API命令队列
+AUTO_ANIMATION = 3  # 自动眨眼/呼吸
+SMOOTHING = 4       # 参数平滑与推送
+MODEL_UPDATE = 5    # model.Update
+MODEL_DRAW = 6      # model.Draw
+SWAP = 7            # paintGL 结束到缓冲区交换完成
+FRAME = 8           # 整帧耗时（paintGL 开始到交换完成）
+MODEL_LOAD = 9      # 分阶段模型加载
+READBACK = 10       # 帧环与 alpha 遮罩异步回读
+TIMELINE = 11       # 关键帧时间轴求值
+LIP_SYNC = 12       # 口型曲线取值
+
+PHASES = ('tick_interval', 'clear', 'drain', 'auto_animation', 'smoothing',
+          'model_update', 'model_draw', 'swap', 'frame', 'model_load', 'readback',
+          'timeline', 'lip_sync')
+
+# 直方图分桶边界（毫秒）
+HISTOGRAM_EDGES_MS = (0.0, 0.5, 1.0, 2.0, 4.0, 8.0, 16.7, 33.3, 50.0, 100.0, float('inf'))
+# 整帧耗时累计直方图的分桶上界（毫秒，供 /metrics 使用）
+FRAME_HISTOGRAM_BOUNDS_MS = HISTOGRAM_EDGES_MS[1:-1]
+
+
+class FrameTimings:
+    """每帧各阶段耗时的环形缓冲区"""
+
+    def __init__(self, capacity=None):
+        self.enabled = config.FRAME_TIMING_ENABLED
+        self.capacity = capacity or config.FRAME_TIMING_CAPACITY
+        self._data = np.full((self.capacity, len(PHASES)), np.nan)
+        self._current = self._data[0]
+        self.count = 0
+        self._frame_start = 0.0
+        self._last_tick = None
+        self._tick_interval = np.nan
+
+        # 自启动以来的整帧耗时累计直方图（上一帧在下一帧开始时计入）
+        self.frame_histogram = [0] * (len(FRAME_HISTOGRAM_BOUNDS_MS) + 1)
+        self.frame_time_sum = 0.0
+        self.frame_count = 0
+
+    def tick(self):
+        """定时器触发时调用，记录与上一次触发的间隔"""
+        now = time.perf_counter()
+        if self._last_tick is not None:
+            self._tick_interval = (now - self._last_tick) * 1000.0
+        self._last_tick = now
+
+    def begin_frame(self):
+        """开始新的一帧，返回当前时间作为第一个阶段的起点"""
+        now = time.perf_counter()
+        if not self.enabled:
+            return now
+        if self.count:
+            self._accumulate(self._current[FRAME])
+        self._current = self._data[self.count % self.capacity]
+        self._current.fill(np.nan)
+        self._current[TICK_INTERVAL] = self._tick_interval
+        self._tick_interval = np.nan
+        self._frame_start = now
+        self.count += 1
+        return now
+
+    def _accumulate(self, frame_ms):
+        if frame_ms != frame_ms:  # NaN: 上一帧未完成
+            return
+        frame_ms = float(frame_ms)
+        self.frame_histogram[bisect.bisect_left(FRAME_HISTOGRAM_BOUNDS_MS, frame_ms)] += 1
+        self.frame_time_sum += frame_ms
+        self.frame_count += 1
+
+    def lap(self, phase, start):
+        """记录从 start 到现在的阶段耗时，返回当前时间作为下一阶段的起点"""
+        now = time.perf_counter()
+        if self.enabled:
+            self._current[phase] = (now - start) * 1000.0
+        return now
+
+    def end_frame(self):
+        """记录整帧耗时（交换完成后再次调用会覆盖为包含交换的耗时）"""
+        return self.lap(FRAME, self._frame_start)
+
+    def summary(self, budget_ms=None):
+        """统计最近若干帧: 各阶段分位数、直方图及超出帧预算的帧数"""
+        if budget_ms is None:
+            budget_ms = 1000.0 / config.FPS
+        frames = min(self.count, self.capacity)
+        data = self._data[:frames].copy()
+
+        phases = {}
+        for column, name in enumerate(PHASES):
+            samples = data[:, column]
+            samples = samples[~np.isnan(samples)]
+            if not len(samples):
+                phases[name] = None
+                continue
+            p50, p95, p99 = np.percentile(samples, (50, 95, 99))
+            phases[name] = {
+                'samples': int(len(samples)),
+                'mean': round(float(samples.mean()), 3),
+                'p50': round(float(p50), 3),
+                'p95': round(float(p95), 3),
+                'p99': round(float(p99), 3),
+                'max': round(float(samples.max()), 3),
+                'histogram': np.histogram(samples, bins=HISTOGRAM_EDGES_MS)[0].tolist()
+            }
+
+        frame_times = data[:, FRAME]
+        return {
+            'frames': frames,
+            'total_frames': self.count,
+            'budget_ms': round(budget_ms, 3),
+            'over_budget': int(np.count_nonzero(frame_times > budget_ms)),
+            # 最后一个桶没有上界，以 None 表示
+            'histogram_edges_ms': [edge if edge != float('inf') else None for edge in HISTOGRAM_EDGES_MS],
+            'phases': phases
+        }
@@ -9,9 +9,17 @@ from PyQt5.QtWidgets import QApplication
 from simple_live2d_renderer import Live2DRenderer
 from simple_flask_api import set_renderer, start_api_server_thread
 from config import config
+from model_catalog import model_catalog
 
-def main(live2d_model_name):
-    """主程序入口"""
+def main(live2d_model_name, headless=None):
+    """主程序入口（headless 为 None 时按 config.RENDER_MODE 选择渲染模式）"""
+    if headless is None:
+        headless = config.RENDER_MODE == "headless"
+    if headless:
+        # 无头模式：离屏渲染 + HTTP API，不创建窗口和托盘
+        from headless_renderer import main as headless_main
+        return headless_main(live2d_model_name)
+    
     print("=" * 60)
     print("Live2D Desktop API - 完整版")
     print("桌面渲染器 + HTTP API 服务")
@@ -30,7 +38,7 @@ def main(live2d_model_name):
     
     # 启动API服务器（在后台线程中）
     print("正在启动API服务器...")
-    api_thread = start_api_server_thread(live2d_model_name)
+    api_thread = start_api_server_thread(live2d_model_name, config.API_SERVER_BACKEND)
     
     # 显示渲染器窗口
     renderer.show()
@@ -44,6 +52,7 @@ def main(live2d_model_name):
     print()
     print("✓ HTTP API服务已启动")
     print(f"  - 服务地址: http://{config.API_HOST}:{config.API_PORT}")
+    print(f"  - 服务器后端: {config.API_SERVER_BACKEND}")
     print(f"  - 支持跨域访问（CORS）")
     print(f"  - 完整的RESTful API")
     print()
@@ -52,8 +61,7 @@ def main(live2d_model_name):
     
     # 检查模型
     if os.path.exists(config.MODELS_DIR):
-        models = [d for d in os.listdir(config.MODELS_DIR) 
-                 if os.path.isdir(os.path.join(config.MODELS_DIR, d))]
+        models = model_catalog.names()
         if models:
             print(f"  - 发现 {len(models)} 个模型: {', '.join(models)}")
             print(f"  - 已自动加载: {models[0]}")
@@ -86,9 +94,14 @@ def main(live2d_model_name):
 
 if __name__ == "__main__":
     import sys
-    if len(sys.argv) > 1:
-        live2d_model_name = sys.argv[1]
+    args = sys.argv[1:]
+    headless = None
+    if "--headless" in args:
+        args.remove("--headless")
+        headless = True
+    if len(args) > 0:
+        live2d_model_name = args[0]
     else:
         live2d_model_name = None
     print(f"模型：{live2d_model_name}")
-    main(live2d_model_name)
\ No newline at end of file
+    main(live2d_model_name, headless)
\ No newline at end of file
@@ -0,0 +1,183 @@
+"""
+无头离屏渲染
+没有显示器的服务器或 CI 上使用：不创建窗口和托盘图标，渲染到离屏帧缓冲区，
+帧循环、帧调度、计时和 API 与桌面渲染器完全相同；live2d 库不可用时绘制模拟模型，可在普通 Linux 机器上跑通整条管线
+"""
+import os
+import sys
+import time
+
+from config import config
+from log_utils import get_logger
+
+logger = get_logger('无头渲染')
+
+
+def prepare_environment():
+    """在创建 QApplication 之前设置 Qt 平台插件和软件 OpenGL"""
+    if config.HEADLESS_QPA_PLATFORM:
+        os.environ.setdefault('QT_QPA_PLATFORM', config.HEADLESS_QPA_PLATFORM)
+    if config.HEADLESS_SOFTWARE_GL:
+        # AA_UseSoftwareOpenGL 只在 Windows 上生效（加载 opengl32sw.dll）；
+        # Linux 上由 Mesa 读取该环境变量改用 llvmpipe，需在创建 OpenGL 上下文之前设置
+        os.environ.setdefault('LIBGL_ALWAYS_SOFTWARE', '1')
+        from PyQt5.QtCore import Qt, QCoreApplication
+        QCoreApplication.setAttribute(Qt.AA_UseSoftwareOpenGL)
+
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from PyQt5.QtGui import QOffscreenSurface, QOpenGLContext, QOpenGLFramebufferObject, QSurfaceFormat
+import OpenGL.GL as gl
+
+from real_live2d_controller import real_live2d_controller, LIVE2D_AVAILABLE
+from simple_live2d_renderer import ModelControlMixin
+from log_utils import throttle
+import frame_timing
+from frame_ring import frame_publisher
+from alpha_mask import alpha_mask
+
+
+class HeadlessRenderer(QObject, ModelControlMixin):
+    """渲染到离屏帧缓冲区的渲染器"""
+
+    # API 线程入队命令时发出，经 Qt 排队连接回到渲染线程
+    wake_requested = pyqtSignal()
+
+    def __init__(self, live2d_model_name=None, width=None, height=None):
+        super().__init__()
+        self.live2d_model_name = live2d_model_name
+        self.width = width or config.WINDOW_WIDTH
+        self.height = height or config.WINDOW_HEIGHT
+
+        # 模型状态
+        self.current_model = None
+        self.parameters = {}
+
+        self.setupContext()
+        self.setupTimer()
+
+        real_live2d_controller.initialize()
+        real_live2d_controller.resize(self.width, self.height)
+        logger.info("离屏 OpenGL 上下文初始化完成: %dx%d (%s)", self.width, self.height,
+                    "live2d" if LIVE2D_AVAILABLE else "模拟模式")
+        self._auto_load_model(self.live2d_model_name)
+
+    def setupContext(self):
+        """创建离屏表面、OpenGL 上下文和帧缓冲区"""
+        surface_format = QSurfaceFormat()
+        surface_format.setAlphaBufferSize(8)
+        surface_format.setDepthBufferSize(24)
+        surface_format.setStencilBufferSize(8)
+
+        self.surface = QOffscreenSurface()
+        self.surface.setFormat(surface_format)
+        self.surface.create()
+
+        self.context = QOpenGLContext()
+        self.context.setFormat(surface_format)
+        if not self.context.create():
+            raise RuntimeError("无法创建 OpenGL 上下文（可尝试设置 HEADLESS_SOFTWARE_GL = True）")
+        if not self.context.makeCurrent(self.surface):
+            raise RuntimeError("无法激活离屏 OpenGL 上下文")
+
+        self.fbo = None
+        self._create_framebuffer()
+
+    def _create_framebuffer(self):
+        self.fbo = QOpenGLFramebufferObject(self.width, self.height,
+                                            QOpenGLFramebufferObject.CombinedDepthStencil)
+        self.fbo.bind()
+
+    def setupTimer(self):
+        """设置渲染定时器（间隔由帧调度器按当前模式调整）"""
+        self.scheduler = real_live2d_controller.scheduler
+        self.timings = real_live2d_controller.timings
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.render_frame)
+        self.timer.start(self.scheduler.interval_ms())
+
+        self.wake_requested.connect(self.wake)
+        self.scheduler.wake_callback = self.wake_requested.emit
+
+    def wake(self):
+        """收到API命令，立即恢复满帧渲染"""
+        self.scheduler.notify_activity()
+        self.timer.start(self.scheduler.interval_ms('active'))
+
+    def _resize_canvas(self, width, height):
+        """渲染线程: 重建离屏帧缓冲区并调整模型画布大小
+
+        在 render_frame 执行命令队列时调用，新帧缓冲区绑定后本帧剩余的绘制和回读直接使用新尺寸
+        """
+        self.width, self.height = width, height
+        self.context.makeCurrent(self.surface)
+        self.fbo.release()
+        self._create_framebuffer()
+        gl.glViewport(0, 0, self.width, self.height)
+        real_live2d_controller.resize(self.width, self.height)
+
+    def render_frame(self):
+        """渲染一帧（与桌面渲染器的 paintGL 相同的步骤）"""
+        self.timings.tick()
+        t = self.timings.begin_frame()
+        try:
+            self.context.makeCurrent(self.surface)
+            self.fbo.bind()
+            gl.glViewport(0, 0, self.width, self.height)
+
+            gl.glClearColor(*config.BACKGROUND_COLOR)
+            gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+            self.timings.lap(frame_timing.CLEAR, t)
+
+            real_live2d_controller.update()
+            real_live2d_controller.draw()
+
+            # 异步回读: 发布到共享内存帧环，每隔若干帧更新 alpha 遮罩（供 POST /model/hit_pixel）
+            t = time.perf_counter()
+            frame_publisher.publish(self.width, self.height)
+            alpha_mask.capture(self.fbo.handle(), self.width, self.height, self.width, self.height)
+            self.timings.lap(frame_timing.READBACK, t)
+
+            # 没有缓冲区交换，以 glFinish 等待绘制完成作为交换阶段
+            t = self.timings.end_frame()
+            gl.glFinish()
+            self.timings.lap(frame_timing.SWAP, t)
+            self.timings.end_frame()
+
+        except Exception as e:
+            logger.error("绘制失败: %s", e, extra=throttle("headless_render"))
+
+        has_model = real_live2d_controller.model is not None or not LIVE2D_AVAILABLE
+        mode = self.scheduler.frame_done(real_live2d_controller.is_animating(), visible=True, has_model=has_model)
+        interval = self.scheduler.interval_ms(mode)
+        if self.timer.interval() != interval:
+            self.timer.setInterval(interval)
+
+    def grab_image(self):
+        """读取当前帧缓冲区内容，返回 QImage"""
+        self.context.makeCurrent(self.surface)
+        return self.fbo.toImage()
+
+
+def main(live2d_model_name=None):
+    """以无头模式运行渲染器和 API 服务"""
+    prepare_environment()
+
+    from PyQt5.QtGui import QGuiApplication
+    from simple_flask_api import set_renderer, start_api_server_thread
+
+    app = QGuiApplication(sys.argv)
+    renderer = HeadlessRenderer(live2d_model_name)
+    set_renderer(renderer)
+    start_api_server_thread(live2d_model_name, config.API_SERVER_BACKEND)
+
+    logger.info("无头渲染已启动: %dx%d, API: http://%s:%s", renderer.width, renderer.height,
+                config.API_HOST, config.API_PORT)
+    try:
+        sys.exit(app.exec_())
+    except KeyboardInterrupt:
+        app.quit()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else None)
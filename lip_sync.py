@@ -0,0 +1,346 @@
+"""
+口型同步
+API 线程收到 PCM/WAV 数据或音频文件路径后交给工作线程: 解码、下混为单声道，再用 NumPy 按帧批量计算张嘴包络
+（RMS 电平，或 FFT 频带能量推算口型），得到每秒 config.LIP_SYNC_FPS 个点的紧凑曲线；
+渲染线程每帧按时钟在曲线上取值直接写入嘴部参数（不经过平滑窗口），口型与音频起始时间对齐，不再依赖逐次 HTTP 调用
+按路径读取的音频（如动作音频）解码后按 LRU 缓存
+"""
+import io
+import itertools
+import os
+import threading
+import time
+import wave
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+import numpy as np
+
+from config import config
+from log_utils import get_logger
+
+logger = get_logger('口型')
+
+MODES = ('rms', 'bands')
+
+# mode=bands 时的频带（Hz）: 低频带能量占优为圆口（o/u），高频带占优为扁口（i/e）
+LOW_BAND = (150.0, 900.0)
+HIGH_BAND = (1800.0, 4000.0)
+
+# FFT 分块的帧数，限制长音频的临时内存
+_FFT_CHUNK_FRAMES = 1024
+
+
+class DecodedAudio:
+    """解码后的单声道音频"""
+    __slots__ = ('samples', 'sample_rate', 'source')
+
+    def __init__(self, samples, sample_rate, source=None):
+        self.samples = samples          # float32，范围 -1~1
+        self.sample_rate = sample_rate
+        self.source = source
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    @property
+    def nbytes(self):
+        return self.samples.nbytes
+
+
+def pcm_to_float(data, sample_width, channels):
+    """整数 PCM 转为单声道 float32（8 位为无符号，其余为有符号小端）"""
+    if sample_width == 1:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sample_width == 2:
+        samples = np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768.0
+    elif sample_width == 3:
+        raw = np.frombuffer(data[:len(data) // 3 * 3], dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        values = np.where(values & 0x800000, values - 0x1000000, values)
+        samples = values.astype(np.float32) / 8388608.0
+    elif sample_width == 4:
+        samples = np.frombuffer(data, dtype='<i4').astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f'不支持的采样位宽: {sample_width * 8} 位')
+    if channels > 1:
+        samples = samples[:len(samples) // channels * channels].reshape(-1, channels).mean(axis=1)
+    return samples
+
+
+def decode_wav(data, source=None):
+    """解码 WAV（PCM 编码）字节"""
+    try:
+        with wave.open(io.BytesIO(data)) as wav:
+            channels = wav.getnchannels()
+            sample_width = wav.getsampwidth()
+            sample_rate = wav.getframerate()
+            # 按文件头检查时长，超长音频不再读取和解码
+            if sample_rate and wav.getnframes() / sample_rate > config.LIP_SYNC_MAX_SECONDS:
+                raise ValueError(f'音频时长超过上限 {config.LIP_SYNC_MAX_SECONDS} 秒')
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError) as e:
+        raise ValueError(f'无法解析WAV: {e}')
+    return DecodedAudio(pcm_to_float(frames, sample_width, channels), sample_rate, source)
+
+
+def is_wav(data):
+    return data[:4] == b'RIFF'
+
+
+def check_pcm_size(size, sample_rate, channels=1, sample_width=2):
+    """检查裸 PCM 的格式参数，以及按字节数推算的时长是否超过上限（解码前调用）"""
+    if not sample_rate:
+        raise ValueError('裸PCM数据需要指定sample_rate')
+    if int(sample_rate) <= 0 or int(channels) <= 0 or int(sample_width) <= 0:
+        raise ValueError('sample_rate、channels和sample_width必须大于0')
+    if size > int(sample_rate) * int(channels) * int(sample_width) * config.LIP_SYNC_MAX_SECONDS:
+        raise ValueError(f'音频时长超过上限 {config.LIP_SYNC_MAX_SECONDS} 秒')
+
+
+def decode_buffer(data, sample_rate=None, channels=1, sample_width=2):
+    """以 RIFF 开头时按 WAV 解码，否则视为裸 PCM（需要给出采样率）"""
+    if is_wav(data):
+        return decode_wav(data, 'buffer')
+    check_pcm_size(len(data), sample_rate, channels, sample_width)
+    return DecodedAudio(pcm_to_float(data, int(sample_width), int(channels)), int(sample_rate), 'buffer')
+
+
+def _frames(samples, frame_length):
+    """按帧切分（末尾补零），返回 (帧数, 帧长) 视图"""
+    count = max(1, -(-len(samples) // frame_length))
+    padded = np.zeros(count * frame_length, dtype=np.float32)
+    padded[:len(samples)] = samples
+    return padded.reshape(count, frame_length)
+
+
+def envelope(audio, fps=None, mode='rms'):
+    """计算口型曲线，返回 (张嘴曲线, 口型曲线或 None)，每秒 fps 个点，取值分别为 0~1 与 -1~1"""
+    fps = fps or config.LIP_SYNC_FPS
+    frame_length = max(1, int(round(audio.sample_rate / fps)))
+    frames = _frames(audio.samples, frame_length)
+
+    rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    level_db = 20.0 * np.log10(np.maximum(rms, 1e-9))
+    silence, full = config.LIP_SYNC_SILENCE_DB, config.LIP_SYNC_FULL_DB
+    mouth_open = np.clip((level_db - silence) / (full - silence), 0.0, 1.0).astype(np.float32)
+    if mode != 'bands':
+        return mouth_open, None
+
+    # 各帧加窗后做 FFT，比较低/高频带能量
+    freqs = np.fft.rfftfreq(frame_length, 1.0 / audio.sample_rate)
+    low = (freqs >= LOW_BAND[0]) & (freqs < LOW_BAND[1])
+    high = (freqs >= HIGH_BAND[0]) & (freqs < HIGH_BAND[1])
+    window = np.hanning(frame_length).astype(np.float32)
+    ratio = np.empty(len(frames), dtype=np.float32)
+    for start in range(0, len(frames), _FFT_CHUNK_FRAMES):
+        power = np.abs(np.fft.rfft(frames[start:start + _FFT_CHUNK_FRAMES] * window, axis=1)) ** 2
+        low_energy = power[:, low].sum(axis=1)
+        high_energy = power[:, high].sum(axis=1)
+        ratio[start:start + len(power)] = high_energy / np.maximum(low_energy + high_energy, 1e-12)
+    # 高频占比 0.25 左右为中性口型，静音处回到中性
+    mouth_form = np.clip((ratio - 0.25) * 4.0, -1.0, 1.0) * (mouth_open > 0)
+    return mouth_open, mouth_form.astype(np.float32)
+
+
+class AudioCache:
+    """已解码音频的 LRU 缓存（按路径、修改时间和大小区分）"""
+
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes if max_bytes is not None else int(config.LIP_SYNC_CACHE_MB * 1024 * 1024)
+        self._entries = OrderedDict()   # {(路径, mtime_ns, 大小): DecodedAudio}，末尾为最近使用
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def load(self, path):
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return audio
+            self.misses += 1
+
+        with open(path, 'rb') as f:
+            audio = decode_wav(f.read(), path)
+
+        with self._lock:
+            if key not in self._entries and audio.nbytes <= self.max_bytes:
+                self._entries[key] = audio
+                self.bytes += audio.nbytes
+                while self.bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self.bytes -= evicted.nbytes
+                    self.evictions += 1
+        return audio
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def get_stats(self):
+        return {
+            'entries': len(self._entries),
+            'memory_mb': round(self.bytes / (1024 * 1024), 2),
+            'max_mb': round(self.max_bytes / (1024 * 1024), 2),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+class LipSyncClip:
+    """一段已分析的口型曲线（只读）"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, mouth_open, mouth_form, fps, start_at, source):
+        self.id = next(self._ids)
+        self.mouth_open = mouth_open
+        self.mouth_form = mouth_form
+        self.fps = fps
+        self.start_at = start_at    # 音频开始播放的时刻（time.time()）
+        self.source = source
+
+    @property
+    def duration(self):
+        return len(self.mouth_open) / self.fps
+
+    def to_dict(self, now=None):
+        now = now if now is not None else time.time()
+        return {
+            'id': self.id,
+            'source': self.source,
+            'duration': round(self.duration, 3),
+            'frames': len(self.mouth_open),
+            'fps': self.fps,
+            'mode': 'bands' if self.mouth_form is not None else 'rms',
+            'start_at': self.start_at,
+            'position': round(min(max(now - self.start_at, 0.0), self.duration), 3)
+        }
+
+
+class LipSyncEngine:
+    """在工作线程上分析音频，渲染线程按时钟播放当前曲线"""
+
+    def __init__(self):
+        self.cache = AudioCache()
+        self.clip = None             # 当前曲线，整体替换，渲染线程直接取引用
+        self._closing = None         # 曲线结束或停止后还需写入一次的闭嘴值
+        self._executor = None
+        self._lock = threading.Lock()
+        self._sequence = 0           # 每次提交和停止时递增，分析完成时序号已变的结果不再播放
+        self.analyzed = 0
+        self.last_analysis_ms = 0.0
+        self.listeners = []          # 新曲线就绪回调，例如唤醒渲染循环
+
+    @property
+    def active(self):
+        return self.clip is not None or self._closing is not None
+
+    def submit(self, loader, source, start_at=None, mode='rms'):
+        """提交分析任务，完成后立即替换当前曲线；返回 Future（结果为 LipSyncClip）
+
+        loader() 在工作线程上返回 DecodedAudio；start_at 为音频开始播放的时刻，缺省为分析完成时
+        分析完成前调用了 stop() 或提交了新的任务时，结果不再播放，Future 抛出 CancelledError
+        """
+        if mode not in MODES:
+            raise ValueError(f'未知的口型模式: {mode}（可选: {", ".join(MODES)}）')
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='lip-sync')
+            self._sequence += 1
+            sequence = self._sequence
+        return self._executor.submit(self._analyze, sequence, loader, source, start_at, mode)
+
+    def _analyze(self, sequence, loader, source, start_at, mode):
+        if sequence != self._sequence:
+            raise CancelledError()
+        start = time.perf_counter()
+        audio = loader()
+        if audio.duration > config.LIP_SYNC_MAX_SECONDS:
+            raise ValueError(f'音频时长超过上限 {config.LIP_SYNC_MAX_SECONDS} 秒')
+        mouth_open, mouth_form = envelope(audio, config.LIP_SYNC_FPS, mode)
+        clip = LipSyncClip(mouth_open, mouth_form, config.LIP_SYNC_FPS,
+                           start_at if start_at is not None else time.time(), source)
+        self.last_analysis_ms = (time.perf_counter() - start) * 1000.0
+        self.analyzed += 1
+        with self._lock:
+            if sequence != self._sequence:
+                logger.debug("口型曲线已被停止或取代，不再播放: %s", source)
+                raise CancelledError()
+            self.clip = clip
+        for listener in self.listeners:
+            listener()
+        logger.debug("口型曲线就绪: %s (%.2fs, %d 点, 分析 %.1fms)", source, clip.duration,
+                     len(mouth_open), self.last_analysis_ms)
+        return clip
+
+    @staticmethod
+    def _closed(clip):
+        return 0.0, (0.0 if clip.mouth_form is not None else None)
+
+    def stop(self):
+        """停止当前曲线，并丢弃尚未完成的分析"""
+        with self._lock:
+            self._sequence += 1
+            clip = self.clip
+            if clip is not None:
+                self.clip = None
+                self._closing = self._closed(clip)
+
+    def sample(self, now):
+        """渲染线程: 返回当前时刻的 (张嘴值, 口型值或 None)，无需写入时返回 None"""
+        clip = self.clip
+        if clip is None:
+            closing, self._closing = self._closing, None
+            return closing
+        position = now - clip.start_at
+        if position < 0:
+            # 音频尚未开始
+            return None
+        i = int(position * clip.fps)
+        if i >= len(clip.mouth_open):
+            if self.clip is clip:
+                self.clip = None
+            return self._closed(clip)
+        form = float(clip.mouth_form[i]) if clip.mouth_form is not None else None
+        return float(clip.mouth_open[i]), form
+
+    def get_status(self):
+        clip = self.clip
+        return {
+            'active': self.active,
+            'clip': clip.to_dict() if clip else None,
+            'analyzed': self.analyzed,
+            'last_analysis_ms': round(self.last_analysis_ms, 3),
+            'cache': self.cache.get_stats()
+        }
+
+
+def allowed_audio_path(path, model_path=None):
+    """只允许读取模型目录（及配置的额外目录）下的音频文件，返回规范化的绝对路径"""
+    path = os.path.realpath(path)
+    roots = [config.MODELS_DIR] + list(config.LIP_SYNC_AUDIO_DIRS)
+    if model_path:
+        roots.append(os.path.dirname(model_path))
+    for root in roots:
+        root = os.path.realpath(root)
+        try:
+            if os.path.commonpath([path, root]) == root:
+                return path
+        except ValueError:
+            # Windows 下不同盘符
+            continue
+    raise PermissionError(f'不允许读取该路径: {path}')
+
+
+# 创建全局实例
+lip_sync = LipSyncEngine()
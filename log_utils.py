@@ -0,0 +1,92 @@
+"""
+日志工具
+分级日志 + 后台队列输出：调用线程只把日志记录放入队列，由后台线程写到控制台，渲染线程不会阻塞在 I/O 上
+热路径日志可通过 throttle() 限流，同一 key 在间隔内只输出一次，并在下次输出时附带被抑制的条数
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+from config import config
+
+ROOT_LOGGER_NAME = 'live2d_desktop'
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+class _TagFormatter(logging.Formatter):
+    """以 [模块标签] 开头的格式，与原有控制台输出保持一致"""
+
+    def format(self, record):
+        record.tag = record.name.rsplit('.', 1)[-1]
+        return super().format(record)
+
+
+class ThrottleFilter(logging.Filter):
+    """按 throttle_key 对日志限流"""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._state = {}  # {key: [上次输出时间, 期间被抑制的条数]}
+
+    def filter(self, record):
+        key = getattr(record, 'throttle_key', None)
+        if key is None:
+            return True
+
+        interval = getattr(record, 'throttle_interval', None) or config.LOG_THROTTLE_INTERVAL
+        now = time.monotonic()
+        with self._lock:
+            state = self._state.setdefault(key, [float('-inf'), 0])
+            if now - state[0] < interval:
+                state[1] += 1
+                return False
+            suppressed = state[1]
+            state[0] = now
+            state[1] = 0
+
+        if suppressed:
+            record.msg = f"{record.msg} (期间另有 {suppressed} 条相同日志被抑制)"
+        return True
+
+
+def throttle(key, interval=None):
+    """生成限流用的 extra 参数: logger.error(..., extra=throttle('update'))"""
+    return {'throttle_key': key, 'throttle_interval': interval}
+
+
+def setup_logging():
+    """安装队列日志处理器（重复调用无副作用）"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(_TagFormatter('[%(tag)s] %(message)s'))
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = logging.handlers.QueueHandler(log_queue)
+        queue_handler.addFilter(ThrottleFilter())
+
+        root = logging.getLogger(ROOT_LOGGER_NAME)
+        root.setLevel(getattr(logging, str(config.LOG_LEVEL).upper(), logging.INFO))
+        root.addHandler(queue_handler)
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(log_queue, console, respect_handler_level=True)
+        _listener.start()
+        # 退出时把队列中剩余的日志写完
+        atexit.register(_listener.stop)
+
+
+def get_logger(tag):
+    """获取带模块标签的日志器，例如 get_logger('Live2D')"""
+    setup_logging()
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{tag}")
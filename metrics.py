@@ -0,0 +1,190 @@
+"""
+Prometheus 文本格式指标
+请求计数按线程分片累加：每个线程只写自己的分片，不加锁；抓取时再把所有分片相加
+"""
+import bisect
+import threading
+import time
+
+import frame_timing
+
+# 请求耗时直方图分桶上界（秒）
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# 分片数超过该值时，把已结束线程的分片合并掉（werkzeug 开发服务器每个请求一个线程）
+_SHARD_COMPACT_THRESHOLD = 64
+
+
+class _Shard:
+    """单个线程的计数分片"""
+    __slots__ = ('thread', 'in_flight', 'requests', 'latency')
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.in_flight = 0
+        self.requests = {}  # {(route, method, status): 次数}
+        self.latency = {}   # {(route, method): [各分桶次数..., 超出最大分桶的次数, 耗时总和]}
+
+
+class RequestMetrics:
+    """按线程分片的请求计数和耗时直方图"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()  # 只在线程首次请求和抓取时使用
+        self._retired = _Shard(None)          # 已结束线程的合并结果
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = _Shard(threading.current_thread())
+            self._local.shard = shard
+            with self._shards_lock:
+                if len(self._shards) >= _SHARD_COMPACT_THRESHOLD:
+                    self._compact()
+                self._shards.append(shard)
+        return shard
+
+    def _compact(self):
+        """把已结束线程的分片合并到 _retired（调用方持有 _shards_lock）"""
+        alive = []
+        for shard in self._shards:
+            if shard.thread.is_alive():
+                alive.append(shard)
+            else:
+                self._merge(self._retired, shard)
+        self._shards = alive
+
+    @staticmethod
+    def _merge(target, shard):
+        # 分片的所有者线程可能正在写入：先取快照（list() 在 GIL 下一次完成）再遍历，避免字典在迭代中改变大小
+        target.in_flight += shard.in_flight
+        for key, count in list(shard.requests.items()):
+            target.requests[key] = target.requests.get(key, 0) + count
+        for key, counts in list(shard.latency.items()):
+            counts = list(counts)
+            merged = target.latency.get(key)
+            if merged is None:
+                target.latency[key] = counts
+            else:
+                for i, value in enumerate(counts):
+                    merged[i] += value
+
+    def begin(self):
+        """请求开始，返回计时起点"""
+        self._shard().in_flight += 1
+        return time.perf_counter()
+
+    def end(self, route, method, status, start):
+        """请求结束，记录次数和耗时"""
+        elapsed = time.perf_counter() - start
+        shard = self._shard()
+        shard.in_flight -= 1
+
+        key = (route, method, status)
+        shard.requests[key] = shard.requests.get(key, 0) + 1
+
+        key = (route, method)
+        counts = shard.latency.get(key)
+        if counts is None:
+            counts = shard.latency[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect.bisect_left(self.buckets, elapsed)] += 1
+        counts[-1] += elapsed
+
+    def snapshot(self):
+        """合并所有分片，返回一个汇总分片"""
+        total = _Shard(None)
+        with self._shards_lock:
+            self._compact()
+            self._merge(total, self._retired)
+            for shard in self._shards:
+                self._merge(total, shard)
+        return total
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _format_float(value):
+    return repr(float(value))
+
+
+def _histogram(lines, name, bounds, counts, total, count, **labels):
+    """输出直方图序列；counts 为非累计的各分桶次数（最后一项为超出最大上界的次数）"""
+    cumulative = 0
+    for bound, bucket_count in zip(bounds, counts):
+        cumulative += bucket_count
+        lines.append(f'{name}_bucket{_labels(**labels, le=_format_float(bound))} {cumulative}')
+    lines.append(f'{name}_bucket{_labels(**labels, le="+Inf")} {count}')
+    suffix = _labels(**labels) if labels else ''
+    lines.append(f'{name}_sum{suffix} {_format_float(total)}')
+    lines.append(f'{name}_count{suffix} {count}')
+
+
+def render_prometheus(request_metrics, controller, response_cache=None):
+    """生成 Prometheus 文本格式（0.0.4）"""
+    lines = []
+    totals = request_metrics.snapshot()
+
+    lines.append('# HELP live2d_http_requests_total HTTP requests handled, by route, method and status.')
+    lines.append('# TYPE live2d_http_requests_total counter')
+    for (route, method, status), count in sorted(totals.requests.items()):
+        lines.append(f'live2d_http_requests_total{_labels(route=route, method=method, status=status)} {count}')
+
+    lines.append('# HELP live2d_http_request_duration_seconds HTTP request latency, by route and method.')
+    lines.append('# TYPE live2d_http_request_duration_seconds histogram')
+    for (route, method), counts in sorted(totals.latency.items()):
+        buckets = counts[:-1]
+        _histogram(lines, 'live2d_http_request_duration_seconds', request_metrics.buckets,
+                   buckets, counts[-1], sum(buckets), route=route, method=method)
+
+    lines.append('# HELP live2d_http_requests_in_flight HTTP requests currently being handled.')
+    lines.append('# TYPE live2d_http_requests_in_flight gauge')
+    lines.append(f'live2d_http_requests_in_flight {totals.in_flight}')
+
+    lines.append('# HELP live2d_render_fps Achieved render frame rate.')
+    lines.append('# TYPE live2d_render_fps gauge')
+    lines.append(f'live2d_render_fps {_format_float(controller.scheduler.measured_fps)}')
+
+    timings = controller.timings
+    frame_bounds = [round(edge / 1000.0, 6) for edge in frame_timing.FRAME_HISTOGRAM_BOUNDS_MS]
+    lines.append('# HELP live2d_frame_time_seconds Time spent rendering each frame.')
+    lines.append('# TYPE live2d_frame_time_seconds histogram')
+    _histogram(lines, 'live2d_frame_time_seconds', frame_bounds, list(timings.frame_histogram),
+               timings.frame_time_sum / 1000.0, timings.frame_count)
+
+    lines.append('# HELP live2d_smoothing_active_parameters Parameters still converging in the smoothing engine.')
+    lines.append('# TYPE live2d_smoothing_active_parameters gauge')
+    lines.append(f'live2d_smoothing_active_parameters {controller.smoothing.active_count}')
+
+    now = time.time()
+    locked = sum(1 for expire_time in list(controller.locked_parameters.values()) if expire_time > now)
+    lines.append('# HELP live2d_locked_parameters Parameters locked against automatic animation.')
+    lines.append('# TYPE live2d_locked_parameters gauge')
+    lines.append(f'live2d_locked_parameters {locked}')
+
+    lines.append('# HELP live2d_model_load_duration_seconds Duration of the last successful model load.')
+    lines.append('# TYPE live2d_model_load_duration_seconds gauge')
+    if controller.load_duration is not None:
+        lines.append(f'live2d_model_load_duration_seconds {_format_float(controller.load_duration)}')
+
+    lines.append('# HELP live2d_model_loads_total Successful model loads.')
+    lines.append('# TYPE live2d_model_loads_total counter')
+    lines.append(f'live2d_model_loads_total {controller.load_count}')
+
+    if response_cache is not None:
+        cache_stats = response_cache.get_stats()
+        for name, field in (('hits', 'hits'), ('misses', 'misses')):
+            lines.append(f'# HELP live2d_response_cache_{name}_total Introspection response cache {name}, by route.')
+            lines.append(f'# TYPE live2d_response_cache_{name}_total counter')
+            for route, stats in cache_stats['routes'].items():
+                lines.append(f'live2d_response_cache_{name}_total{_labels(route=route)} {stats[field]}')
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,206 @@
+"""
+模型目录索引
+启动时从磁盘缓存加载，按目录修改时间和文件大小增量刷新，由后台线程定期检查变化，
+GET /models 直接从内存应答，无需每次遍历模型目录（网络共享上数百个模型时尤其明显）
+"""
+import json
+import os
+import threading
+
+from config import config
+from log_utils import get_logger
+
+logger = get_logger('模型目录')
+
+CACHE_VERSION = 1
+
+
+def _stat_signature(path):
+    """(修改时间纳秒, 大小)，路径不存在时返回 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+class ModelCatalog:
+    """模型目录索引"""
+
+    def __init__(self, models_dir, cache_path=None):
+        self.models_dir = models_dir
+        self.cache_path = cache_path
+        self.version = 0          # 每次内容变化加一，可用作客户端缓存标识
+        self._entries = {}        # {模型名: 条目}，刷新时整体替换，读取无需加锁
+        self._root_signature = None
+        self._refresh_lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load_cache()
+            self.refresh()
+
+    def load_cache(self):
+        """从磁盘缓存恢复索引（缓存无效时忽略）"""
+        self._loaded = True
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return False
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('cache_version') != CACHE_VERSION or data.get('models_dir') != os.path.abspath(self.models_dir):
+                return False
+            self._entries = data['entries']
+            self._root_signature = data.get('root_signature')
+            self.version += 1
+            return True
+        except Exception as e:
+            logger.warning("读取模型目录缓存失败: %s", e)
+            return False
+
+    def _save_cache(self):
+        if not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = self.cache_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'cache_version': CACHE_VERSION,
+                    'models_dir': os.path.abspath(self.models_dir),
+                    'root_signature': self._root_signature,
+                    'entries': self._entries
+                }, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logger.warning("写入模型目录缓存失败: %s", e)
+
+    def _scan_model(self, name, model_path, dir_signature):
+        """扫描单个模型目录，读取第一个 .json 文件作为模型信息"""
+        entry = {
+            'name': name,
+            'path': model_path,
+            'json_file': None,
+            'info': None,
+            'dir_signature': dir_signature,
+            'json_signature': None
+        }
+        for file in os.listdir(model_path):
+            if file.endswith('.json'):
+                json_path = os.path.join(model_path, file)
+                try:
+                    with open(json_path, 'r', encoding='utf-8') as f:
+                        entry['info'] = json.load(f)
+                    entry['json_file'] = file
+                    entry['json_signature'] = _stat_signature(json_path)
+                    break
+                except Exception as e:
+                    logger.warning("读取模型信息失败: %s, 错误: %s", json_path, e)
+        return entry
+
+    def _is_current(self, entry, dir_signature):
+        """目录和模型 json 均未变化时可直接复用缓存条目"""
+        if entry.get('dir_signature') != dir_signature:
+            return False
+        if entry.get('json_file') is None:
+            return True
+        json_path = os.path.join(entry['path'], entry['json_file'])
+        return entry.get('json_signature') == _stat_signature(json_path)
+
+    def refresh(self):
+        """增量刷新索引，返回内容是否发生变化"""
+        with self._refresh_lock:
+            self._loaded = True
+            old_entries = self._entries
+
+            root_signature = _stat_signature(self.models_dir)
+            if root_signature is None:
+                names = []
+            elif root_signature == self._root_signature:
+                # 根目录未变化，模型集合不变，只需逐个检查已知模型
+                names = list(old_entries)
+            else:
+                names = [item for item in os.listdir(self.models_dir)
+                         if os.path.isdir(os.path.join(self.models_dir, item))]
+
+            entries = {}
+            changed = len(names) != len(old_entries)
+            for name in names:
+                model_path = os.path.join(self.models_dir, name)
+                dir_signature = _stat_signature(model_path)
+                if dir_signature is None:
+                    changed = True
+                    continue
+                entry = old_entries.get(name)
+                if entry is None or not self._is_current(entry, dir_signature):
+                    entry = self._scan_model(name, model_path, dir_signature)
+                    changed = True
+                entries[name] = entry
+
+            self._root_signature = root_signature
+            if changed:
+                self._entries = entries
+                self.version += 1
+                self._save_cache()
+            return changed
+
+    def names(self):
+        """所有模型名（保持目录遍历顺序）"""
+        self._ensure_loaded()
+        return list(self._entries)
+
+    def get(self, name):
+        self._ensure_loaded()
+        return self._entries.get(name)
+
+    def query(self, offset=0, limit=None, name_filter=None, include_info=True):
+        """分页查询，返回 (符合条件的总数, 当前页模型列表)"""
+        self._ensure_loaded()
+        entries = [entry for entry in self._entries.values() if entry['json_file']]
+        if name_filter:
+            keyword = name_filter.lower()
+            entries = [entry for entry in entries if keyword in entry['name'].lower()]
+
+        total = len(entries)
+        # 负数会被切片解释为从末尾计数，这里一律按 0 处理
+        offset = max(offset, 0)
+        page = entries[offset:offset + max(limit, 0) if limit is not None else None]
+        models = []
+        for entry in page:
+            model = {
+                'name': entry['name'],
+                'path': entry['path'],
+                'json_file': entry['json_file']
+            }
+            if include_info:
+                model['info'] = entry['info']
+            models.append(model)
+        return total, models
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                if self.refresh():
+                    logger.info("模型目录已更新: %d 个模型", len(self._entries))
+            except Exception as e:
+                logger.error("刷新模型目录失败: %s", e)
+
+    def start_watcher(self, interval=None):
+        """启动后台刷新线程"""
+        if self._watcher is not None:
+            return self._watcher
+        self._ensure_loaded()
+        interval = interval or config.MODEL_CATALOG_REFRESH_INTERVAL
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def stop_watcher(self):
+        self._stop.set()
+
+
+# 创建全局实例
+model_catalog = ModelCatalog(config.MODELS_DIR, config.MODEL_CATALOG_CACHE)
@@ -0,0 +1,325 @@
+"""
+分阶段模型加载
+- 工作线程: 查找 model3.json、解析 FileReferences、预读 moc/纹理/动作等文件（预热磁盘与系统缓存），
+  并构建动作与表情目录（解析 motion3.json / exp3.json）
+- 渲染线程: 创建模型（LoadModelJson）、分帧读取参数表、最后一次性切换为当前模型
+渲染线程上的阶段在每帧 config.MODEL_LOAD_FRAME_BUDGET_MS 预算内推进，切换前旧模型继续绘制
+注意: live2d 库的 LoadModelJson 在一次调用中完成纹理解码和上传，无法拆分到多帧，只能单独占用一帧
+"""
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from config import config
+from model_pool import estimate_model_memory
+from motion_catalog import MotionCatalog
+from log_utils import get_logger
+
+logger = get_logger('模型加载')
+
+_PREFETCH_CHUNK = 1024 * 1024
+
+# 各阶段在总进度中的占比
+_STAGE_WEIGHTS = (
+    ('discover', 0.05),
+    ('prefetch', 0.35),
+    ('create', 0.30),
+    ('parameters', 0.25),
+    ('activate', 0.05),
+)
+
+
+def referenced_files(model_json, references):
+    """model3.json 引用的全部文件（绝对路径）"""
+    model_dir = os.path.dirname(model_json)
+    files = []
+    for key in ('Moc', 'Physics', 'Pose', 'DisplayInfo', 'UserData'):
+        if references.get(key):
+            files.append(references[key])
+    files.extend(references.get('Textures', []))
+    for expression in references.get('Expressions', []):
+        if expression.get('File'):
+            files.append(expression['File'])
+    for motions in references.get('Motions', {}).values():
+        for motion in motions:
+            for key in ('File', 'Sound'):
+                if motion.get(key):
+                    files.append(motion[key])
+    return [os.path.join(model_dir, path) for path in files]
+
+
+class ModelLoadJob:
+    """一次模型加载任务"""
+
+    _ids = iter(range(1, 1 << 62))
+
+    def __init__(self, model_path, on_loaded=None):
+        self.id = next(self._ids)
+        self.model_path = model_path
+        self.on_loaded = on_loaded
+        self.future = Future()
+        self.future.set_running_or_notify_cancel()
+
+        self.stage = 'queued'
+        self.stage_progress = 0.0
+        self.stage_times = {}
+        self.error = None
+        self.cancelled = False
+        self.started_at = time.time()
+        self.finished_at = None
+        self._stage_start = time.perf_counter()
+
+        # 工作线程准备好后，渲染线程才开始推进
+        self.ready = False
+        self.model_json = None
+        self.memory_bytes = None
+        self.catalog = None
+        self.entry = None
+        self.param_entries = []
+        self.param_count = 0
+
+    def set_stage(self, stage):
+        now = time.perf_counter()
+        if self.stage != 'queued':
+            self.stage_times[self.stage] = round(now - self._stage_start, 4)
+        self._stage_start = now
+        self.stage = stage
+        self.stage_progress = 0.0
+
+    @property
+    def done(self):
+        return self.future.done()
+
+    @property
+    def progress(self):
+        total = 0.0
+        for stage, weight in _STAGE_WEIGHTS:
+            if stage == self.stage:
+                return round(total + weight * self.stage_progress, 3)
+            if stage in self.stage_times:
+                total += weight
+        return 1.0 if self.stage == 'done' else round(total, 3)
+
+    def finish(self):
+        self.set_stage('done')
+        self.finished_at = time.time()
+        self.future.set_result(True)
+
+    def fail(self, error, stage='failed'):
+        self.error = str(error)
+        self.set_stage(stage)
+        self.finished_at = time.time()
+        if not self.future.done():
+            self.future.set_exception(error if isinstance(error, Exception) else RuntimeError(error))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'model_path': self.model_path,
+            'model_json': self.model_json,
+            'stage': self.stage,
+            'progress': self.progress,
+            'stage_times': dict(self.stage_times),
+            'error': self.error,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class ModelLoader:
+    """分阶段模型加载器（每个控制器一个）"""
+
+    def __init__(self, controller):
+        self.controller = controller
+        self._executor = None
+        self._lock = threading.Lock()
+        self.current = None   # 进行中的任务
+        self.last = None      # 最近结束的任务
+        self._discarded = []  # 被取代的任务已创建的模型，等待渲染线程释放
+
+    @property
+    def busy(self):
+        return self.current is not None
+
+    def start(self, model_path, on_loaded=None):
+        """开始加载，返回任务；进行中的旧任务会被取消（旧模型继续绘制）"""
+        job = ModelLoadJob(model_path, on_loaded)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='model-loader')
+            previous = self.current
+            self.current = job
+            # 任务的结束状态只在持锁时改变: 渲染线程在创建和切换模型前持锁检查取消标记
+            if previous is not None and not previous.done:
+                previous.cancelled = True
+                previous.fail(RuntimeError('已被新的加载请求取代'), stage='cancelled')
+                # 旧任务创建的模型交给渲染线程释放，不随任务对象在API线程上析构
+                if previous.entry is not None:
+                    self._discarded.append(previous.entry)
+                    previous.entry = None
+                self.last = previous
+        self._executor.submit(self._prepare, job)
+        return job
+
+    def _prepare(self, job):
+        """工作线程: 查找、解析和预读模型文件"""
+        try:
+            if job.cancelled:
+                return
+            job.set_stage('discover')
+            job.model_json = self.controller._find_model_json(job.model_path)
+
+            if job.model_json not in self.controller.pool:
+                with open(job.model_json, 'r', encoding='utf-8') as f:
+                    references = json.load(f).get('FileReferences', {})
+                job.set_stage('prefetch')
+                self._prefetch(job, referenced_files(job.model_json, references))
+                job.memory_bytes = estimate_model_memory(job.model_json)
+                job.catalog = MotionCatalog.from_model_json(job.model_json, references)
+
+            if job.cancelled:
+                return
+            job.set_stage('create')
+            job.ready = True
+            # 唤醒渲染循环推进后续阶段
+            self.controller.scheduler.wake()
+        except Exception as e:
+            logger.error("模型加载失败: %s", e)
+            self._finish(job, error=e)
+
+    def _prefetch(self, job, files):
+        sizes = []
+        for path in files:
+            try:
+                sizes.append(os.path.getsize(path))
+            except OSError:
+                sizes.append(0)
+        total = sum(sizes) or 1
+        done = 0
+        for path, size in zip(files, sizes):
+            if job.cancelled:
+                return
+            if not size:
+                continue
+            with open(path, 'rb') as f:
+                while f.read(_PREFETCH_CHUNK):
+                    pass
+            done += size
+            job.stage_progress = done / total
+
+    def step(self, budget_ms=None):
+        """渲染线程: 在本帧预算内推进当前任务"""
+        if self._discarded:
+            self._release_discarded()
+        job = self.current
+        if job is None or not job.ready or job.done:
+            if job is not None and job.done:
+                self._clear(job)
+            return
+
+        budget = (budget_ms if budget_ms is not None else config.MODEL_LOAD_FRAME_BUDGET_MS) / 1000.0
+        deadline = time.perf_counter() + budget
+        controller = self.controller
+        try:
+            while True:
+                if job.stage == 'create':
+                    with self._lock:
+                        if job.cancelled:
+                            return
+                    entry = controller.pool.get(job.model_json)
+                    created = entry is None
+                    if created:
+                        entry = controller._create_pool_entry(job.model_json, job.memory_bytes, job.catalog)
+                    with self._lock:
+                        if job.cancelled:
+                            # 创建期间被取代: 新模型随局部变量在渲染线程上释放
+                            return
+                        job.entry = entry
+                    model = entry.model
+                    job.param_count = model.GetParameterCount() if model else 0
+                    job.set_stage('parameters')
+                    if created:
+                        # LoadModelJson 通常已用完本帧预算，剩余阶段留到下一帧
+                        return
+
+                elif job.stage == 'parameters':
+                    entry = job.entry
+                    if entry is None:
+                        # 已被取代，模型已交给渲染线程释放
+                        return
+                    model = entry.model
+                    while len(job.param_entries) < job.param_count:
+                        job.param_entries.append(controller._read_parameter_entry(model, len(job.param_entries)))
+                        if job.cancelled:
+                            return
+                        if time.perf_counter() >= deadline:
+                            job.stage_progress = len(job.param_entries) / job.param_count
+                            return
+                    job.set_stage('activate')
+
+                elif job.stage == 'activate':
+                    # 检查、切换和结束在同一次持锁内完成，start() 无法在其间取代本任务
+                    with controller.lock, self._lock:
+                        if job.cancelled:
+                            return
+                        controller._activate_model(job.entry, job.param_entries if job.entry.model else None)
+                        for evicted in controller.pool.add(job.entry):
+                            logger.info("模型池超出预算，释放模型: %s", evicted.model_json)
+                        controller.load_duration = time.time() - job.started_at
+                        controller.load_count += 1
+                        job.finish()
+                    logger.info("模型加载成功: %s (%.3fs)", job.model_json, controller.load_duration)
+                    self._loaded(job)
+                    return
+
+                if time.perf_counter() >= deadline:
+                    return
+        except Exception as e:
+            logger.exception("模型加载失败: %s", e)
+            self._finish(job, error=e)
+
+    def _finish(self, job, error):
+        """加载失败；已被取代（或已结束）的任务不再改变结果"""
+        with self._lock:
+            if not job.done:
+                job.fail(error)
+            # 未切换的模型随局部变量在这里释放（工作线程上失败时尚未创建模型，只有渲染线程会持有模型）
+            entry, job.entry = job.entry, None
+        self._clear(job)
+
+    def _loaded(self, job):
+        """加载成功（任务已在切换模型时结束）"""
+        if job.on_loaded is not None:
+            try:
+                job.on_loaded(job)
+            except Exception as e:
+                logger.error("模型加载回调失败: %s", e)
+        # 模型已由模型池和控制器持有，结束的任务不再引用，避免任务对象在其他线程上最后析构模型
+        job.entry = None
+        self._clear(job)
+
+    def _release_discarded(self):
+        """渲染线程: 释放被取代的任务创建的模型（live2d 库在析构时回收 GL 资源）"""
+        with self._lock:
+            discarded, self._discarded = self._discarded, []
+        for entry in discarded:
+            if entry.model_json not in self.controller.pool:
+                logger.info("释放被取代的加载任务创建的模型: %s", entry.model_json)
+
+    def _clear(self, job):
+        with self._lock:
+            if self.current is job:
+                self.current = None
+                self.last = job
+
+    def get_status(self):
+        """当前任务和最近结束的任务"""
+        current = self.current
+        last = self.last
+        return {
+            'loading': current is not None,
+            'current': current.to_dict() if current else None,
+            'last': last.to_dict() if last else None
+        }
@@ -0,0 +1,136 @@
+"""
+模型常驻池
+在同一个 GL 上下文中保留若干已加载的 LAppModel，切换模型时只需改变绘制对象；
+超出数量上限或内存预算时按最近最少使用（LRU）淘汰
+淘汰即释放模型引用，由 live2d 库在析构时回收 GL 资源，因此只能在渲染线程上调用
+"""
+import json
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def _texture_bytes(texture_path):
+    """按 RGBA8 估算纹理显存占用；非 PNG 时退化为文件大小"""
+    try:
+        with open(texture_path, 'rb') as f:
+            header = f.read(24)
+        if header[:8] == _PNG_SIGNATURE and header[12:16] == b'IHDR':
+            width, height = struct.unpack('>II', header[16:24])
+            return width * height * 4
+        return os.path.getsize(texture_path)
+    except OSError:
+        return 0
+
+
+def estimate_model_memory(model_json):
+    """根据 model3.json 引用的 moc 和纹理估算模型内存占用（字节）"""
+    model_dir = os.path.dirname(model_json)
+    with open(model_json, 'r', encoding='utf-8') as f:
+        references = json.load(f).get('FileReferences', {})
+
+    total = 0
+    moc = references.get('Moc')
+    if moc:
+        try:
+            total += os.path.getsize(os.path.join(model_dir, moc))
+        except OSError:
+            pass
+    for texture in references.get('Textures', []):
+        total += _texture_bytes(os.path.join(model_dir, texture))
+    return total
+
+
+class PoolEntry:
+    """池中的一个模型"""
+    __slots__ = ('model_json', 'model', 'memory_bytes', 'load_duration', 'loaded_at', 'last_used', 'hits', 'catalog')
+
+    def __init__(self, model_json, model, memory_bytes, load_duration, catalog=None):
+        self.model_json = model_json
+        self.model = model
+        self.memory_bytes = memory_bytes
+        self.load_duration = load_duration
+        self.catalog = catalog  # 动作与表情目录（MotionCatalog）
+        self.loaded_at = time.time()
+        self.last_used = self.loaded_at
+        self.hits = 0
+
+    def to_dict(self):
+        return {
+            'model_json': self.model_json,
+            'memory_mb': round(self.memory_bytes / (1024 * 1024), 2),
+            'load_duration': round(self.load_duration, 3),
+            'loaded_at': self.loaded_at,
+            'last_used': self.last_used,
+            'hits': self.hits
+        }
+
+
+class ModelPool:
+    """按 LRU 淘汰的模型池"""
+
+    def __init__(self, max_models, memory_budget_mb):
+        self.max_models = max_models
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024)
+        self._entries = OrderedDict()  # {model_json: PoolEntry}，末尾为最近使用
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __contains__(self, model_json):
+        with self._lock:
+            return model_json in self._entries
+
+    def get(self, model_json):
+        """取出池中的模型并标记为最近使用，不存在时返回 None"""
+        with self._lock:
+            entry = self._entries.get(model_json)
+            if entry is not None:
+                self._entries.move_to_end(model_json)
+                entry.last_used = time.time()
+                entry.hits += 1
+            return entry
+
+    def add(self, entry):
+        """放入模型并按预算淘汰，返回被淘汰的条目；刚放入的模型不会被淘汰"""
+        with self._lock:
+            self._entries[entry.model_json] = entry
+            self._entries.move_to_end(entry.model_json)
+            entry.last_used = time.time()
+
+            evicted = []
+            while len(self._entries) > 1 and (len(self._entries) > self.max_models
+                                              or self._memory_bytes() > self.memory_budget):
+                _, oldest = self._entries.popitem(last=False)
+                evicted.append(oldest)
+            self.evictions += len(evicted)
+            return evicted
+
+    def remove(self, model_json):
+        with self._lock:
+            return self._entries.pop(model_json, None)
+
+    def _memory_bytes(self):
+        return sum(entry.memory_bytes for entry in self._entries.values())
+
+    def get_stats(self, active_json=None):
+        """池状态: 常驻模型（按最近使用倒序）及内存占用"""
+        with self._lock:
+            entries = list(reversed(self._entries.values()))
+            memory = self._memory_bytes()
+        models = []
+        for entry in entries:
+            info = entry.to_dict()
+            info['active'] = entry.model_json == active_json
+            models.append(info)
+        return {
+            'models': models,
+            'count': len(models),
+            'max_models': self.max_models,
+            'memory_mb': round(memory / (1024 * 1024), 2),
+            'memory_budget_mb': round(self.memory_budget / (1024 * 1024), 2),
+            'evictions': self.evictions
+        }
@@ -0,0 +1,162 @@
+"""
+动作与表情目录
+加载模型时解析一次 model3.json 的 FileReferences（在加载工作线程上），记录动作组、序号、时长、淡入淡出时间、
+表情和音频路径，并把 motion3.json / exp3.json 解析后缓存在内存中；
+播放与信息查询只做字典查找，名称不存在时直接拒绝，不进入原生代码
+"""
+import json
+import os
+
+from log_utils import get_logger
+
+logger = get_logger('动作目录')
+
+# Cubism 未指定淡入淡出时间时的默认值（秒）
+DEFAULT_FADE_TIME = 1.0
+
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _fade(entry_value, file_value):
+    """model3.json 中的设置优先，其次是动作/表情文件中的设置"""
+    for value in (entry_value, file_value):
+        if value is not None and value >= 0:
+            return float(value)
+    return DEFAULT_FADE_TIME
+
+
+class MotionInfo:
+    """一个动作"""
+    __slots__ = ('group', 'index', 'file', 'path', 'sound', 'duration', 'fps', 'loop',
+                 'fade_in', 'fade_out', 'curve_count', 'data')
+
+    def __init__(self, group, index, entry, model_dir):
+        self.group = group
+        self.index = index
+        self.file = entry.get('File')
+        self.path = os.path.join(model_dir, self.file) if self.file else None
+        self.sound = os.path.join(model_dir, entry['Sound']) if entry.get('Sound') else None
+
+        self.data = None
+        meta = {}
+        if self.path:
+            try:
+                self.data = _read_json(self.path)
+                meta = self.data.get('Meta', {})
+            except (OSError, ValueError) as e:
+                logger.warning("读取动作文件失败: %s, 错误: %s", self.path, e)
+        self.duration = meta.get('Duration')
+        self.fps = meta.get('Fps')
+        self.loop = bool(meta.get('Loop', False))
+        self.curve_count = meta.get('CurveCount')
+        self.fade_in = _fade(entry.get('FadeInTime'), meta.get('FadeInTime'))
+        self.fade_out = _fade(entry.get('FadeOutTime'), meta.get('FadeOutTime'))
+
+    def to_dict(self):
+        return {
+            'group': self.group,
+            'index': self.index,
+            'file': self.file,
+            'sound': self.sound,
+            'duration': self.duration,
+            'fps': self.fps,
+            'loop': self.loop,
+            'fade_in': self.fade_in,
+            'fade_out': self.fade_out,
+            'curve_count': self.curve_count
+        }
+
+
+class ExpressionInfo:
+    """一个表情"""
+    __slots__ = ('name', 'file', 'path', 'fade_in', 'fade_out', 'parameter_count', 'data')
+
+    def __init__(self, entry, model_dir):
+        self.name = entry.get('Name')
+        self.file = entry.get('File')
+        self.path = os.path.join(model_dir, self.file) if self.file else None
+
+        self.data = None
+        if self.path:
+            try:
+                self.data = _read_json(self.path)
+            except (OSError, ValueError) as e:
+                logger.warning("读取表情文件失败: %s, 错误: %s", self.path, e)
+        data = self.data or {}
+        self.fade_in = _fade(None, data.get('FadeInTime'))
+        self.fade_out = _fade(None, data.get('FadeOutTime'))
+        self.parameter_count = len(data.get('Parameters', []))
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'file': self.file,
+            'fade_in': self.fade_in,
+            'fade_out': self.fade_out,
+            'parameter_count': self.parameter_count
+        }
+
+
+class MotionCatalog:
+    """一个模型的动作与表情目录，构建后只读"""
+
+    def __init__(self, model_json=None, references=None):
+        self.model_json = model_json
+        self.motions = {}       # {动作组: [MotionInfo, ...]}（保持 model3.json 中的顺序）
+        self.expressions = {}   # {表情名: ExpressionInfo}
+        if model_json:
+            self._build(model_json, references)
+
+    @classmethod
+    def from_model_json(cls, model_json, references=None):
+        """解析 model3.json（references 为已读取的 FileReferences 时不再重复读取）"""
+        try:
+            return cls(model_json, references)
+        except (OSError, ValueError) as e:
+            logger.error("解析动作目录失败: %s, 错误: %s", model_json, e)
+            return cls()
+
+    def _build(self, model_json, references):
+        if references is None:
+            references = _read_json(model_json).get('FileReferences', {})
+        model_dir = os.path.dirname(model_json)
+
+        for group, entries in references.get('Motions', {}).items():
+            self.motions[group] = [MotionInfo(group, i, entry, model_dir) for i, entry in enumerate(entries)]
+        for entry in references.get('Expressions', []):
+            expression = ExpressionInfo(entry, model_dir)
+            if expression.name:
+                self.expressions[expression.name] = expression
+
+        logger.info("动作目录: %d 个动作组, %d 个动作, %d 个表情", len(self.motions),
+                    sum(len(m) for m in self.motions.values()), len(self.expressions))
+
+    def get_motion(self, group, index):
+        """返回 MotionInfo，不存在时返回 None"""
+        motions = self.motions.get(group)
+        if motions is None or not isinstance(index, int) or not 0 <= index < len(motions):
+            return None
+        return motions[index]
+
+    def has_motion_group(self, group):
+        return group in self.motions
+
+    def get_expression(self, name):
+        return self.expressions.get(name)
+
+    def sound_path(self, group, index):
+        """动作对应的音频文件路径，动作不存在时返回 None，没有音频时返回空字符串"""
+        motion = self.get_motion(group, index)
+        if motion is None:
+            return None
+        return motion.sound or ''
+
+    def motion_groups(self):
+        """{动作组: 动作数量}，与原生 GetMotionGroups 相同的格式"""
+        return {group: len(motions) for group, motions in self.motions.items()}
+
+    def expression_ids(self):
+        return list(self.expressions)
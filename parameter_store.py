@@ -0,0 +1,151 @@
+"""
+模型参数表
+用连续的 float32 数组保存参数的当前值、范围和默认值，名称到索引的映射在加载时建立一次
+"""
+import hashlib
+import itertools
+import json
+import os
+from collections import namedtuple
+from collections.abc import Mapping
+
+import numpy as np
+
+# 每创建一张参数表递增一次，用于区分不同的模型加载
+_generation_counter = itertools.count(1)
+# 进程随机数: 重启后计数器从头开始，代号仍不会与上一个进程的相同
+_PROCESS_NONCE = os.urandom(16)
+
+
+def _next_generation(ids):
+    """参数表代号: 进程随机数、计数器和参数ID的散列（48 位整数，JSON/JavaScript 中可精确表示）"""
+    digest = hashlib.blake2b(digest_size=6, key=_PROCESS_NONCE)
+    digest.update(str(next(_generation_counter)).encode('ascii'))
+    digest.update('\0'.join(ids).encode('utf-8'))
+    return int.from_bytes(digest.digest(), 'little')
+
+# 参数的静态元数据，模型加载后不再变化
+ParameterInfo = namedtuple('ParameterInfo', ('index', 'id', 'min', 'max', 'default'))
+
+
+class ParameterStore:
+    """数组化的参数表"""
+
+    def __init__(self, entries=()):
+        self.load(entries)
+
+    def load(self, entries):
+        """从 (id, value, min, max, default) 序列重建参数表"""
+        entries = list(entries)
+        self.ids = [entry[0] for entry in entries]
+        self.index = {param_id: i for i, param_id in enumerate(self.ids)}
+
+        table = np.array([entry[1:5] for entry in entries], dtype=np.float32).reshape(-1, 4)
+        self.value = np.ascontiguousarray(table[:, 0])
+        self.min = np.ascontiguousarray(table[:, 1])
+        self.max = np.ascontiguousarray(table[:, 2])
+        self.default = np.ascontiguousarray(table[:, 3])
+        # 最近一次推送到原生模型的值，NaN 表示尚未推送
+        self.applied = np.full(len(self.ids), np.nan, dtype=np.float32)
+        # 通过 API 设置过的参数: 原生 Update() 每帧会重新载入保存的参数，并被呼吸、眨眼和动作覆盖，
+        # 这些参数收敛后也要每帧重新推送，用户设置的值才能保持
+        self.held = np.zeros(len(self.ids), dtype=bool)
+
+        # 静态元数据表：与参数表同生命周期，代号变化即失效
+        self.metadata = tuple(
+            ParameterInfo(i, param_id, float(self.min[i]), float(self.max[i]), float(self.default[i]))
+            for i, param_id in enumerate(self.ids)
+        )
+        self._metadata_json = None
+
+        self.generation = _next_generation(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, param_id):
+        return param_id in self.index
+
+    def index_of(self, param_id):
+        """获取参数索引，不存在时返回 None"""
+        return self.index.get(param_id)
+
+    def clamp(self, indices, values):
+        """按参数范围批量限制取值"""
+        return np.clip(np.asarray(values, dtype=np.float32), self.min[indices], self.max[indices])
+
+    def clamp_one(self, index, value):
+        """限制单个参数的取值"""
+        return min(max(float(value), float(self.min[index])), float(self.max[index]))
+
+    def hold(self, indices):
+        """标记参数为用户设置，之后每帧都推送到原生模型"""
+        self.held[indices] = True
+
+    def take_dirty(self, indices, values, epsilon):
+        """本帧需要推送的参数: 与上次推送值相差超过 epsilon 的参数，以及所有用户设置过的参数；记为已推送
+
+        indices/values 为本帧平滑输出的参数，调用前已写入 self.value
+        """
+        changed = ~(np.abs(values - self.applied[indices]) <= epsilon)
+        push = self.held.copy()
+        push[indices[changed]] = True
+        indices = np.flatnonzero(push)
+        values = self.value[indices]
+        self.applied[indices] = values
+        return indices, values
+
+    @property
+    def applied_count(self):
+        """推送过至少一次的参数数量"""
+        return int(np.count_nonzero(~np.isnan(self.applied)))
+
+    @property
+    def etag(self):
+        """元数据的实体标签（随代号变化）"""
+        return f'params-{self.generation}'
+
+    def metadata_json(self):
+        """序列化后的元数据（每张参数表只序列化一次）"""
+        if self._metadata_json is None:
+            self._metadata_json = json.dumps({
+                'success': True,
+                'generation': self.generation,
+                'parameter_count': len(self.ids),
+                'parameters': [info._asdict() for info in self.metadata]
+            }, ensure_ascii=False)
+        return self._metadata_json
+
+    def as_dict(self):
+        """返回 {参数名: 当前值}"""
+        return dict(zip(self.ids, self.value.tolist()))
+
+    def view(self):
+        """返回兼容旧接口的只读字典视图"""
+        return ParameterView(self)
+
+
+class ParameterView(Mapping):
+    """参数表的只读视图，保持 {name: {'index', 'value', 'min', 'max', 'default'}} 的访问方式"""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __getitem__(self, param_id):
+        i = self._store.index[param_id]
+        return {
+            'index': i,
+            'value': float(self._store.value[i]),
+            'default': float(self._store.default[i]),
+            'min': float(self._store.min[i]),
+            'max': float(self._store.max[i]),
+        }
+
+    def __contains__(self, param_id):
+        return param_id in self._store.index
+
+    def __iter__(self):
+        return iter(self._store.ids)
+
+    def __len__(self):
+        return len(self._store.ids)
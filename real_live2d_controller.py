@@ -7,31 +7,69 @@ import json
 import time
 import math
 import random
+import logging
 import threading
-import traceback
-from collections import deque
+
+import numpy as np
+
+from config import config
+from log_utils import get_logger, throttle
+
+logger = get_logger('Live2D')
 
 # 尝试导入live2d库
 try:
     import live2d.v3 as live2d
     LIVE2D_AVAILABLE = True
-    print("[Live2D] live2d库导入成功")
+    logger.info("live2d库导入成功")
 except ImportError as e:
     LIVE2D_AVAILABLE = False
-    print(f"[Live2D] 警告: live2d库未安装 - {e}")
-    print("[Live2D] 将使用模拟模式运行")
+    logger.warning("警告: live2d库未安装 - %s", e)
+    logger.warning("将使用模拟模式运行")
 
-from config import config
+from parameter_store import ParameterStore
+from smoothing_engine import SmoothingEngine
+from command_queue import CommandQueue
+from frame_scheduler import FrameScheduler
+from model_pool import ModelPool, PoolEntry, estimate_model_memory
+from model_loader import ModelLoader
+from response_cache import response_cache
+from motion_catalog import MotionCatalog
+from timeline_player import Timeline, TimelinePlayer
+from lip_sync import lip_sync
+import frame_timing
+
+# 参数对象上可能的属性名（按优先级）
+_DEFAULT_ATTRS = ('default', 'default_value', 'defaultValue')
+_MIN_ATTRS = ('min', 'min_value', 'minValue', 'minimum')
+_MAX_ATTRS = ('max', 'max_value', 'maxValue', 'maximum')
+
+def _first_attr(obj, names, fallback):
+    """返回第一个存在的属性值"""
+    for name in names:
+        value = getattr(obj, name, None)
+        if value is not None:
+            return value
+    return fallback
 
 class RealLive2DController:
     def __init__(self):
         self.model = None
         self.model_path = None
-        self.parameters = {}
-        self.expressions = {}
+        self.params = ParameterStore()
+        self.expressions = {}   # {表情名: exp3.json 路径}
         self.motions = {}
+        self.catalog = MotionCatalog()  # 当前模型的动作与表情目录
         self.is_initialized = False
         self.lock = threading.Lock()
+        self.canvas_size = (config.WINDOW_WIDTH, config.WINDOW_HEIGHT)
+        self.load_duration = None  # 上一次成功加载模型的耗时（秒）
+        self.load_count = 0
+        
+        # 模型池 - 已加载的模型常驻内存，切换时无需重新加载
+        self.pool = ModelPool(config.MODEL_POOL_MAX_MODELS, config.MODEL_POOL_MEMORY_BUDGET_MB)
+        # 分阶段加载 - 文件准备在工作线程，GL相关步骤在渲染线程分帧执行
+        self.loader = ModelLoader(self)
         
         # 动画状态
         self.current_expression = None
@@ -48,30 +86,78 @@ class RealLive2DController:
         self.locked_parameters = {}  # {param_name: expire_time}
         self.lock_duration = 5.0  # 锁定5秒
         
-        # 参数平滑机制 - 让参数变化更加自然流畅
-        self.parameter_queues = {}  # {param_name: deque([value1, value2, ...])}
-        self.queue_max_length = 5   # 保留最近5个值用于平滑
-        self.smoothing_enabled = True  # 是否启用平滑
+        # 参数平滑机制 - 让参数变化更加自然流畅（保留最近5帧的目标值用于平滑）
+        self.smoothing = SmoothingEngine(window=5)
+        
+        # 原生调用统计 - 只推送变化超过阈值的参数（脏集合）
+        self.native_calls = 0         # 上一帧实际调用 SetParameterValue 的次数
+        self.native_skipped = 0       # 上一帧因未变化而跳过的次数
+        self.native_calls_total = 0
+        self.native_skipped_total = 0
+        
+        # 关键帧时间轴 - 客户端一次上传，渲染线程每帧向量化求值
+        self.timelines = TimelinePlayer()
+        
+        # 命令队列 - API线程的修改统一在渲染线程的下一帧开始时执行
+        self.commands = CommandQueue()
+        self._reset_parameter_state()
+        
+        # 帧调度 - 有命令入队时唤醒渲染循环
+        self.scheduler = FrameScheduler()
+        self.commands.listeners.append(self.scheduler.wake)
+        lip_sync.listeners.append(self.scheduler.wake)
+        
+        # 逐帧分阶段计时（由渲染器开始/结束每一帧）
+        self.timings = frame_timing.FrameTimings()
+        
+        # 点击检测 - model3.json 中定义的点击区域名
+        self.hit_areas = []
         
         # 如果没有live2d库，创建模拟参数
         if not LIVE2D_AVAILABLE:
             self._create_mock_parameters()
     
+    @property
+    def parameters(self):
+        """参数表的只读字典视图（兼容旧接口）"""
+        return self.params.view()
+    
+    @property
+    def smoothing_enabled(self):
+        return self.smoothing.enabled
+    
+    @property
+    def queue_max_length(self):
+        return self.smoothing.window
+    
+    @property
+    def mock_mode(self):
+        """模拟模式（没有live2d库或尚未加载模型）: 动作和表情不按目录校验，直接模拟成功"""
+        return not (LIVE2D_AVAILABLE and self.model)
+    
     def _create_mock_parameters(self):
         """创建模拟参数（当live2d库不可用时）"""
-        self.parameters = {
-            'ParamAngleX': {'value': 0, 'min': -30, 'max': 30, 'default': 0},
-            'ParamAngleY': {'value': 0, 'min': -30, 'max': 30, 'default': 0},
-            'ParamAngleZ': {'value': 0, 'min': -30, 'max': 30, 'default': 0},
-            'ParamEyeBallX': {'value': 0, 'min': -1, 'max': 1, 'default': 0},
-            'ParamEyeBallY': {'value': 0, 'min': -1, 'max': 1, 'default': 0},
-            'ParamEyeLOpen': {'value': 1, 'min': 0, 'max': 1, 'default': 1},
-            'ParamEyeROpen': {'value': 1, 'min': 0, 'max': 1, 'default': 1},
-            'ParamMouthOpenY': {'value': 0, 'min': 0, 'max': 1, 'default': 0},
-            'ParamBrowLY': {'value': 0, 'min': -1, 'max': 1, 'default': 0},
-            'ParamBrowRY': {'value': 0, 'min': -1, 'max': 1, 'default': 0},
-            'ParamBreath': {'value': 0, 'min': 0, 'max': 1, 'default': 0},
-        }
+        # (id, value, min, max, default)
+        self.params.load([
+            ('ParamAngleX', 0, -30, 30, 0),
+            ('ParamAngleY', 0, -30, 30, 0),
+            ('ParamAngleZ', 0, -30, 30, 0),
+            ('ParamEyeBallX', 0, -1, 1, 0),
+            ('ParamEyeBallY', 0, -1, 1, 0),
+            ('ParamEyeLOpen', 1, 0, 1, 1),
+            ('ParamEyeROpen', 1, 0, 1, 1),
+            ('ParamMouthOpenY', 0, 0, 1, 0),
+            ('ParamBrowLY', 0, -1, 1, 0),
+            ('ParamBrowRY', 0, -1, 1, 0),
+            ('ParamBreath', 0, 0, 1, 0),
+        ])
+        self._reset_parameter_state()
+    
+    def _reset_parameter_state(self):
+        """参数表重建后同步重置平滑引擎、命令队列和时间轴"""
+        self.smoothing.reset(self.params.value)
+        self.commands.reset(len(self.params), self.params.generation)
+        self.timelines.clear()
         
     def initialize(self):
         """初始化Live2D引擎"""
@@ -80,118 +166,157 @@ class RealLive2DController:
                 live2d.init()
                 live2d.glInit()
                 self.is_initialized = True
-                print("[Live2D] 引擎初始化成功")
+                logger.info("引擎初始化成功")
             except Exception as e:
-                print(f"[Live2D] 引擎初始化失败: {e}")
+                logger.error("引擎初始化失败: %s", e)
         else:
-            print("[Live2D] 使用模拟模式初始化")
+            logger.info("使用模拟模式初始化")
             self.is_initialized = True
     
     def load_model(self, model_path):
-        """加载Live2D模型"""
-        with self.lock:
-            try:
-                print(f"[Live2D] 尝试加载模型: {model_path}")
-                
-                if not os.path.exists(model_path):
-                    raise FileNotFoundError(f"模型路径不存在: {model_path}")
-                
-                # 查找model3.json文件
-                model_json = None
-                if os.path.isdir(model_path):
-                    # # 首先检查是否有配置文件指向真正的model3.json
-                    # config_files = [f for f in os.listdir(model_path) if f.endswith('.json') and not f.endswith('.model3.json')]
-                    # for config_file in config_files:
-                    #     config_path = os.path.join(model_path, config_file)
-                    #     try:
-                    #         with open(config_path, 'r', encoding='utf-8') as f:
-                    #             config_data = json.load(f)
-                    #             if 'live2d_model' in config_data:
-                    #                 # 找到了配置中的模型路径
-                    #                 live2d_model_path = config_data['live2d_model'].replace('\\\\', os.sep)
-                    #                 model_json = os.path.join(model_path, live2d_model_path)
-                    #                 if os.path.exists(model_json):
-                    #                     break
-                    #     except:
-                    #         continue
-                    
-                    # # 如果没找到配置文件，直接查找.model3.json文件
-                    # if not model_json or not os.path.exists(model_json):
+        """加载Live2D模型，返回加载任务
+        
+        与 load_model_async 相同: 经分阶段加载器在渲染线程上创建和切换模型，
+        任何线程调用都不会在 GL 上下文之外创建或释放模型
+        """
+        return self.load_model_async(model_path)
+    
+    def load_model_async(self, model_path, on_loaded=None):
+        """分阶段加载模型，立即返回加载任务（job.future 在切换完成后返回 True）
 
-                    # 简化，强制直接获取live2d模型配置
-                    for root, dirs, files in os.walk(model_path):
-                        for file in files:
-                            if file.endswith('.model3.json'):
-                                model_json = os.path.join(root, file)
-                                break
-                        if model_json:
-                            break
-                else:
-                    model_json = model_path
-                
-                if not model_json or not os.path.exists(model_json):
-                    raise FileNotFoundError(f"找不到模型配置文件: {model_path}")
-                
-                print(f"[Live2D] 找到模型文件: {model_json}")
-                
-                if LIVE2D_AVAILABLE:
-                    # 使用真实的live2d库 - 尝试绝对路径方案
-                    if self.model:
-                        self.model = None
-                    
-                    # 创建新模型
-                    self.model = live2d.LAppModel()
-                    
-                    # 尝试方法1: 直接使用绝对路径 - 需要先切换到模型目录
-                    print(f"[Live2D] 尝试绝对路径方法（带目录切换）: {model_json}")
-                    
-                    # 保存当前工作目录  
-                    # original_cwd = os.getcwd()  # 不必保存目录
-                    try:
-                        # 切换到模型文件所在目录，确保纹理路径正确
-                        model_dir = os.path.dirname(os.path.abspath(model_json))
-                        # os.chdir(model_dir)  # 不必切换目录
-                        print(f"[Live2D] 工作目录已切换到: {model_dir}")
-                        
-                        # 使用绝对路径加载模型
-                        success = self.model.LoadModelJson(model_json)
-                        print(f"[Live2D] 绝对路径加载结果: {success}")
-                        
-                    finally:
-                        # 恢复原工作目录
-                        # os.chdir(original_cwd)
-                        pass
-                    
-                    if not success:
-                        print(f"[Live2D] 绝对路径方法报告失败，但让我们继续，也许模型实际上加载了")
-                    else:
-                        print(f"[Live2D] 绝对路径方法报告成功！")
-                    
-                    # 暂时不抛出错误，让程序继续运行
-                    
-                    # 设置模型属性
-                    self.model.Resize(config.WINDOW_WIDTH, config.WINDOW_HEIGHT)
-                    self.model.SetAutoBlinkEnable(True)  # 我们不自己控制眨眼
-                    self.model.SetAutoBreathEnable(True)  # 我们不自己控制呼吸
-                    
-                    self.model_path = model_json
-                    self._load_model_parameters()
-                    
-                else:
-                    # 模拟模式
-                    self.model_path = model_json
-                    print("[Live2D] 模拟模式 - 模型加载成功")
-                
-                # 尝试加载表情和动作
-                self._load_expressions()
+        可从任意线程调用；新模型就绪前继续绘制当前模型
+        """
+        return self.loader.start(model_path, on_loaded)
+    
+    def _find_model_json(self, model_path):
+        """查找模型目录中的 model3.json 文件"""
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"模型路径不存在: {model_path}")
+        
+        # 查找model3.json文件
+        model_json = None
+        if os.path.isdir(model_path):
+            # # 首先检查是否有配置文件指向真正的model3.json
+            # config_files = [f for f in os.listdir(model_path) if f.endswith('.json') and not f.endswith('.model3.json')]
+            # for config_file in config_files:
+            #     config_path = os.path.join(model_path, config_file)
+            #     try:
+            #         with open(config_path, 'r', encoding='utf-8') as f:
+            #             config_data = json.load(f)
+            #             if 'live2d_model' in config_data:
+            #                 # 找到了配置中的模型路径
+            #                 live2d_model_path = config_data['live2d_model'].replace('\\\\', os.sep)
+            #                 model_json = os.path.join(model_path, live2d_model_path)
+            #                 if os.path.exists(model_json):
+            #                     break
+            #     except:
+            #         continue
+            
+            # # 如果没找到配置文件，直接查找.model3.json文件
+            # if not model_json or not os.path.exists(model_json):
+
+            # 简化，强制直接获取live2d模型配置
+            for root, dirs, files in os.walk(model_path):
+                for file in files:
+                    if file.endswith('.model3.json'):
+                        model_json = os.path.join(root, file)
+                        break
+                if model_json:
+                    break
+        else:
+            model_json = model_path
+        
+        if not model_json or not os.path.exists(model_json):
+            raise FileNotFoundError(f"找不到模型配置文件: {model_path}")
+        
+        # 统一为绝对路径，作为模型池的键
+        return os.path.abspath(model_json)
+    
+    def _create_pool_entry(self, model_json, memory_bytes=None, catalog=None):
+        """冷加载一个模型，返回模型池条目（catalog 为工作线程已构建的动作目录）"""
+        load_start = time.perf_counter()
+        model = None
+        
+        if LIVE2D_AVAILABLE:
+            # 使用真实的live2d库 - 尝试绝对路径方案（不释放当前模型，它留在模型池中）
+            # 创建新模型
+            model = live2d.LAppModel()
+            
+            # 尝试方法1: 直接使用绝对路径 - 需要先切换到模型目录
+            logger.debug("尝试绝对路径方法（带目录切换）: %s", model_json)
+            
+            # 保存当前工作目录  
+            # original_cwd = os.getcwd()  # 不必保存目录
+            try:
+                # 切换到模型文件所在目录，确保纹理路径正确
+                model_dir = os.path.dirname(os.path.abspath(model_json))
+                # os.chdir(model_dir)  # 不必切换目录
+                logger.debug("工作目录已切换到: %s", model_dir)
                 
-                print(f"[Live2D] 模型加载成功: {model_json}")
-                return True
+                # 使用绝对路径加载模型
+                success = model.LoadModelJson(model_json)
+                logger.debug("绝对路径加载结果: %s", success)
                 
+            finally:
+                # 恢复原工作目录
+                # os.chdir(original_cwd)
+                pass
+            
+            if not success:
+                logger.warning("绝对路径方法报告失败，但让我们继续，也许模型实际上加载了")
+            else:
+                logger.debug("绝对路径方法报告成功！")
+            
+            # 暂时不抛出错误，让程序继续运行
+            
+            # 设置模型属性
+            model.SetAutoBlinkEnable(True)  # 我们不自己控制眨眼
+            model.SetAutoBreathEnable(True)  # 我们不自己控制呼吸
+            
+        else:
+            # 模拟模式
+            logger.info("模拟模式 - 模型加载成功")
+        
+        if memory_bytes is None:
+            try:
+                memory_bytes = estimate_model_memory(model_json)
             except Exception as e:
-                print(f"[Live2D] 模型加载失败: {e}")
-                traceback.print_exc()
-                return False
+                logger.warning("估算模型内存失败: %s", e)
+                memory_bytes = 0
+        if catalog is None:
+            catalog = MotionCatalog.from_model_json(model_json)
+        
+        return PoolEntry(model_json, model, memory_bytes, time.perf_counter() - load_start, catalog)
+    
+    def _activate_model(self, entry, param_entries=None):
+        """切换当前绘制的模型，并重建参数表和表情列表（param_entries 为预先读取的参数表）"""
+        self.model = entry.model
+        self.model_path = entry.model_json
+        self.locked_parameters = {}
+        self.hit_areas = self._read_hit_areas(entry.model_json)
+        
+        # 部件、表情等查询结果随模型变化
+        response_cache.invalidate()
+        
+        if self.model:
+            # 窗口大小可能在模型驻留期间改变
+            self.model.Resize(*self.canvas_size)
+            if param_entries is not None:
+                self._apply_parameter_entries(param_entries)
+            else:
+                self._load_model_parameters()
+        
+        # 表情和动作来自加载时构建的目录
+        self.catalog = entry.catalog or MotionCatalog.from_model_json(entry.model_json)
+        self.expressions = {name: info.path for name, info in self.catalog.expressions.items()}
+        self.motions = self.catalog.motion_groups()
+    
+    def resize(self, width, height):
+        """调整模型画布大小（渲染线程调用）"""
+        self.canvas_size = (int(width), int(height))
+        response_cache.invalidate()
+        if self.model:
+            self.model.Resize(*self.canvas_size)
     
     def _load_model_parameters(self):
         """加载模型参数列表"""
@@ -199,124 +324,134 @@ class RealLive2DController:
             return
         
         try:
-            self.parameters = {}
             param_count = self.model.GetParameterCount()
-            print(f"[Live2D] 模型参数数量: {param_count}")
+            logger.info("模型参数数量: %d", param_count)
             
-            for i in range(param_count):
-                param = self.model.GetParameter(i)
-                
-                # 调试：打印参数对象的所有属性
-                if i == 0:
-                    print(f"[Live2D] 参数对象属性: {[attr for attr in dir(param) if not attr.startswith('_')]}")
-                
-                # 尝试不同的属性名
-                param_id = param.id
-                param_value = param.value
-                
-                # 尝试获取默认值、最小值、最大值
-                try:
-                    param_default = getattr(param, 'default_value', param_value)
-                except:
-                    try:
-                        param_default = getattr(param, 'defaultValue', param_value)
-                    except:
-                        param_default = param_value
-                
-                try:
-                    param_min = getattr(param, 'min_value', -1.0)
-                except:
-                    try:
-                        param_min = getattr(param, 'minValue', -1.0)
-                    except:
-                        try:
-                            param_min = getattr(param, 'minimum', -1.0)
-                        except:
-                            param_min = -1.0
-                
-                try:
-                    param_max = getattr(param, 'max_value', 1.0)
-                except:
-                    try:
-                        param_max = getattr(param, 'maxValue', 1.0)
-                    except:
-                        try:
-                            param_max = getattr(param, 'maximum', 1.0)
-                        except:
-                            param_max = 1.0
-                
-                self.parameters[param_id] = {
-                    'index': i,
-                    'value': param_value,
-                    'default': param_default,
-                    'min': param_min,
-                    'max': param_max
-                }
-                
-                # 只打印前3个参数的详细信息
-                if i < 3:
-                    print(f"[Live2D] 参数 {i}: {param_id} = {param_value:.3f} [默认:{param_default:.3f}, 范围:{param_min:.3f}~{param_max:.3f}]")
-                elif i == 3:
-                    print(f"[Live2D] ... (还有 {param_count - 3} 个参数)")
-            
-            print(f"[Live2D] 加载了 {len(self.parameters)} 个参数")
+            entries = [self._read_parameter_entry(self.model, i) for i in range(param_count)]
+            self._apply_parameter_entries(entries)
             
         except Exception as e:
-            print(f"[Live2D] 参数加载失败: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("参数加载失败: %s", e)
     
-    def _load_expressions(self):
-        """加载表情列表"""
-        if not self.model_path:
-            return
+    def _read_parameter_entry(self, model, i):
+        """读取单个参数: (id, value, min, max, default)"""
+        param = model.GetParameter(i)
         
-        try:
-            model_dir = os.path.dirname(self.model_path)
-            expressions_dir = os.path.join(model_dir, 'expressions')
-            
-            if os.path.exists(expressions_dir):
-                self.expressions = {}
-                for file in os.listdir(expressions_dir):
-                    if file.endswith('.exp3.json'):
-                        exp_name = os.path.splitext(file)[0]
-                        exp_path = os.path.join(expressions_dir, file)
-                        self.expressions[exp_name] = exp_path
-                
-                print(f"[Live2D] 加载了 {len(self.expressions)} 个表情: {list(self.expressions.keys())}")
+        # 调试：打印参数对象的所有属性
+        if i == 0 and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("参数对象属性: %s", [attr for attr in dir(param) if not attr.startswith('_')])
         
-        except Exception as e:
-            print(f"[Live2D] 表情加载失败: {e}")
+        param_id = param.id
+        param_value = param.value
+        
+        # live2d-py 的 Parameter 对象提供 min/max/default，其余属性名兼容其他版本
+        param_default = _first_attr(param, _DEFAULT_ATTRS, param_value)
+        param_min = _first_attr(param, _MIN_ATTRS, -1.0)
+        param_max = _first_attr(param, _MAX_ATTRS, 1.0)
+        
+        # 只打印前3个参数的详细信息
+        if i < 3:
+            logger.debug("参数 %d: %s = %.3f [默认:%.3f, 范围:%.3f~%.3f]", i, param_id, param_value, param_default, param_min, param_max)
+        
+        return (param_id, param_value, param_min, param_max, param_default)
+    
+    def _apply_parameter_entries(self, entries):
+        """一次性建立名称→索引映射和数组"""
+        self.params.load(entries)
+        self._reset_parameter_state()
+        logger.info("加载了 %d 个参数", len(self.params))
     
     def set_parameter(self, param_name, value):
-        """设置模型参数（用户API调用）"""
+        """设置模型参数（用户API调用，线程安全，下一帧生效）"""
         try:
-            if param_name not in self.parameters:
-                print(f"[Live2D] 警告: 参数 '{param_name}' 不存在")
+            params = self.params
+            index = params.index_of(param_name)
+            if index is None:
+                logger.warning("警告: 参数 '%s' 不存在", param_name, extra=throttle(f"missing:{param_name}"))
                 return False
             
-            # 限制参数值范围
-            param_info = self.parameters[param_name]
-            value = max(param_info['min'], min(param_info['max'], float(value)))
-            
-            # 添加到平滑队列
-            self._add_parameter_to_queue(param_name, value)
+            # NaN/无穷大会成为平滑目标并推送到原生模型
+            if not math.isfinite(float(value)):
+                logger.warning("警告: 参数 '%s' 的值不是有限数: %s", param_name, value, extra=throttle(f"nonfinite:{param_name}"))
+                return False
             
-            # 应用平滑后的值到模型
-            self._apply_parameter_to_model(param_name)
+            # 限制参数值范围
+            value = params.clamp_one(index, value)
             
-            # 锁定参数，防止自动动画覆盖用户设置
-            self.locked_parameters[param_name] = time.time() + self.lock_duration
+            # 排入命令队列，渲染线程设置平滑目标并锁定参数
+            if not self.commands.set_parameter(params.generation, index, value):
+                return False
             
-            # 获取实际应用的平滑值用于显示
-            smoothed_value = self._get_smoothed_parameter_value(param_name)
-            print(f"[Live2D] 用户设置参数: {param_name} = {value} → 平滑值: {smoothed_value:.3f} (锁定 {self.lock_duration}s)")
+            logger.debug("用户设置参数: %s = %s (锁定 %ss)", param_name, value, self.lock_duration)
             return True
             
         except Exception as e:
-            print(f"[Live2D] 设置参数失败: {e}")
+            logger.error("设置参数失败: %s", e, extra=throttle("set_parameter"))
             return False
     
+    def set_parameters_by_index(self, indices, values, generation=None):
+        """按索引批量设置参数（线程安全，在同一帧内整体生效）
+        
+        generation 为客户端解析索引时的参数表代号，与当前模型不一致时拒绝写入
+        """
+        params = self.params
+        if generation is not None and generation != params.generation:
+            return False
+        
+        indices = self._check_indices(params, indices)
+        values = np.asarray(values, dtype=np.float32)
+        # np.clip 不会去掉 NaN，非有限值会成为平滑目标并推送到原生模型
+        if not np.isfinite(values).all():
+            raise ValueError('参数值必须是有限数（不能为 NaN 或无穷大）')
+        
+        values = params.clamp(indices, values)
+        return self.commands.set_parameters(params.generation, indices, values)
+    
+    def get_parameter_values(self, indices=None):
+        """返回 (参数表代号, 当前值数组)，可只取部分索引"""
+        params = self.params
+        if indices is None:
+            return params.generation, params.value.copy()
+        return params.generation, params.value[self._check_indices(params, indices)]
+    
+    @staticmethod
+    def _check_indices(params, indices):
+        """转换为索引数组，超出 0~len-1 时抛出 ValueError（负索引不按 NumPy 规则回绕）"""
+        indices = np.asarray(indices, dtype=np.intp)
+        if len(indices) and (indices.min() < 0 or indices.max() >= len(params)):
+            raise ValueError(f'参数索引超出范围 (0~{len(params) - 1})')
+        return indices
+    
+    def submit(self, func, *args):
+        """将调用排入命令队列，在渲染线程的下一帧执行，返回 Future"""
+        return self.commands.submit(func, *args)
+    
+    def submit_model_call(self, method_name, *args):
+        """将原生模型方法调用排入命令队列，执行时使用当时已加载的模型"""
+        return self.commands.submit(self._call_model, method_name, args)
+    
+    def _call_model(self, method_name, args):
+        if not self.model:
+            raise RuntimeError('模型未加载')
+        return getattr(self.model, method_name)(*args)
+    
+    def _drain_commands(self):
+        """执行队列中的命令，并一次性应用合并后的参数写入"""
+        commands, indices, values, locking = self.commands.drain()
+        if commands:
+            CommandQueue.run(commands)
+        
+        if len(indices):
+            self.smoothing.set_targets(indices, values)
+            # 用户设置的参数每帧重新推送，原生 Update() 和自动动画不会把它改回去
+            self.params.hold(indices)
+            
+            # 锁定参数，防止自动动画覆盖用户设置
+            expire_time = time.time() + self.lock_duration
+            ids = self.params.ids
+            for i in indices[locking].tolist():
+                self.locked_parameters[ids[i]] = expire_time
+    
     def _is_parameter_locked(self, param_name):
         """检查参数是否被锁定（防止自动动画覆盖用户设置）"""
         if param_name not in self.locked_parameters:
@@ -329,136 +464,122 @@ class RealLive2DController:
         
         return True
     
-    def _init_parameter_queue(self, param_name):
-        """初始化参数队列"""
-        if param_name not in self.parameter_queues:
-            # 获取当前参数值作为初始值
-            current_value = 0.0
-            if param_name in self.parameters:
-                current_value = self.parameters[param_name].get('value', 0.0)
-            
-            # 创建队列并填充初始值
-            self.parameter_queues[param_name] = deque([current_value] * self.queue_max_length, 
-                                                     maxlen=self.queue_max_length)
-    
-    def _add_parameter_to_queue(self, param_name, value):
-        """添加参数值到平滑队列"""
-        self._init_parameter_queue(param_name)
-        self.parameter_queues[param_name].append(float(value))
-    
-    def _get_smoothed_parameter_value(self, param_name):
-        """获取平滑后的参数值（最近几个值的加权平均）"""
-        if not self.smoothing_enabled or param_name not in self.parameter_queues:
-            return self.parameters.get(param_name, {}).get('value', 0.0)
-        
-        queue = self.parameter_queues[param_name]
-        if len(queue) == 0:
-            return 0.0
-        
-        # 使用加权平均，越新的值权重越高
-        total_weight = 0
-        weighted_sum = 0
-        
-        for i, value in enumerate(queue):
-            weight = (i + 1) ** 1.5  # 指数加权，最新的值权重最大
-            weighted_sum += value * weight
-            total_weight += weight
-        
-        return weighted_sum / total_weight if total_weight > 0 else 0.0
-    
-    def _apply_parameter_to_model(self, param_name):
-        """将平滑后的参数值应用到模型"""
+    def _update_all_smoothed_parameters(self):
+        """推进一帧平滑，并把输出变化的参数应用到模型"""
         try:
-            if param_name not in self.parameters:
-                return False
-            
-            # 获取平滑后的值
-            smoothed_value = self._get_smoothed_parameter_value(param_name)
+            indices, values = self.smoothing.step()
             
-            # 限制参数值范围
-            param_info = self.parameters[param_name]
-            smoothed_value = max(param_info['min'], min(param_info['max'], smoothed_value))
+            # 缓存已应用的值（模拟模式下即为模型状态）
+            self.params.value[indices] = values
             
+            # 推送相对上一帧有变化的参数和用户设置过的参数，其余跳过
+            dirty_indices, dirty_values = self.params.take_dirty(indices, values, config.PARAMETER_APPLY_EPSILON)
             if LIVE2D_AVAILABLE and self.model:
-                self.model.SetParameterValue(param_name, smoothed_value)
-            else:
-                # 模拟模式：更新缓存值
-                self.parameters[param_name]['value'] = smoothed_value
-            
-            return True
+                ids = self.params.ids
+                for i, value in zip(dirty_indices.tolist(), dirty_values.tolist()):
+                    self.model.SetParameterValue(ids[i], value)
             
+            # 跳过数相对于“每帧推送所有设置过的参数”计算
+            self.native_calls = len(dirty_indices)
+            self.native_skipped = self.params.applied_count - self.native_calls
+            self.native_calls_total += self.native_calls
+            self.native_skipped_total += self.native_skipped
+                        
         except Exception as e:
-            print(f"[Live2D] 参数应用失败: {e}")
-            return False
+            logger.error("批量参数平滑更新失败: %s", e, extra=throttle("smoothing"))
     
-    def _update_all_smoothed_parameters(self):
-        """更新所有参数的平滑值到模型"""
+    def _update_timelines(self):
+        """求值所有活跃时间轴，结果作为平滑目标（不触发锁定）"""
         try:
-            if not self.smoothing_enabled:
+            indices, values = self.timelines.evaluate(time.perf_counter(), self.params.generation)
+            if self.locked_parameters and len(indices):
+                locked = [self.params.index[name] for name in list(self.locked_parameters)
+                          if self._is_parameter_locked(name) and name in self.params]
+                if locked:
+                    free = ~np.isin(indices, locked)
+                    indices, values = indices[free], values[free]
+            if len(indices):
+                self.smoothing.set_targets(indices, values)
+        except Exception as e:
+            logger.error("时间轴求值失败: %s", e, extra=throttle("timeline"))
+    
+    def _update_lip_sync(self):
+        """把口型曲线的当前值写入嘴部参数（不触发锁定，用户锁定的参数不覆盖）
+
+        曲线已按 LIP_SYNC_FPS 采样并与音频时间对齐，直接写入而不作为平滑目标，否则平滑窗口会让口型滞后于声音
+        """
+        try:
+            sample = lip_sync.sample(time.time())
+            if sample is None:
                 return
-            
-            # 遍历所有有队列数据的参数
-            for param_name in list(self.parameter_queues.keys()):
-                if param_name in self.parameters:
-                    # 重新应用平滑后的值
-                    smoothed_value = self._get_smoothed_parameter_value(param_name)
-                    param_info = self.parameters[param_name]
-                    smoothed_value = max(param_info['min'], min(param_info['max'], smoothed_value))
-                    
-                    if LIVE2D_AVAILABLE and self.model:
-                        self.model.SetParameterValue(param_name, smoothed_value)
-                    else:
-                        self.parameters[param_name]['value'] = smoothed_value
-                        
+            mouth_open, mouth_form = sample
+            if not self._is_parameter_locked(config.LIP_SYNC_PARAMETER):
+                self._set_parameter_internal(config.LIP_SYNC_PARAMETER, mouth_open, direct=True)
+            if mouth_form is not None and not self._is_parameter_locked(config.LIP_SYNC_FORM_PARAMETER):
+                self._set_parameter_internal(config.LIP_SYNC_FORM_PARAMETER, mouth_form, direct=True)
         except Exception as e:
-            print(f"[Live2D] 批量参数平滑更新失败: {e}")
+            logger.error("口型同步失败: %s", e, extra=throttle("lip_sync"))
+    
+    def start_timeline(self, spec):
+        """编译并登记时间轴（API线程调用），在渲染线程的下一帧开始播放；格式错误时抛出 ValueError"""
+        timeline = Timeline(spec, self.params)
+        self.timelines.register(timeline)
+        self.submit(self.timelines.start, timeline)
+        return timeline
+    
+    def cancel_timeline(self, timeline_id):
+        """停止时间轴，参数保持在当前值；返回是否存在该时间轴"""
+        if self.timelines.get(timeline_id) is None:
+            return False
+        self.submit(self.timelines.cancel, timeline_id)
+        return True
     
-    def _set_parameter_internal(self, param_name, value):
-        """内部参数设置方法（不触发锁定，用于自动动画）"""
+    def _set_parameter_internal(self, param_name, value, direct=False):
+        """内部参数设置方法（不触发锁定，用于自动动画）；direct=True 时跳过平滑，本帧直接生效"""
         try:
-            if param_name not in self.parameters:
+            index = self.params.index_of(param_name)
+            if index is None:
                 return False
             
             # 限制参数值范围
-            param_info = self.parameters[param_name]
-            value = max(param_info['min'], min(param_info['max'], float(value)))
-            
-            # 添加到平滑队列
-            self._add_parameter_to_queue(param_name, value)
+            value = self.params.clamp_one(index, value)
             
-            # 应用平滑后的值到模型
-            self._apply_parameter_to_model(param_name)
+            if direct:
+                self.smoothing.set_direct(index, value)
+            else:
+                # 设置平滑目标
+                self.smoothing.set_target(index, value)
             
             return True
             
         except Exception as e:
-            print(f"[Live2D] 内部参数设置失败: {e}")
+            logger.error("内部参数设置失败: %s", e, extra=throttle("set_parameter_internal"))
             return False
     
     def play_motion(self, motion_name, motion_no, motion_priority):
         """播放动作"""
         try:
-            print(self.model.GetMotionGroups())
-            # success = self.model.StopAllMotions()
-            success = self.model.StartMotion(motion_name, motion_no, motion_priority)
+            if self.catalog.get_motion(motion_name, motion_no) is None and not self.mock_mode:
+                logger.warning("警告: 动作 '%s'[%s] 不存在", motion_name, motion_no, extra=throttle(f"missing_motion:{motion_name}"))
+                return False
+            if LIVE2D_AVAILABLE and self.model:
+                # success = self.model.StopAllMotions()
+                self.model.StartMotion(motion_name, motion_no, motion_priority)
+            else:
+                logger.debug("模拟播放动作: %s[%s]", motion_name, motion_no)
+            self.current_motion = (motion_name, motion_no)
+            return True
 
         except Exception as e:
-            print(f"[Live2D] 动作播放失败: {e}")
+            logger.error("动作播放失败: %s", e, extra=throttle("play_motion"))
             return False
 
     def play_expression(self, expression_name):
         """播放表情"""
         try:
-            print(self.model.GetExpressionIds())
-            # def get_name(namebacklist):
-            #     namelist = []
-            #     for name in namebacklist:
-            #         namelist.append(name.split('.',1)[0])
-            #     return namelist
-
-            # if expression_name not in get_name(self.expressions.keys()):
-            #     print(f"[Live2D] 警告: 表情 '{expression_name}' 不存在")
-            #     return False
+            if self.catalog.get_expression(expression_name) is None and not self.mock_mode:
+                logger.warning("警告: 表情 '%s' 不存在", expression_name, extra=throttle(f"missing_expression:{expression_name}"))
+                return False
             
             if LIVE2D_AVAILABLE and self.model:
                 # 使用真实的live2d库播放表情
@@ -468,28 +589,39 @@ class RealLive2DController:
                     # success = self.model.SetExpression(exp_path)
                     success = self.model.SetExpression(expression_name)
                     if success:
-                        print(f"[Live2D] 播放表情: {expression_name}")
+                        logger.debug("播放表情: %s", expression_name)
                     else:
-                        print(f"[Live2D] 表情加载失败: {expression_name}")
+                        logger.warning("表情加载失败: %s", expression_name)
                         return False
                 except Exception as e:
-                    print(f"[Live2D] 表情播放异常: {e}")
+                    logger.error("表情播放异常: %s", e)
                     return False
             else:
                 # 模拟模式
-                print(f"[Live2D] 模拟播放表情: {expression_name}")
+                logger.debug("模拟播放表情: %s", expression_name)
             
             self.current_expression = expression_name
             return True
             
         except Exception as e:
-            print(f"[Live2D] 表情播放失败: {e}")
+            logger.error("表情播放失败: %s", e)
             return False
     
     def update(self):
         """更新模型动画"""
+        timings = self.timings
         try:
-            if LIVE2D_AVAILABLE and self.model:
+            # 先处理API线程排入的命令
+            t = time.perf_counter()
+            self._drain_commands()
+            t = timings.lap(frame_timing.DRAIN, t)
+            
+            # 推进分阶段加载中的模型（新模型就绪前仍绘制当前模型）
+            self.loader.step()
+            t = timings.lap(frame_timing.MODEL_LOAD, t)
+            
+            model_loaded = LIVE2D_AVAILABLE and self.model
+            if model_loaded:
                 # 自动眨眼
                 if self.auto_blink:
                     current_time = time.time()
@@ -498,30 +630,96 @@ class RealLive2DController:
                         self.last_blink_time = current_time
                 
                 # 自动呼吸（检查参数是否存在且未被锁定）
-                if self.auto_breath and 'ParamBreath' in self.parameters and not self._is_parameter_locked('ParamBreath'):
+                if self.auto_breath and 'ParamBreath' in self.params and not self._is_parameter_locked('ParamBreath'):
                     breath_value = (math.sin(time.time() * 2) + 1) / 2 * 0.5
                     self._set_parameter_internal('ParamBreath', breath_value)
-                
-                # 应用所有参数的平滑处理
-                self._update_all_smoothed_parameters()
-                
+            t = timings.lap(frame_timing.AUTO_ANIMATION, t)
+            
+            # 关键帧时间轴覆盖自动动画，但让位于用户锁定的参数
+            if self.timelines.active_count:
+                self._update_timelines()
+                t = timings.lap(frame_timing.TIMELINE, t)
+            
+            # 口型曲线按音频起始时间取值
+            if lip_sync.active:
+                self._update_lip_sync()
+                t = timings.lap(frame_timing.LIP_SYNC, t)
+            
+            # 应用所有参数的平滑处理（模拟模式下同样推进，以便模拟绘制反映参数变化）
+            self._update_all_smoothed_parameters()
+            t = timings.lap(frame_timing.SMOOTHING, t)
+            
+            if model_loaded:
                 # 更新模型
                 self.model.Update()
+                timings.lap(frame_timing.MODEL_UPDATE, t)
         
         except Exception as e:
-            print(f"[Live2D] 更新失败: {e}")
+            logger.error("更新失败: %s", e, extra=throttle("update"))
+    
+    @staticmethod
+    def _read_hit_areas(model_json):
+        """读取 model3.json 中定义的点击区域名"""
+        try:
+            with open(model_json, 'r', encoding='utf-8') as f:
+                hit_areas = json.load(f).get('HitAreas', [])
+        except (OSError, ValueError):
+            return []
+        return [area['Name'] for area in hit_areas if area.get('Name')]
+    
+    def hit_test_batch(self, points, area_names=None, parts=False, top_only=False):
+        """批量点击检测（API线程调用）
+        
+        所有点和区域/部件在渲染线程的一次命令中依次调用原生 HitTest/HitPart，
+        结果与逐个调用 /model/hit_test 一致；模型未定义的区域不调用原生接口，直接返回未命中
+        """
+        if area_names is None:
+            area_names = self.hit_areas
+        defined = [name for name in area_names if name in self.hit_areas]
+        future = self.submit(self._native_hit_batch, points, defined, parts, top_only)
+        result = future.result(timeout=config.COMMAND_TIMEOUT)
+        for name in area_names:
+            result['areas'].setdefault(name, [False] * len(points))
+        return result
+    
+    def _native_hit_batch(self, points, area_names, parts, top_only):
+        """渲染线程: 用原生接口逐点检测"""
+        if not self.model:
+            raise RuntimeError('模型未加载')
+        model = self.model
+        result = {'areas': {name: [bool(model.HitTest(name, x, y)) for x, y in points] for name in area_names}}
+        if parts:
+            result['parts'] = [list(model.HitPart(x, y, top_only)) for x, y in points]
+        return result
+    
+    def is_animating(self):
+        """模型在下一帧是否可能发生变化（决定是否需要满帧渲染）"""
+        if self.commands.pending_count or self.smoothing.active_count or self.loader.busy or self.timelines.active_count:
+            return True
+        if lip_sync.active:
+            return True
+        if self.auto_blink or self.auto_breath:
+            return True
+        if LIVE2D_AVAILABLE and self.model and hasattr(self.model, 'IsMotionFinished'):
+            try:
+                return not self.model.IsMotionFinished()
+            except Exception:
+                return False
+        return False
     
     def draw(self):
         """绘制模型"""
         try:
+            t = time.perf_counter()
             if LIVE2D_AVAILABLE and self.model:
                 self.model.Draw()
             else:
                 # 模拟绘制 - 绘制一个简单的测试图形
                 self._draw_mock_model()
+            self.timings.lap(frame_timing.MODEL_DRAW, t)
                 
         except Exception as e:
-            print(f"[Live2D] 绘制失败: {e}")
+            logger.error("绘制失败: %s", e, extra=throttle("draw"))
     
     def _draw_mock_model(self):
         """绘制模拟模型（简单的测试图形）"""
@@ -550,13 +748,13 @@ class RealLive2DController:
             gl.glEnd()
             
         except Exception as e:
-            print(f"[Live2D] 模拟绘制失败: {e}")
+            logger.error("模拟绘制失败: %s", e, extra=throttle("mock_draw"))
     
     def _blink(self):
         """眨眼动画"""
         try:
             # 只有当眼睛参数未被锁定时才执行眨眼动画
-            if ('ParamEyeLOpen' in self.parameters and 
+            if ('ParamEyeLOpen' in self.params and 
                 not self._is_parameter_locked('ParamEyeLOpen') and 
                 not self._is_parameter_locked('ParamEyeROpen') and False):
                 
@@ -574,51 +772,66 @@ class RealLive2DController:
                 threading.Thread(target=open_eyes, daemon=True).start()
                 
         except Exception as e:
-            print(f"[Live2D] 眨眼失败: {e}")
+            logger.error("眨眼失败: %s", e, extra=throttle("blink"))
+    
+    def reset_parameters(self):
+        """将模型和参数表重置为默认值（在渲染线程调用）"""
+        if LIVE2D_AVAILABLE and self.model:
+            self.model.ResetParameters()
+        self.params.value[:] = self.params.default
+        self.params.applied[:] = np.nan
+        self._reset_parameter_state()
+        self.locked_parameters.clear()
     
     def get_model_info(self):
         """获取模型信息"""
         return {
             'model_path': self.model_path,
             'is_loaded': self.model is not None,
-            'parameter_count': len(self.parameters),
+            'parameter_count': len(self.params),
             'expression_count': len(self.expressions),
             'expressions': list(self.expressions.keys()),
+            'motion_groups': dict(self.motions),
             'live2d_available': LIVE2D_AVAILABLE
         }
     
     def get_all_parameters(self):
         """获取所有参数"""
-        return {name: info['value'] for name, info in self.parameters.items()}
+        return self.params.as_dict()
     
     def set_smoothing_enabled(self, enabled):
         """启用或禁用参数平滑"""
-        self.smoothing_enabled = bool(enabled)
-        return self.smoothing_enabled
+        self.smoothing.enabled = bool(enabled)
+        return self.smoothing.enabled
     
     def set_smoothing_settings(self, queue_length=None, enabled=None):
         """设置平滑系统参数"""
         result = {}
         
         if queue_length is not None:
-            self.queue_max_length = max(1, min(20, int(queue_length)))  # 限制在1-20之间
-            # 重置所有队列以应用新长度
-            self.parameter_queues.clear()
-            result['queue_length'] = self.queue_max_length
+            # 限制在1-20之间，并以当前值重新填充缓冲区以应用新长度
+            self.smoothing.set_window(max(1, min(20, int(queue_length))))
+            result['queue_length'] = self.smoothing.window
         
         if enabled is not None:
-            self.smoothing_enabled = bool(enabled)
-            result['smoothing_enabled'] = self.smoothing_enabled
+            self.smoothing.enabled = bool(enabled)
+            result['smoothing_enabled'] = self.smoothing.enabled
         
         return result
     
     def get_smoothing_info(self):
         """获取平滑系统信息"""
         return {
-            'smoothing_enabled': self.smoothing_enabled,
-            'queue_length': self.queue_max_length,
-            'active_queues': len(self.parameter_queues),
-            'queue_parameters': list(self.parameter_queues.keys())
+            'smoothing_enabled': self.smoothing.enabled,
+            'queue_length': self.smoothing.window,
+            'active_queues': self.smoothing.active_count,
+            'queue_parameters': [self.params.ids[i] for i in self.smoothing.active_indices().tolist()],
+            'native_calls': {
+                'last_frame': self.native_calls,
+                'last_frame_skipped': self.native_skipped,
+                'total': self.native_calls_total,
+                'total_skipped': self.native_skipped_total,
+            }
         }
 
 # 创建全局实例
@@ -0,0 +1,60 @@
+"""
+只读查询接口的响应缓存
+部件、可绘制对象、表情、动作、画布等信息只在加载模型或调整画布大小时变化，
+按 (路由, 参数表代号, 画布尺寸) 缓存序列化好的 JSON 字节，重复轮询时不再调用原生模型
+"""
+import threading
+
+
+class ResponseCache:
+    """每个路由只保留最新键对应的响应"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # {路由: (键, 响应字节)}
+        self.hits = {}
+        self.misses = {}
+        self.invalidations = 0
+
+    def get(self, route, key):
+        """命中时返回缓存的字节，否则返回 None"""
+        with self._lock:
+            entry = self._entries.get(route)
+            if entry is not None and entry[0] == key:
+                self.hits[route] = self.hits.get(route, 0) + 1
+                return entry[1]
+            self.misses[route] = self.misses.get(route, 0) + 1
+        return None
+
+    def put(self, route, key, body):
+        with self._lock:
+            self._entries[route] = (key, body)
+
+    def invalidate(self):
+        """丢弃所有缓存（加载模型、调整画布大小时调用）"""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def get_stats(self):
+        """各路由的命中次数和命中率"""
+        with self._lock:
+            routes = sorted(set(self.hits) | set(self.misses))
+            stats = {}
+            for route in routes:
+                hits = self.hits.get(route, 0)
+                misses = self.misses.get(route, 0)
+                stats[route] = {
+                    'hits': hits,
+                    'misses': misses,
+                    'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0
+                }
+            return {
+                'routes': stats,
+                'cached': len(self._entries),
+                'invalidations': self.invalidations
+            }
+
+
+# 创建全局实例
+response_cache = ResponseCache()
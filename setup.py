@@ -59,6 +59,15 @@ setup(
             "isort>=5.12.0",
             "mypy>=1.5.0",
         ],
+        "server": [
+            "waitress>=2.1.0",  # 生产环境 WSGI 服务器
+        ],
+        "realtime": [
+            "websockets>=10.0",  # WebSocket 参数流
+        ],
+        "streaming": [
+            "Pillow>=9.0.0",  # /frame.png 快照与 /stream.mjpeg 视频流编码
+        ],
         "performance": [
             "psutil>=5.9.0",
             "Pillow>=9.0.0",  # 图像处理优化
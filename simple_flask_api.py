@@ -5,11 +5,24 @@
 import os
 import json
 import threading
-import traceback
+import functools
+import time
 from datetime import datetime
-from flask import Flask, request, jsonify
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeoutError
+from flask import Flask, request, jsonify, Response, g
 from flask_cors import CORS
 from config import config
+import binary_protocol
+import metrics
+from model_catalog import model_catalog
+from response_cache import response_cache
+from frame_ring import frame_publisher
+from frame_encoder import frame_encoder, PIL_AVAILABLE
+from alpha_mask import alpha_mask
+from lip_sync import lip_sync, allowed_audio_path, check_pcm_size, decode_buffer, is_wav
+from log_utils import get_logger
+
+logger = get_logger('API')
 
 # 创建Flask应用
 app = Flask(__name__)
@@ -18,6 +31,43 @@ CORS(app)  # 允许跨域请求
 # 全局渲染器引用（将由主程序设置）
 renderer = None
 
+# 请求计数（按线程分片，热路径上不加锁）
+request_metrics = metrics.RequestMetrics()
+
+@app.before_request
+def _metrics_begin():
+    if config.METRICS_ENABLED:
+        g.metrics_start = request_metrics.begin()
+
+@app.after_request
+def _metrics_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+@app.teardown_request
+def _metrics_end(exc):
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_metrics.end(route, request.method, g.pop('metrics_status', 500), start)
+
+def cached_response(view):
+    """缓存只读查询接口的成功响应，键为 (路由, 参数表代号, 画布尺寸)"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        controller = get_controller()
+        route = request.path
+        key = (controller.params.generation, controller.canvas_size)
+        body = response_cache.get(route, key)
+        if body is not None:
+            return Response(body, mimetype='application/json')
+        
+        response = app.make_response(view(*args, **kwargs))
+        if response.status_code == 200:
+            response_cache.put(route, key, response.get_data())
+        return response
+    return wrapper
+
 @app.errorhandler(500)
 def handle_500(e):
     """处理内部服务器错误"""
@@ -49,7 +99,9 @@ def index():
             # 基础功能
             'GET /': '获取API信息',
             'GET /models': '获取可用模型列表',
+            'GET /models/pool': '获取模型池中常驻的模型及内存占用',
             'POST /load_model': '加载指定模型',
+            'GET /load_model/status': '获取模型加载进度',
             'GET /model/info': '获取当前模型信息',
             
             # 参数控制
@@ -59,7 +111,10 @@ def index():
             'POST /model/parameter/add': '添加参数值',
             'POST /model/parameter/by_index': '通过索引设置参数',
             'POST /model/parameter/add_by_index': '通过索引添加参数值',
-            'GET /model/parameters/info': '获取所有参数信息',
+            'GET /model/parameters/info': '获取所有参数的静态信息（支持 ETag/If-None-Match）',
+            'GET /model/parameters/ids': '获取参数ID表（名称→索引）',
+            'GET /model/parameters/values': '读取参数值（二进制 float32，format=json 时返回JSON）',
+            'POST /model/parameters/values': '批量写入参数值（二进制，同一帧生效）',
             
             # 表情控制
             'POST /model/expression': '播放表情',
@@ -87,6 +142,9 @@ def index():
             'POST /model/hit_test': '点击测试',
             'POST /model/drag': '拖拽模型',
             'POST /model/part/hit': '点击部件测试',
+            'POST /model/hit_pixel': '按缓存的 alpha 遮罩做像素级点击检测（不访问渲染线程）',
+            'POST /model/hit_batch': '批量点击检测（多个点 × 多个区域/部件，一次请求）',
+            'GET /debug/mask': '获取 alpha 遮罩回读状态',
             
             # 部件控制
             'GET /model/parts/info': '获取部件信息',
@@ -105,6 +163,9 @@ def index():
             'POST /model/auto_breath': '设置自动呼吸',
             'POST /model/auto_blink': '设置自动眨眼',
             'POST /model/mouth': '设置嘴部开合',
+            'POST /model/lip_sync': '按音频驱动口型（WAV/PCM 数据、音频路径或动作音频，可指定开始时间）',
+            'POST /model/lip_sync/stop': '停止口型同步',
+            'GET /model/lip_sync': '获取口型同步状态与音频缓存统计',
             
             # 重置功能
             'POST /model/reset/expression': '重置表情',
@@ -117,44 +178,57 @@ def index():
             'POST /model/sound_path': '获取音频文件路径',
             'POST /model/moc_consistency': '检查MOC文件一致性',
             
+            # 实时通道
+            'GET /realtime/info': '获取实时参数流通道信息',
+            'GET /render/scheduler': '获取帧调度状态（模式与实测帧率）',
+            'GET /debug/frames': '获取逐帧分阶段耗时统计（分位数、直方图、超预算帧数）',
+            'GET /metrics': 'Prometheus 文本格式指标',
+            'GET /debug/cache': '获取只读查询接口响应缓存的命中率',
+            
+            # 帧输出
+            'GET /frames/ring': '获取共享内存帧环的映射路径与布局',
+            'POST /frames/ring': '开启或关闭帧环发布',
+            'GET /frame.png': '获取当前帧快照（可选 width/height 限制尺寸）',
+            'GET /stream.mjpeg': 'MJPEG 实时视频流（可选 fps/width/height/quality）',
+            
             # 平滑系统
             'GET /model/smoothing': '获取参数平滑系统信息',
             'POST /model/smoothing': '设置平滑参数',
+            
+            # 关键帧时间轴
+            'POST /model/timeline': '上传并播放关键帧时间轴（线性/贝塞尔/阶跃插值，可循环）',
+            'GET /model/timelines': '获取时间轴列表，或按 id 查询单个时间轴',
+            'POST /model/timeline/cancel': '停止时间轴（参数保持当前值）',
         }
     })
 
 @app.route('/models', methods=['GET'])
 def get_models():
-    """获取可用模型列表"""
-    try:
-        models = []
-        models_dir = config.MODELS_DIR
-        
-        if os.path.exists(models_dir):
-            for item in os.listdir(models_dir):
-                model_path = os.path.join(models_dir, item)
-                if os.path.isdir(model_path):
-                    # 查找model3.json文件
-                    for file in os.listdir(model_path):
-                        if file.endswith('.json'):
-                            json_path = os.path.join(model_path, file)
-                            try:
-                                with open(json_path, 'r', encoding='utf-8') as f:
-                                    model_info = json.load(f)
-                                    models.append({
-                                        'name': item,
-                                        'path': model_path,
-                                        'json_file': file,
-                                        'info': model_info
-                                    })
-                                    break
-                            except Exception as e:
-                                print(f"读取模型信息失败: {json_path}, 错误: {e}")
+    """获取可用模型列表（从内存中的模型索引应答）
+
+    可选查询参数:
+    - offset / limit: 分页
+    - q: 按模型名过滤（不区分大小写的子串匹配）
+    - include_info: 是否返回完整的模型json内容，默认 true
+    - refresh: 为 true 时先同步刷新索引
+    """
+    try:
+        offset = request.args.get('offset', 0, type=int)
+        limit = request.args.get('limit', type=int)
+        name_filter = request.args.get('q')
+        include_info = request.args.get('include_info', 'true').lower() != 'false'
         
+        if request.args.get('refresh', 'false').lower() == 'true':
+            model_catalog.refresh()
+        
+        total, models = model_catalog.query(max(offset, 0), limit, name_filter, include_info)
         return jsonify({
             'success': True,
             'models': models,
-            'count': len(models)
+            'count': len(models),
+            'total': total,
+            'offset': offset,
+            'catalog_version': model_catalog.version
         })
     except Exception as e:
         return jsonify({
@@ -162,16 +236,30 @@ def get_models():
             'error': str(e)
         }), 500
 
+@app.route('/models/pool', methods=['GET'])
+def get_model_pool():
+    """获取模型池状态"""
+    try:
+        controller = get_controller()
+        return jsonify({
+            'success': True,
+            'pool': controller.pool.get_stats(controller.model_path)
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/load_model', methods=['POST'])
 def load_model():
-    """加载指定模型"""
-    return jsonify({
-                'success': False,
-                'error': f'此路由已停止服务（有bug）'
-            }), 200
+    """加载指定模型（分阶段加载，加载期间继续绘制当前模型；已在模型池中的模型直接切换）
+
+    可选参数 wait: 默认 true，等待加载完成再返回；为 false 时立即返回 202 和任务信息，
+    进度通过 GET /load_model/status 查询
+    """
     try:
         data = request.get_json()
         model_name = data.get('model_name')
+        wait = data.get('wait', True)
         
         if not model_name:
             return jsonify({
@@ -187,13 +275,37 @@ def load_model():
                 'error': f'模型不存在: {model_name}'
             }), 404
         
-        # 调用渲染器加载模型
+        # 调用渲染器加载模型 - GL相关步骤在渲染线程上分帧执行
         if renderer:
-            success = renderer.load_model(model_path)
+            job = renderer.load_model_async(model_path)
+            if not wait:
+                return jsonify({
+                    'success': True,
+                    'model_name': model_name,
+                    'model_path': model_path,
+                    'job': job.to_dict()
+                }), 202
+            
+            try:
+                success = job.future.result(timeout=config.MODEL_LOAD_TIMEOUT)
+            except FutureTimeoutError:
+                return jsonify({
+                    'success': False,
+                    'error': '模型加载超时',
+                    'job': job.to_dict()
+                }), 504
+            except Exception as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e),
+                    'job': job.to_dict()
+                }), 500
             return jsonify({
                 'success': success,
                 'model_name': model_name,
-                'model_path': model_path
+                'model_path': model_path,
+                'load_duration': get_controller().load_duration,
+                'job': job.to_dict()
             })
         else:
             return jsonify({
@@ -207,6 +319,18 @@ def load_model():
             'error': str(e)
         }), 500
 
+@app.route('/load_model/status', methods=['GET'])
+def get_load_status():
+    """获取模型加载进度"""
+    try:
+        return jsonify({
+            'success': True,
+            **get_controller().loader.get_status()
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/model/info', methods=['GET'])
 def get_model_info():
     """获取当前模型信息"""
@@ -311,12 +435,24 @@ def play_motion():
             }), 400
         
         if renderer:
+            # 由动作目录校验组名和序号（字典查找，不调用原生接口）；模拟模式下不校验
+            controller = get_controller()
+            catalog = controller.catalog
+            motion = catalog.get_motion(motion_name, motion_no)
+            if motion is None and not controller.mock_mode:
+                return jsonify({
+                    'success': False,
+                    'error': f'动作不存在: {motion_name}[{motion_no}]',
+                    'motion_groups': catalog.motion_groups()
+                }), 404
             renderer.play_motion(motion_name, motion_no, motion_priority)
             return jsonify({
                 'success': True,
                 'motion': motion_name,
                 'no':motion_no,
-                "priority": motion_priority
+                "priority": motion_priority,
+                'duration': motion.duration if motion else None,
+                'loop': motion.loop if motion else None
             })
         else:
             return jsonify({
@@ -344,6 +480,14 @@ def play_expression():
             }), 400
         
         if renderer:
+            controller = get_controller()
+            catalog = controller.catalog
+            if catalog.get_expression(expression_name) is None and not controller.mock_mode:
+                return jsonify({
+                    'success': False,
+                    'error': f'表情不存在: {expression_name}',
+                    'expression_ids': catalog.expression_ids()
+                }), 404
             renderer.play_expression(expression_name)
             return jsonify({
                 'success': True,
@@ -386,14 +530,128 @@ def set_mouth():
             'error': str(e)
         }), 500
 
+@app.route('/model/lip_sync', methods=['POST'])
+def start_lip_sync():
+    """按音频驱动口型
+
+    - 二进制请求体: WAV 文件，或裸 PCM（查询参数 sample_rate、channels=1、sample_width=2）
+    - JSON 请求体: {"path": 音频路径} 或 {"group": 动作组, "index": 序号}（使用动作的音频文件）
+    可选 start_at（time.time() 时间戳，音频开始播放的时刻，缺省为分析完成时）和 mode（rms 或 bands）
+    """
+    try:
+        if renderer is None:
+            return jsonify({'success': False, 'error': '渲染器未连接'}), 503
+        
+        controller = get_controller()
+        if request.is_json:
+            data = request.get_json() or {}
+            if data.get('path'):
+                path = allowed_audio_path(data['path'], controller.model_path)
+            elif data.get('group') is not None and data.get('index') is not None:
+                path = controller.catalog.sound_path(data['group'], data['index'])
+                if not path:
+                    return jsonify({'success': False, 'error': f"动作没有音频: {data['group']}[{data['index']}]"}), 404
+            else:
+                return jsonify({'success': False, 'error': '缺少path或group/index参数'}), 400
+            loader = functools.partial(lip_sync.cache.load, path)
+            source = path
+        else:
+            data = request.args
+            body = request.get_data()
+            if not body:
+                return jsonify({'success': False, 'error': '缺少音频数据'}), 400
+            if not is_wav(body):
+                # 按字节数检查时长，超长的裸 PCM 不进入解码
+                check_pcm_size(len(body), data.get('sample_rate', type=int),
+                               data.get('channels', 1, type=int), data.get('sample_width', 2, type=int))
+            loader = functools.partial(decode_buffer, body, data.get('sample_rate', type=int),
+                                       data.get('channels', 1, type=int), data.get('sample_width', 2, type=int))
+            source = 'buffer'
+        
+        start_at = data.get('start_at')
+        future = lip_sync.submit(loader, source, float(start_at) if start_at is not None else None,
+                                 data.get('mode', 'rms'))
+        try:
+            clip = future.result(timeout=config.LIP_SYNC_TIMEOUT)
+        except FutureTimeoutError:
+            return jsonify({'success': False, 'error': '音频分析超时（完成后开始播放，可调用 /model/lip_sync/stop 取消）'}), 504
+        except CancelledError:
+            return jsonify({'success': False, 'error': '口型同步已被停止或被新的请求取代'}), 409
+        
+        return jsonify({
+            'success': True,
+            'clip': clip.to_dict()
+        })
+        
+    except PermissionError as e:
+        return jsonify({'success': False, 'error': str(e)}), 403
+    except FileNotFoundError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/model/lip_sync/stop', methods=['POST'])
+def stop_lip_sync():
+    """停止口型同步（嘴部在下一帧合上）"""
+    try:
+        lip_sync.stop()
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/model/lip_sync', methods=['GET'])
+def get_lip_sync_status():
+    """获取口型同步状态"""
+    try:
+        return jsonify({'success': True, **lip_sync.get_status()})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 def set_renderer(renderer_instance):
     """设置渲染器引用"""
     global renderer
     renderer = renderer_instance
 
-def start_api_server(live2d_model_name):
+def _run_waitress():
+    """使用 waitress 生产服务器运行（固定大小的工作线程池，支持 keep-alive）"""
+    from waitress import serve
+    serve(
+        app,
+        host=config.API_HOST,
+        port=config.API_PORT,
+        threads=config.API_SERVER_THREADS,
+        backlog=config.API_SERVER_BACKLOG,
+        connection_limit=config.API_SERVER_CONNECTION_LIMIT,
+        channel_timeout=config.API_SERVER_KEEPALIVE_TIMEOUT,
+        ident=None
+    )
+
+def _run_werkzeug():
+    """使用 werkzeug 开发服务器运行（每个连接一个线程，适合调试）"""
+    app.run(
+        host=config.API_HOST,
+        port=config.API_PORT,
+        debug=config.API_DEBUG,
+        use_reloader=False,  # 禁用重载器以避免多线程问题
+        threaded=True
+    )
+
+def start_api_server(live2d_model_name, server_backend=None):
     """启动API服务器"""
-    print(f"启动API服务器: http://{config.API_HOST}:{config.API_PORT}")
+    backend = server_backend or config.API_SERVER_BACKEND
+    if backend == 'waitress':
+        try:
+            import waitress
+        except ImportError as e:
+            logger.warning("警告: waitress未安装 (%s)，改用werkzeug开发服务器", e)
+            backend = 'werkzeug'
+    elif backend != 'werkzeug':
+        logger.warning("警告: 未知的服务器后端 '%s'，改用werkzeug开发服务器", backend)
+        backend = 'werkzeug'
+    
+    logger.info("启动API服务器: http://%s:%s (后端: %s)", config.API_HOST, config.API_PORT, backend)
 
     # 临时保存端口信息用于后期需要；出于分布式部署考虑，可能需要http传递相关信息
     data = {
@@ -401,23 +659,266 @@ def start_api_server(live2d_model_name):
         "port":config.API_PORT,
         "host":config.API_HOST
     }
+    os.makedirs("temp/running", exist_ok=True)
     with open(f"temp/running/{live2d_model_name}.json", "w", encoding='utf-8') as f: # 此文件用于后期偶尔数据交换 
         json.dump(data, f, indent=4)
 
-    app.run(
-        host=config.API_HOST,
-        port=config.API_PORT,
-        debug=config.API_DEBUG,
-        use_reloader=False,  # 禁用重载器以避免多线程问题
-        threaded=True
-    )
+    if backend == 'waitress':
+        _run_waitress()
+    else:
+        _run_werkzeug()
 
-def start_api_server_thread(live2d_model_name):
+def start_api_server_thread(live2d_model_name, server_backend=None):
     """在后台线程中启动API服务器"""
-    api_thread = threading.Thread(target=start_api_server, args=live2d_model_name, daemon=True)
+    api_thread = threading.Thread(target=start_api_server, args=(live2d_model_name, server_backend), daemon=True)
     api_thread.start()
+    
+    # 后台刷新模型目录索引
+    model_catalog.start_watcher()
+    
+    # 启动 WebSocket 参数流服务
+    if config.WEBSOCKET_ENABLED:
+        from websocket_server import start_websocket_server_thread
+        start_websocket_server_thread(get_controller())
+    
+    # 启动 UDP 追踪数据监听
+    if config.UDP_ENABLED:
+        from udp_listener import start_udp_listener_thread
+        start_udp_listener_thread(get_controller())
+    
     return api_thread
 
+@app.route('/realtime/info', methods=['GET'])
+def get_realtime_info():
+    """获取实时参数流通道信息"""
+    try:
+        import websocket_server
+        import udp_listener
+        
+        server = websocket_server.stream_server
+        listener = udp_listener.tracking_listener
+        return jsonify({
+            'success': True,
+            'websocket': server.get_stats() if server else None,
+            'udp': listener.get_stats() if listener else None
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/render/scheduler', methods=['GET'])
+def get_render_scheduler():
+    """获取帧调度状态"""
+    try:
+        controller = get_controller()
+        return jsonify({
+            'success': True,
+            'scheduler': controller.scheduler.get_stats()
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/debug/frames', methods=['GET'])
+def get_frame_timings():
+    """获取逐帧分阶段耗时统计
+
+    可选查询参数 budget_ms: 帧预算（毫秒），默认 1000/FPS
+    """
+    try:
+        controller = get_controller()
+        budget_ms = request.args.get('budget_ms', type=float)
+        return jsonify({
+            'success': True,
+            'enabled': controller.timings.enabled,
+            'timings': controller.timings.summary(budget_ms)
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/debug/cache', methods=['GET'])
+def get_cache_stats():
+    """获取响应缓存统计"""
+    try:
+        return jsonify({
+            'success': True,
+            'cache': response_cache.get_stats()
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/debug/mask', methods=['GET'])
+def get_mask_stats():
+    """获取 alpha 遮罩回读状态"""
+    try:
+        return jsonify({
+            'success': True,
+            'mask': alpha_mask.get_stats()
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/frames/ring', methods=['GET'])
+def get_frame_ring():
+    """获取共享内存帧环的映射文件路径、布局和发布统计"""
+    try:
+        return jsonify({
+            'success': True,
+            'ring': frame_publisher.get_info(),
+            'encoder': frame_encoder.get_stats(),
+            'stream_clients': _stream_clients
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/frames/ring', methods=['POST'])
+def set_frame_ring():
+    """开启或关闭帧环发布"""
+    try:
+        data = request.get_json()
+        enabled = data.get('enabled')
+        
+        if enabled is None:
+            return jsonify({'success': False, 'error': '缺少enabled参数'}), 400
+        
+        frame_publisher.set_enabled(enabled)
+        get_controller().scheduler.wake()
+        
+        return jsonify({
+            'success': True,
+            'ring': frame_publisher.get_info()
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# 视频流客户端计数
+_stream_lock = threading.Lock()
+_stream_clients = 0
+
+def _frame_size_args():
+    """读取 width/height 查询参数（输出尺寸上限，等比缩放）"""
+    return request.args.get('width', type=int), request.args.get('height', type=int)
+
+@app.route('/frame.png', methods=['GET'])
+def get_frame_png():
+    """获取当前帧的 PNG 快照
+
+    渲染线程只做回读，编码在编码线程池中完成
+    """
+    if not PIL_AVAILABLE:
+        return jsonify({'success': False, 'error': '帧编码需要安装 Pillow'}), 503
+    if renderer is None:
+        return jsonify({'success': False, 'error': '渲染器未连接'}), 503
+    
+    max_width, max_height = _frame_size_args()
+    timeout = config.FRAME_SNAPSHOT_TIMEOUT
+    # 回读有一帧延迟，等待登记读者之后才发起回读的帧（PBO 中可能留有更早的旧帧）
+    after = frame_publisher.acquire()
+    try:
+        get_controller().scheduler.wake()
+        frame = frame_publisher.wait_frame(after, timeout)
+        if frame is None:
+            return jsonify({'success': False, 'error': '等待渲染帧超时'}), 503
+        
+        future = frame_encoder.submit(*frame, 'png', max_width, max_height, blocking=True, timeout=timeout)
+        if future is None:
+            return jsonify({'success': False, 'error': '编码线程繁忙'}), 503
+        body = future.result(timeout)
+        
+    except FutureTimeoutError:
+        return jsonify({'success': False, 'error': '编码超时'}), 503
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    finally:
+        frame_publisher.release()
+    
+    return Response(body, mimetype='image/png', headers={'Cache-Control': 'no-store'})
+
+@app.route('/stream.mjpeg', methods=['GET'])
+def get_frame_stream():
+    """MJPEG 实时视频流（multipart/x-mixed-replace）
+
+    每次只取最新一帧，编码线程占满或客户端接收慢时跳过中间帧，不会积压
+    """
+    global _stream_clients
+    if not PIL_AVAILABLE:
+        return jsonify({'success': False, 'error': '帧编码需要安装 Pillow'}), 503
+    if renderer is None:
+        return jsonify({'success': False, 'error': '渲染器未连接'}), 503
+    
+    fps = request.args.get('fps', config.FRAME_STREAM_FPS, type=float)
+    quality = request.args.get('quality', config.FRAME_STREAM_QUALITY, type=int)
+    max_width, max_height = _frame_size_args()
+    if fps <= 0:
+        return jsonify({'success': False, 'error': 'fps必须大于0'}), 400
+    
+    with _stream_lock:
+        if _stream_clients >= config.FRAME_STREAM_MAX_CLIENTS:
+            return jsonify({'success': False, 'error': '视频流客户端已达上限'}), 503
+        _stream_clients += 1
+    first_frame = frame_publisher.acquire()
+    get_controller().scheduler.wake()
+    
+    def close():
+        global _stream_clients
+        frame_publisher.release()
+        with _stream_lock:
+            _stream_clients -= 1
+    
+    def generate():
+        interval = 1.0 / fps
+        last = first_frame
+        part = None
+        next_time = time.perf_counter()
+        while True:
+            frame = frame_publisher.wait_frame(last, timeout=1.0)
+            if frame is None:
+                if part is None:
+                    # 渲染器停止或迟迟没有第一帧时结束流，释放客户端名额
+                    if time.perf_counter() - next_time > config.FRAME_SNAPSHOT_TIMEOUT:
+                        return
+                    continue
+                # 模型静止时没有新帧: 重发上一帧保活，客户端断开时写入失败即可触发关闭回调
+                yield part
+                continue
+            last = frame[0][1]
+            future = frame_encoder.submit(*frame, 'jpeg', max_width, max_height, quality)
+            if future is None:
+                continue
+            try:
+                jpeg = future.result(timeout=config.FRAME_SNAPSHOT_TIMEOUT)
+            except FutureTimeoutError:
+                continue
+            part = (b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: '
+                    + str(len(jpeg)).encode('ascii') + b'\r\n\r\n' + jpeg + b'\r\n')
+            yield part
+            
+            # 按目标帧率限速；落后时不补发
+            now = time.perf_counter()
+            next_time = max(next_time + interval, now)
+            if next_time > now:
+                time.sleep(next_time - now)
+    
+    response = Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame',
+                        headers={'Cache-Control': 'no-store'})
+    response.call_on_close(close)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus 指标抓取端点"""
+    try:
+        body = metrics.render_prometheus(request_metrics, get_controller(), response_cache)
+        return Response(body, mimetype='text/plain; version=0.0.4; charset=utf-8')
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/model/smoothing', methods=['GET'])
 def get_smoothing_info():
     """获取参数平滑系统信息"""
@@ -432,8 +933,7 @@ def get_smoothing_info():
         })
         
     except Exception as e:
-        print(f"[API] 获取平滑信息失败: {e}")
-        print(traceback.format_exc())
+        logger.exception("获取平滑信息失败: %s", e)
         return jsonify({'success': False, 'error': str(e)})
 
 @app.route('/model/smoothing', methods=['POST'])
@@ -464,10 +964,79 @@ def set_smoothing_settings():
         })
         
     except Exception as e:
-        print(f"[API] 设置平滑参数失败: {e}")
-        print(traceback.format_exc())
+        logger.exception("设置平滑参数失败: %s", e)
         return jsonify({'success': False, 'error': str(e)})
 
+# ========== 关键帧时间轴 ==========
+
+@app.route('/model/timeline', methods=['POST'])
+def start_timeline():
+    """上传并播放关键帧时间轴
+
+    请求体示例:
+    {"tracks": {"ParamAngleX": [[0, 0], {"time": 0.5, "value": 30, "interp": "ease_in_out"}, [1.0, 0]]},
+     "duration": 1.0, "loop": false, "speed": 1.0, "weight": 1.0, "name": "nod"}
+    关键帧的 interp 为区间起点的插值方式: linear（默认）、step、bezier（可用 ease 指定 [x1, y1, x2, y2]）
+    """
+    try:
+        if renderer is None:
+            return jsonify({'success': False, 'error': '渲染器未连接'}), 503
+        
+        data = request.get_json()
+        if not isinstance(data, dict):
+            return jsonify({'success': False, 'error': '无效的JSON数据'}), 400
+        
+        try:
+            timeline = get_controller().start_timeline(data)
+        except (ValueError, TypeError) as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        
+        return jsonify({
+            'success': True,
+            'timeline': timeline.to_dict()
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/model/timelines', methods=['GET'])
+def get_timelines():
+    """获取时间轴状态（?id= 时只返回该时间轴）"""
+    try:
+        player = get_controller().timelines
+        timeline_id = request.args.get('id', type=int)
+        if timeline_id is not None:
+            timeline = player.get(timeline_id)
+            if timeline is None:
+                return jsonify({'success': False, 'error': f'时间轴不存在: {timeline_id}'}), 404
+            return jsonify({'success': True, 'timeline': timeline.to_dict()})
+        
+        return jsonify({
+            'success': True,
+            'timelines': [timeline.to_dict() for timeline in player.all_timelines()],
+            'stats': player.get_stats()
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/model/timeline/cancel', methods=['POST'])
+def cancel_timeline():
+    """停止时间轴"""
+    try:
+        data = request.get_json() or {}
+        timeline_id = data.get('id')
+        if timeline_id is None:
+            return jsonify({'success': False, 'error': '缺少id参数'}), 400
+        
+        if not get_controller().cancel_timeline(int(timeline_id)):
+            return jsonify({'success': False, 'error': f'时间轴不存在: {timeline_id}'}), 404
+        
+        return jsonify({'success': True, 'id': int(timeline_id)})
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # ========== LAppModel 接口实现 ==========
 
 def get_model():
@@ -497,6 +1066,15 @@ def get_model():
     
     return None
 
+def get_controller():
+    """获取 Live2D 控制器实例"""
+    from real_live2d_controller import real_live2d_controller
+    return real_live2d_controller
+
+def queue_model_call(method_name, *args):
+    """将会修改模型状态的原生调用排入渲染线程的命令队列，返回 Future"""
+    return get_controller().submit_model_call(method_name, *args)
+
 @app.route('/model/resize', methods=['POST'])
 def resize_model():
     """调整模型画布大小"""
@@ -511,8 +1089,15 @@ def resize_model():
         
         if width is None or height is None:
             return jsonify({'success': False, 'error': '缺少width或height参数'}), 400
+        try:
+            width, height = int(width), int(height)
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'width和height必须是整数'}), 400
+        if width <= 0 or height <= 0:
+            return jsonify({'success': False, 'error': 'width和height必须大于0'}), 400
         
-        model.Resize(width, height)
+        # 由渲染器在渲染线程上执行（无头渲染会同时重建离屏帧缓冲区）
+        renderer.resize_canvas(width, height).result(timeout=config.COMMAND_TIMEOUT)
         
         return jsonify({
             'success': True,
@@ -520,6 +1105,8 @@ def resize_model():
             'height': height
         })
         
+    except FutureTimeoutError:
+        return jsonify({'success': False, 'error': '渲染线程执行超时'}), 504
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -535,7 +1122,7 @@ def start_random_motion():
         group = data.get('group')
         priority = data.get('priority', 3)
         
-        model.StartRandomMotion(group, priority)
+        queue_model_call('StartRandomMotion', group, priority)
         
         return jsonify({
             'success': True,
@@ -554,7 +1141,8 @@ def set_random_expression():
         if not model:
             return jsonify({'success': False, 'error': '模型未加载或渲染器未连接'}), 503
         
-        expression_id = model.SetRandomExpression()
+        # 需要返回值，等待渲染线程执行完成
+        expression_id = queue_model_call('SetRandomExpression').result(timeout=config.COMMAND_TIMEOUT)
         
         return jsonify({
             'success': True,
@@ -564,6 +1152,80 @@ def set_random_expression():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/model/hit_pixel', methods=['POST'])
+def hit_pixel():
+    """像素级点击检测
+
+    x、y 为窗口坐标（左上角为原点），直接查询渲染线程缓存的 alpha 遮罩
+    """
+    try:
+        data = request.get_json()
+        x = data.get('x')
+        y = data.get('y')
+        threshold = data.get('threshold', config.MODEL_HIT_THRESHOLD)
+        
+        if x is None or y is None:
+            return jsonify({'success': False, 'error': '缺少x或y参数'}), 400
+        
+        snapshot = alpha_mask.snapshot
+        if snapshot is None:
+            return jsonify({'success': False, 'error': 'alpha遮罩尚未生成'}), 503
+        
+        alpha = snapshot.alpha_at(float(x), float(y))
+        return jsonify({
+            'success': True,
+            'x': x,
+            'y': y,
+            'hit': alpha >= threshold,
+            'alpha': round(alpha, 4),
+            'threshold': threshold,
+            'mask_frame': snapshot.frame
+        })
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/model/hit_batch', methods=['POST'])
+def hit_batch():
+    """批量点击检测
+
+    请求: {"points": [[x, y], ...], "areas": [区域名, ...]（可选，默认全部）, "parts": false, "top_only": false}
+    所有点在渲染线程的一次命令中调用原生 HitTest/HitPart，结果与 /model/hit_test 一致；
+    该命令的耗时约为 点数 ×（模型定义的区域数 + 部件检测），点数由 HIT_BATCH_MAX_POINTS 限制
+    """
+    try:
+        model = get_model()
+        if not model:
+            return jsonify({'success': False, 'error': '模型未加载或渲染器未连接'}), 503
+        
+        data = request.get_json()
+        points = data.get('points')
+        area_names = data.get('areas')
+        parts = bool(data.get('parts', False))
+        top_only = bool(data.get('top_only', False))
+        
+        if not points:
+            return jsonify({'success': False, 'error': '缺少points参数'}), 400
+        if len(points) > config.HIT_BATCH_MAX_POINTS:
+            return jsonify({'success': False, 'error': f'points最多{config.HIT_BATCH_MAX_POINTS}个'}), 400
+        try:
+            points = [(float(x), float(y)) for x, y in points]
+        except (TypeError, ValueError):
+            return jsonify({'success': False, 'error': 'points格式应为[[x, y], ...]'}), 400
+        
+        result = get_controller().hit_test_batch(points, area_names, parts, top_only)
+        
+        return jsonify({
+            'success': True,
+            'points': points,
+            **result
+        })
+        
+    except FutureTimeoutError:
+        return jsonify({'success': False, 'error': '渲染线程执行超时'}), 504
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @app.route('/model/hit_test', methods=['POST'])
 def hit_test():
     """点击测试"""
@@ -608,7 +1270,7 @@ def drag_model():
         if x is None or y is None:
             return jsonify({'success': False, 'error': '缺少x或y参数'}), 400
         
-        model.Drag(x, y)
+        queue_model_call('Drag', x, y)
         
         return jsonify({
             'success': True,
@@ -634,7 +1296,7 @@ def set_offset():
         if dx is None or dy is None:
             return jsonify({'success': False, 'error': '缺少dx或dy参数'}), 400
         
-        model.SetOffset(dx, dy)
+        queue_model_call('SetOffset', dx, dy)
         
         return jsonify({
             'success': True,
@@ -659,7 +1321,7 @@ def set_scale():
         if scale is None:
             return jsonify({'success': False, 'error': '缺少scale参数'}), 400
         
-        model.SetScale(scale)
+        queue_model_call('SetScale', scale)
         
         return jsonify({
             'success': True,
@@ -683,7 +1345,7 @@ def rotate_model():
         if degrees is None:
             return jsonify({'success': False, 'error': '缺少degrees参数'}), 400
         
-        model.Rotate(degrees)
+        queue_model_call('Rotate', degrees)
         
         return jsonify({
             'success': True,
@@ -709,7 +1371,7 @@ def set_parameter_detailed():
         if param_id is None or value is None:
             return jsonify({'success': False, 'error': '缺少param_id或value参数'}), 400
         
-        model.SetParameterValue(param_id, value, weight)
+        queue_model_call('SetParameterValue', param_id, value, weight)
         
         return jsonify({
             'success': True,
@@ -736,7 +1398,7 @@ def add_parameter_value():
         if param_id is None or value is None:
             return jsonify({'success': False, 'error': '缺少param_id或value参数'}), 400
         
-        model.AddParameterValue(param_id, value)
+        queue_model_call('AddParameterValue', param_id, value)
         
         return jsonify({
             'success': True,
@@ -761,7 +1423,7 @@ def set_auto_breath():
         if enable is None:
             return jsonify({'success': False, 'error': '缺少enable参数'}), 400
         
-        model.SetAutoBreathEnable(enable)
+        queue_model_call('SetAutoBreathEnable', enable)
         
         return jsonify({
             'success': True,
@@ -785,7 +1447,7 @@ def set_auto_blink():
         if enable is None:
             return jsonify({'success': False, 'error': '缺少enable参数'}), 400
         
-        model.SetAutoBlinkEnable(enable)
+        queue_model_call('SetAutoBlinkEnable', enable)
         
         return jsonify({
             'success': True,
@@ -797,35 +1459,26 @@ def set_auto_blink():
 
 @app.route('/model/parameters/info', methods=['GET'])
 def get_parameters_info():
-    """获取所有参数信息"""
+    """获取所有参数的静态信息（index/id/min/max/default）
+
+    元数据在模型加载时生成一次，按参数表代号提供 ETag，未变化时返回 304；
+    当前值请使用 GET /model/parameters/values
+    """
     try:
-        model = get_model()
-        if not model:
-            return jsonify({'success': False, 'error': '模型未加载或渲染器未连接'}), 503
-        
-        param_count = model.GetParameterCount()
-        param_ids = model.GetParamIds()
-        
-        parameters_info = []
-        for i in range(param_count):
-            param = model.GetParameter(i)
-            parameters_info.append({
-                'index': i,
-                'id': param_ids[i] if i < len(param_ids) else f"param_{i}",
-                'current_value': model.GetParameterValue(i),
-                'parameter_obj': str(param)  # Parameter对象的字符串表示
-            })
+        params = get_controller().params
+        not_modified = _not_modified(params.etag)
+        if not_modified:
+            return not_modified
         
-        return jsonify({
-            'success': True,
-            'parameter_count': param_count,
-            'parameters': parameters_info
-        })
+        response = Response(params.metadata_json(), mimetype='application/json')
+        response.set_etag(params.etag)
+        return response
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/model/parts/info', methods=['GET'])
+@cached_response
 def get_parts_info():
     """获取部件信息"""
     try:
@@ -867,7 +1520,7 @@ def set_part_opacity():
         if index is None or opacity is None:
             return jsonify({'success': False, 'error': '缺少index或opacity参数'}), 400
         
-        model.SetPartOpacity(index, opacity)
+        queue_model_call('SetPartOpacity', index, opacity)
         
         return jsonify({
             'success': True,
@@ -925,7 +1578,7 @@ def set_part_screen_color():
         if part_index is None:
             return jsonify({'success': False, 'error': '缺少part_index参数'}), 400
         
-        model.SetPartScreenColor(part_index, r, g, b, a)
+        queue_model_call('SetPartScreenColor', part_index, r, g, b, a)
         
         return jsonify({
             'success': True,
@@ -954,7 +1607,7 @@ def set_part_multiply_color():
         if part_index is None:
             return jsonify({'success': False, 'error': '缺少part_index参数'}), 400
         
-        model.SetPartMultiplyColor(part_index, r, g, b, a)
+        queue_model_call('SetPartMultiplyColor', part_index, r, g, b, a)
         
         return jsonify({
             'success': True,
@@ -966,6 +1619,7 @@ def set_part_multiply_color():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/model/drawable/info', methods=['GET'])
+@cached_response
 def get_drawable_info():
     """获取可绘制对象信息"""
     try:
@@ -1002,7 +1656,7 @@ def set_drawable_multiply_color():
         if index is None:
             return jsonify({'success': False, 'error': '缺少index参数'}), 400
         
-        model.SetDrawableMultiplyColor(index, r, g, b, a)
+        queue_model_call('SetDrawableMultiplyColor', index, r, g, b, a)
         
         return jsonify({
             'success': True,
@@ -1031,7 +1685,7 @@ def set_drawable_screen_color():
         if index is None:
             return jsonify({'success': False, 'error': '缺少index参数'}), 400
         
-        model.SetDrawableScreenColor(index, r, g, b, a)
+        queue_model_call('SetDrawableScreenColor', index, r, g, b, a)
         
         return jsonify({
             'success': True,
@@ -1043,37 +1697,43 @@ def set_drawable_screen_color():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/model/expressions/info', methods=['GET'])
+@cached_response
 def get_expressions_info():
-    """获取表情信息"""
+    """获取表情信息（来自加载时构建的动作目录）"""
     try:
         model = get_model()
         if not model:
             return jsonify({'success': False, 'error': '模型未加载或渲染器未连接'}), 503
         
-        expression_ids = model.GetExpressionIds()
+        catalog = get_controller().catalog
+        expression_ids = catalog.expression_ids()
         
         return jsonify({
             'success': True,
             'expression_count': len(expression_ids),
-            'expression_ids': expression_ids
+            'expression_ids': expression_ids,
+            'expressions': [info.to_dict() for info in catalog.expressions.values()]
         })
         
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/model/motions/info', methods=['GET'])
+@cached_response
 def get_motions_info():
-    """获取动作信息"""
+    """获取动作信息（来自加载时构建的动作目录）"""
     try:
         model = get_model()
         if not model:
             return jsonify({'success': False, 'error': '模型未加载或渲染器未连接'}), 503
         
-        motion_groups = model.GetMotionGroups()
+        catalog = get_controller().catalog
         
         return jsonify({
             'success': True,
-            'motion_groups': motion_groups
+            'motion_groups': catalog.motion_groups(),
+            'motions': {group: [motion.to_dict() for motion in motions]
+                        for group, motions in catalog.motions.items()}
         })
         
     except Exception as e:
@@ -1098,6 +1758,7 @@ def is_motion_finished():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/model/canvas/info', methods=['GET'])
+@cached_response
 def get_canvas_info():
     """获取画布信息"""
     try:
@@ -1127,7 +1788,7 @@ def reset_expression():
         if not model:
             return jsonify({'success': False, 'error': '模型未加载或渲染器未连接'}), 503
         
-        model.ResetExpression()
+        queue_model_call('ResetExpression')
         
         return jsonify({
             'success': True,
@@ -1145,7 +1806,8 @@ def reset_parameters():
         if not model:
             return jsonify({'success': False, 'error': '模型未加载或渲染器未连接'}), 503
         
-        model.ResetParameters()
+        controller = get_controller()
+        controller.submit(controller.reset_parameters)
         
         return jsonify({
             'success': True,
@@ -1163,7 +1825,7 @@ def reset_pose():
         if not model:
             return jsonify({'success': False, 'error': '模型未加载或渲染器未连接'}), 503
         
-        model.ResetPose()
+        queue_model_call('ResetPose')
         
         return jsonify({
             'success': True,
@@ -1181,7 +1843,7 @@ def stop_all_motions():
         if not model:
             return jsonify({'success': False, 'error': '模型未加载或渲染器未连接'}), 503
         
-        model.StopAllMotions()
+        queue_model_call('StopAllMotions')
         
         return jsonify({
             'success': True,
@@ -1208,7 +1870,9 @@ def get_sound_path():
         if group is None or index is None:
             return jsonify({'success': False, 'error': '缺少group或index参数'}), 400
         
-        sound_path = model.GetSoundPath(group, index)
+        sound_path = get_controller().catalog.sound_path(group, index)
+        if sound_path is None:
+            return jsonify({'success': False, 'error': f'动作不存在: {group}[{index}]'}), 404
         
         return jsonify({
             'success': True,
@@ -1220,6 +1884,100 @@ def get_sound_path():
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# ========== 二进制批量参数接口 ==========
+
+def _not_modified(etag):
+    """客户端 If-None-Match 与 etag 一致时返回 304 响应，否则返回 None"""
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    return None
+
+def _parse_indices_arg():
+    """解析查询参数 indices=0,3,5，未提供时返回 None"""
+    raw = request.args.get('indices')
+    if not raw:
+        return None
+    return [int(i) for i in raw.split(',') if i.strip()]
+
+@app.route('/model/parameters/ids', methods=['GET'])
+def get_parameter_ids():
+    """获取参数ID表，客户端据此一次性将名称解析为索引"""
+    try:
+        params = get_controller().params
+        not_modified = _not_modified(params.etag)
+        if not_modified:
+            return not_modified
+        
+        response = jsonify({
+            'success': True,
+            'generation': params.generation,
+            'parameter_count': len(params),
+            'ids': params.ids
+        })
+        response.set_etag(params.etag)
+        return response
+        
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/model/parameters/values', methods=['GET'])
+def get_parameter_values():
+    """读取参数值，返回小端 float32 数组（可用 indices 指定子集，format=json 时返回JSON数组）"""
+    try:
+        indices = _parse_indices_arg()
+        generation, values = get_controller().get_parameter_values(indices)
+        
+        if request.args.get('format') == 'json':
+            return jsonify({
+                'success': True,
+                'generation': generation,
+                'values': values.tolist()
+            })
+        
+        return Response(
+            binary_protocol.encode_values(values),
+            mimetype='application/octet-stream',
+            headers={'X-Parameter-Generation': str(generation)}
+        )
+        
+    except (ValueError, IndexError) as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/model/parameters/values', methods=['POST'])
+def set_parameter_values():
+    """批量写入参数值
+    
+    layout=dense（默认）: 按索引排列的全部参数 float32，NaN 表示不修改
+    layout=indexed: 连续的 (uint32 索引, float32 值) 记录
+    generation: 可选，与当前参数表代号不一致时返回 409
+    """
+    try:
+        controller = get_controller()
+        payload = request.get_data(cache=False)
+        layout = request.args.get('layout', 'dense')
+        generation = request.args.get('generation', type=int)
+        
+        if layout == 'dense':
+            indices, values = binary_protocol.decode_dense(payload, len(controller.params))
+        elif layout == 'indexed':
+            indices, values = binary_protocol.decode_records(payload)
+        else:
+            return jsonify({'success': False, 'error': f'未知的layout: {layout}'}), 400
+        
+        if not controller.set_parameters_by_index(indices, values, generation):
+            return jsonify({'success': False, 'error': '参数表已变化，请重新获取ID表'}), 409
+        
+        return '', 204
+        
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # ========== 补充遗漏的接口 ==========
 
 @app.route('/model/parameter/by_index', methods=['POST'])
@@ -1238,7 +1996,7 @@ def set_parameter_by_index():
         if index is None or value is None:
             return jsonify({'success': False, 'error': '缺少index或value参数'}), 400
         
-        model.SetIndexParamValue(index, value, weight)
+        queue_model_call('SetIndexParamValue', index, value, weight)
         
         return jsonify({
             'success': True,
@@ -1265,7 +2023,7 @@ def add_parameter_value_by_index():
         if index is None or value is None:
             return jsonify({'success': False, 'error': '缺少index或value参数'}), 400
         
-        model.AddIndexParamValue(index, value)
+        queue_model_call('AddIndexParamValue', index, value)
         
         return jsonify({
             'success': True,
@@ -1315,7 +2073,7 @@ def set_offset_x():
         if sx is None:
             return jsonify({'success': False, 'error': '缺少sx参数'}), 400
         
-        model.SetOffsetX(sx)
+        queue_model_call('SetOffsetX', sx)
         
         return jsonify({
             'success': True,
@@ -1339,7 +2097,7 @@ def set_offset_y():
         if sy is None:
             return jsonify({'success': False, 'error': '缺少sy参数'}), 400
         
-        model.SetOffsetY(sy)
+        queue_model_call('SetOffsetY', sy)
         
         return jsonify({
             'success': True,
@@ -1363,7 +2121,7 @@ def add_expression():
         if not exp_id:
             return jsonify({'success': False, 'error': '缺少expression_id参数'}), 400
         
-        model.AddExpression(exp_id)
+        queue_model_call('AddExpression', exp_id)
         
         return jsonify({
             'success': True,
@@ -1388,7 +2146,7 @@ def remove_expression():
         if not exp_id:
             return jsonify({'success': False, 'error': '缺少expression_id参数'}), 400
         
-        model.RemoveExpression(exp_id)
+        queue_model_call('RemoveExpression', exp_id)
         
         return jsonify({
             'success': True,
@@ -1407,7 +2165,7 @@ def reset_expressions():
         if not model:
             return jsonify({'success': False, 'error': '模型未加载或渲染器未连接'}), 503
         
-        model.ResetExpressions()
+        queue_model_call('ResetExpressions')
         
         return jsonify({
             'success': True,
@@ -1468,7 +2226,7 @@ def get_part_multiply_color():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 if __name__ == '__main__':
-    print("此处已停止服务...")
+    logger.info("此处已停止服务...")
     # """直接运行此文件时启动完整的API服务"""
     # print("=" * 50)
     # print("Live2D Desktop API 服务")
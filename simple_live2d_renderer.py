@@ -5,12 +5,20 @@
 import sys
 import os
 import json
+import time
 from PyQt5.QtWidgets import QApplication, QOpenGLWidget, QSystemTrayIcon, QMenu, QAction
 from PyQt5.QtCore import Qt, QTimer, QPoint, pyqtSignal
 from PyQt5.QtGui import QIcon, QPixmap, QCursor, QPainter, QPen
 import OpenGL.GL as gl
 from config import config
-from real_live2d_controller import real_live2d_controller
+from real_live2d_controller import real_live2d_controller, LIVE2D_AVAILABLE
+from log_utils import get_logger, throttle
+import frame_timing
+from model_catalog import model_catalog
+from frame_ring import frame_publisher
+from alpha_mask import alpha_mask, X11InputShape
+
+logger = get_logger('渲染器')
 
 # Windows API 导入（用于真正的鼠标穿透）
 if sys.platform == "win32":
@@ -23,7 +31,99 @@ if sys.platform == "win32":
     WS_EX_LAYERED = 0x00080000
 
 
-class Live2DRenderer(QOpenGLWidget):
+class ModelControlMixin:
+    """渲染器对外的模型控制接口（桌面窗口与无头渲染共用）"""
+    
+    def _auto_load_model(self, live2d_model_name = None):
+        """指定加载或自动加载第一个可用模型"""
+        try:
+            if os.path.exists(config.MODELS_DIR):
+                if live2d_model_name:
+                    model_path = os.path.join(config.MODELS_DIR, live2d_model_name)
+                    logger.info("自动加载模型: %s", live2d_model_name)
+                    self.load_model_async(model_path)
+                else:
+                    models = model_catalog.names()
+                    if models:
+                        first_model = models[0]
+                        model_path = os.path.join(config.MODELS_DIR, first_model)
+                        logger.info("自动加载模型: %s", first_model)
+                        self.load_model_async(model_path)
+                    else:
+                        logger.warning("未找到任何模型文件")
+            else:
+                logger.warning("模型目录不存在: %s", config.MODELS_DIR)
+        except Exception as e:
+            logger.error("自动加载模型失败: %s", e)
+        
+    def load_model(self, model_path):
+        """加载Live2D模型（经分阶段加载器在渲染线程上执行），返回加载任务"""
+        return self.load_model_async(model_path)
+        
+    def load_model_async(self, model_path):
+        """分阶段加载模型，窗口不会因加载而停止刷新；返回加载任务"""
+        def on_loaded(job):
+            self.current_model = model_path
+            self.parameters = real_live2d_controller.get_all_parameters()
+        
+        # 可从API线程调用：工作线程准备完成后会通过帧调度器唤醒渲染循环
+        return real_live2d_controller.load_model_async(model_path, on_loaded)
+    
+    def set_parameter(self, param_name, value):
+        """设置模型参数"""
+        try:
+            success = real_live2d_controller.set_parameter(param_name, value)
+            if success and hasattr(self, 'parameters'):
+                self.parameters[param_name] = value
+            return success
+        except Exception as e:
+            logger.error("设置参数失败: %s", e, extra=throttle("renderer_set_parameter"))
+            return False
+        
+    def play_expression(self, expression_name):
+        """播放表情"""
+        try:
+            # 目录中没有的表情直接拒绝，不进入渲染线程（模拟模式下不校验）
+            if (real_live2d_controller.catalog.get_expression(expression_name) is None
+                    and not real_live2d_controller.mock_mode):
+                return False
+            # 在渲染线程的下一帧执行
+            real_live2d_controller.submit(real_live2d_controller.play_expression, expression_name)
+            return True
+        except Exception as e:
+            logger.error("播放表情失败: %s", e)
+            return False
+        
+    def play_motion(self, motion_name, motion_no, motion_priority):
+        """播放动作"""
+        try:
+            if (real_live2d_controller.catalog.get_motion(motion_name, motion_no) is None
+                    and not real_live2d_controller.mock_mode):
+                return False
+            # 在渲染线程的下一帧执行
+            real_live2d_controller.submit(real_live2d_controller.play_motion, motion_name, motion_no, motion_priority)
+            return True
+        except Exception as e:
+            logger.error("播放动作失败: %s", e)
+            return False
+    
+    def get_model_info(self):
+        """获取模型信息"""
+        return real_live2d_controller.get_model_info()
+    
+    def resize_canvas(self, width, height):
+        """调整画布大小（可从API线程调用），在渲染线程的下一帧执行；返回 Future"""
+        return real_live2d_controller.submit(self._resize_canvas, int(width), int(height))
+    
+    def _resize_canvas(self, width, height):
+        """渲染线程: 调整模型画布大小"""
+        real_live2d_controller.resize(width, height)
+
+
+class Live2DRenderer(QOpenGLWidget, ModelControlMixin):
+    # API 线程入队命令时发出，经 Qt 排队连接回到 GUI 线程
+    wake_requested = pyqtSignal()
+    
     def __init__(self, live2d_model_name = None):
         self.live2d_model_name = live2d_model_name
 
@@ -50,6 +150,9 @@ class Live2DRenderer(QOpenGLWidget):
         
         # 边框宽度
         self.border_width = 10
+        
+        # 透明像素处的鼠标穿透
+        self.setupHitRegion()
     
     def get_resize_edge(self, pos):
         """检测鼠标位置在哪个边缘"""
@@ -123,9 +226,57 @@ class Live2DRenderer(QOpenGLWidget):
             return True
             
         except Exception as e:
-            print(f"[渲染器] Windows API 鼠标穿透设置失败: {e}")
+            logger.error("Windows API 鼠标穿透设置失败: %s", e)
             return False
         
+    def setupHitRegion(self):
+        """按 alpha 遮罩设置透明像素处的鼠标穿透"""
+        # X11 设置仅限输入的窗口形状，随遮罩更新
+        self.input_shape = X11InputShape() if QApplication.platformName() == 'xcb' else None
+        self._input_runs = None
+        
+        # Windows 没有仅限输入的形状，定时按光标所在像素切换 WS_EX_TRANSPARENT
+        self._passthrough = False
+        self.hit_timer = None
+        if sys.platform == "win32":
+            self.hit_timer = QTimer()
+            self.hit_timer.timeout.connect(self._poll_cursor_hit)
+            self.hit_timer.start(config.CLICK_THROUGH_POLL_MS)
+    
+    def _pixel_click_through(self):
+        """当前是否按像素穿透（整窗穿透或调整模式下不启用）"""
+        return (config.CLICK_THROUGH_TRANSPARENT and alpha_mask.enabled
+                and not config.CLICK_THROUGH_ENABLED and not self.resize_mode)
+    
+    def _update_input_region(self):
+        """遮罩更新后，把 X11 输入区域设为模型不透明部分"""
+        if self.input_shape is None or not self._pixel_click_through():
+            return
+        runs = alpha_mask.snapshot.opaque_runs(config.MODEL_HIT_THRESHOLD)
+        # 遮罩未变化时不重复设置
+        if runs != self._input_runs:
+            self.input_shape.set_region(int(self.winId()), runs)
+            self._input_runs = runs
+    
+    def _poll_cursor_hit(self):
+        """Windows: 光标位于透明像素时让鼠标事件穿透窗口"""
+        if not self._pixel_click_through() or not self.isVisible():
+            return
+        pos = self.mapFromGlobal(QCursor.pos())
+        passthrough = alpha_mask.hit(pos.x(), pos.y()) is False
+        if passthrough != self._passthrough:
+            self.set_windows_click_through(passthrough)
+            self._passthrough = passthrough
+    
+    def _reset_input_region(self):
+        """停止按像素穿透时恢复整窗接收输入（整窗穿透由 Qt 属性和 Windows API 接管）"""
+        self._input_runs = None
+        if self.input_shape is not None and not config.CLICK_THROUGH_ENABLED:
+            self.input_shape.reset(int(self.winId()))
+        if self._passthrough:
+            self._passthrough = False
+            self.set_windows_click_through(config.CLICK_THROUGH_ENABLED)
+        
     def setupWindow(self):
         """设置窗口属性"""
         self.setWindowTitle(config.WINDOW_TITLE)
@@ -168,15 +319,43 @@ class Live2DRenderer(QOpenGLWidget):
             self.set_windows_click_through(False)
         
     def setupTimer(self):
-        """设置渲染定时器"""
+        """设置渲染定时器（间隔由帧调度器按当前模式调整）"""
+        self.scheduler = real_live2d_controller.scheduler
         self.timer = QTimer()
         self.timer.timeout.connect(self.updateAnimation)
-        self.timer.start(int(1000 / config.FPS))
+        self.timer.start(self.scheduler.interval_ms())
+        
+        self.wake_requested.connect(self.wake)
+        self.scheduler.wake_callback = self.wake_requested.emit
+        
+        # 缓冲区交换完成后补记交换耗时和整帧耗时
+        self.timings = real_live2d_controller.timings
+        self._paint_end = 0.0
+        self.frameSwapped.connect(self._on_frame_swapped)
+    
+    def _on_frame_swapped(self):
+        self.timings.lap(frame_timing.SWAP, self._paint_end)
+        self.timings.end_frame()
+    
+    def wake(self):
+        """收到API命令或用户交互，立即恢复满帧渲染"""
+        self.scheduler.notify_activity()
+        self.timer.start(self.scheduler.interval_ms('active'))
+        self.update()
+    
+    def _schedule_next_frame(self):
+        """根据本帧状态决定下一帧的定时器间隔"""
+        has_model = real_live2d_controller.model is not None or not LIVE2D_AVAILABLE
+        mode = self.scheduler.frame_done(real_live2d_controller.is_animating(),
+                                         visible=self.isVisible(), has_model=has_model)
+        interval = self.scheduler.interval_ms(mode)
+        if self.timer.interval() != interval:
+            self.timer.setInterval(interval)
         
     def setupTrayIcon(self):
         """设置系统托盘图标"""
         if not QSystemTrayIcon.isSystemTrayAvailable():
-            print("系统不支持托盘图标")
+            logger.warning("系统不支持托盘图标")
             return
             
         # 创建托盘图标
@@ -221,60 +400,52 @@ class Live2DRenderer(QOpenGLWidget):
         try:
             # 初始化Live2D引擎（保持与原项目一致的简单方式）
             real_live2d_controller.initialize()
-            print("[渲染器] OpenGL 和 Live2D 初始化完成")
+            logger.info("OpenGL 和 Live2D 初始化完成")
             
             # 自动加载第一个可用模型
             self._auto_load_model(self.live2d_model_name)
             
         except Exception as e:
-            print(f"[渲染器] 初始化失败: {e}")
-        
-    def _auto_load_model(self, live2d_model_name = None):
-        """指定加载或自动加载第一个可用模型"""
-        try:
-            if os.path.exists(config.MODELS_DIR):
-                if live2d_model_name:
-                    model_path = os.path.join(config.MODELS_DIR, live2d_model_name)
-                    print(f"[渲染器] 自动加载模型: {live2d_model_name}")
-                    real_live2d_controller.load_model(model_path)
-                else:
-                    models = [d for d in os.listdir(config.MODELS_DIR) 
-                            if os.path.isdir(os.path.join(config.MODELS_DIR, d))]
-                    if models:
-                        first_model = models[0]
-                        model_path = os.path.join(config.MODELS_DIR, first_model)
-                        print(f"[渲染器] 自动加载模型: {first_model}")
-                        real_live2d_controller.load_model(model_path)
-                    else:
-                        print("[渲染器] 未找到任何模型文件")
-            else:
-                print(f"[渲染器] 模型目录不存在: {config.MODELS_DIR}")
-        except Exception as e:
-            print(f"[渲染器] 自动加载模型失败: {e}")
+            logger.error("初始化失败: %s", e)
         
     def resizeGL(self, width, height):
         """窗口大小改变时调用"""
         gl.glViewport(0, 0, width, height)
         # 如果有Live2D模型，调整其大小
-        if real_live2d_controller.model:
-            try:
-                real_live2d_controller.model.Resize(width, height)
-            except Exception as e:
-                print(f"[渲染器] 模型尺寸调整失败: {e}")
+        try:
+            real_live2d_controller.resize(width, height)
+        except Exception as e:
+            logger.error("模型尺寸调整失败: %s", e)
         
     def paintGL(self):
         """OpenGL绘制（与原项目保持一致）"""
+        t = self.timings.begin_frame()
         try:
             # 清除背景
             gl.glClearColor(*config.BACKGROUND_COLOR)
             gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+            self.timings.lap(frame_timing.CLEAR, t)
             
             # 更新和绘制Live2D模型
             real_live2d_controller.update()
             real_live2d_controller.draw()
             
+            # 异步回读: 发布到共享内存帧环，每隔若干帧更新 alpha 遮罩
+            t = time.perf_counter()
+            ratio = self.devicePixelRatioF()
+            fb_width, fb_height = int(self.width() * ratio), int(self.height() * ratio)
+            # 无读者时 publish 直接返回，并在渲染线程上释放 PBO
+            frame_publisher.publish(fb_width, fb_height)
+            if alpha_mask.capture(self.defaultFramebufferObject(), fb_width, fb_height,
+                                  self.width(), self.height()):
+                self._update_input_region()
+            self.timings.lap(frame_timing.READBACK, t)
+            
         except Exception as e:
-            print(f"[渲染器] 绘制失败: {e}")
+            logger.error("绘制失败: %s", e, extra=throttle("paint"))
+        
+        self._paint_end = self.timings.end_frame()
+        self._schedule_next_frame()
     
     def paintEvent(self, event):
         """Qt绘制事件 - 绘制边框"""
@@ -343,6 +514,7 @@ class Live2DRenderer(QOpenGLWidget):
             
     def updateAnimation(self):
         """更新动画"""
+        self.timings.tick()
         self.update()  # 触发重绘
         
     def mousePressEvent(self, event):
@@ -351,11 +523,17 @@ class Live2DRenderer(QOpenGLWidget):
         if config.CLICK_THROUGH_ENABLED:
             event.ignore()
             return
+        
+        # 点在透明像素上（平台不支持输入区域或区域尚未更新时）不响应
+        if self._pixel_click_through() and alpha_mask.hit(event.x(), event.y()) is False:
+            event.ignore()
+            return
             
         if event.button() == Qt.LeftButton:
             pos = event.pos()
             edge = self.get_resize_edge(pos)
             
+            self.scheduler.notify_activity()
             if edge and self.resize_mode:
                 # 开始调整大小
                 self.resizing = True
@@ -378,9 +556,11 @@ class Live2DRenderer(QOpenGLWidget):
         
         if self.resizing and event.buttons() == Qt.LeftButton:
             # 正在调整大小
+            self.scheduler.notify_activity()
             self.handle_resize(event.globalPos())
         elif self.dragging and event.buttons() == Qt.LeftButton:
             # 普通拖拽移动
+            self.scheduler.notify_activity()
             self.move(event.globalPos() - self.drag_position)
         else:
             # 检测边缘并设置光标
@@ -411,6 +591,7 @@ class Live2DRenderer(QOpenGLWidget):
             self.show()
             self.raise_()
             self.activateWindow()
+            self.wake()
             
     def toggle_obs_mode(self):
         """切换 OBS 兼容模式"""
@@ -422,7 +603,7 @@ class Live2DRenderer(QOpenGLWidget):
         
         # 显示当前模式
         mode_text = "OBS 直播模式" if config.OBS_COMPATIBLE_MODE else "桌面宠物模式"
-        print(f"[渲染器] 已切换到: {mode_text}")
+        logger.info("已切换到: %s", mode_text)
         
         # 确保窗口可见
         if not self.isVisible():
@@ -440,33 +621,36 @@ class Live2DRenderer(QOpenGLWidget):
             # 使用 Windows API（更可靠）
             success = self.set_windows_click_through(True)
             if success:
-                print("[渲染器] 已启用鼠标穿透（Windows API）")
+                logger.info("已启用鼠标穿透（Windows API）")
             else:
-                print("[渲染器] 已启用鼠标穿透（Qt 方式）")
+                logger.info("已启用鼠标穿透（Qt 方式）")
         else:
             # 禁用穿透
             self.setAttribute(Qt.WA_TransparentForMouseEvents, False)
             self.set_windows_click_through(False)
-            print("[渲染器] 已禁用鼠标穿透")
+            logger.info("已禁用鼠标穿透")
+        self._reset_input_region()
         
         # 显示当前状态
         status_text = "启用" if config.CLICK_THROUGH_ENABLED else "禁用"
-        print(f"[渲染器] 鼠标穿透: {status_text}")
+        logger.info("鼠标穿透: %s", status_text)
     
     def toggle_resize_mode(self):
         """切换调整大小模式"""
         self.resize_mode = not self.resize_mode
         
         if self.resize_mode:
-            print("[渲染器] 已启用调整模式 - 将鼠标移至窗口边缘拖拽调整大小")
+            logger.info("已启用调整模式 - 将鼠标移至窗口边缘拖拽调整大小")
             # 确保窗口可见且在最前
             if not self.isVisible():
                 self.show()
             self.raise_()
         else:
-            print("[渲染器] 已禁用调整模式")
+            logger.info("已禁用调整模式")
             # 重置光标
             self.setCursor(QCursor(Qt.ArrowCursor))
+        # 调整模式下整个窗口都要能接收鼠标，退出后由下一次遮罩更新恢复穿透区域
+        self._reset_input_region()
         
         # 触发重绘以显示/隐藏边框
         self.update()
@@ -474,51 +658,7 @@ class Live2DRenderer(QOpenGLWidget):
     def quit_application(self):
         """退出应用程序"""
         QApplication.quit()
-        
-    def load_model(self, model_path):
-        """加载Live2D模型"""
-        try:
-            success = real_live2d_controller.load_model(model_path)
-            if success:
-                self.current_model = model_path
-                # 获取最新的参数信息
-                self.parameters = real_live2d_controller.get_all_parameters()
-            return success
-        except Exception as e:
-            print(f"[渲染器] 加载模型失败: {e}")
-            return False
-        
-    def set_parameter(self, param_name, value):
-        """设置模型参数"""
-        try:
-            success = real_live2d_controller.set_parameter(param_name, value)
-            if success and hasattr(self, 'parameters'):
-                self.parameters[param_name] = value
-            return success
-        except Exception as e:
-            print(f"[渲染器] 设置参数失败: {e}")
-            return False
-        
-    def play_expression(self, expression_name):
-        """播放表情"""
-        try:
-            return real_live2d_controller.play_expression(expression_name)
-        except Exception as e:
-            print(f"[渲染器] 播放表情失败: {e}")
-            return False
-        
-    def play_motion(self, motion_name, motion_no, motion_priority):
-        """播放动作"""
-        try:
-            return real_live2d_controller.play_motion(motion_name, motion_no, motion_priority)
-        except Exception as e:
-            print(f"[渲染器] 播放动作失败: {e}")
-            return False
-    
-    def get_model_info(self):
-        """获取模型信息"""
-        return real_live2d_controller.get_model_info()
-        
+
 
 def main():
     app = QApplication(sys.argv)
@@ -528,24 +668,24 @@ def main():
     renderer = Live2DRenderer()
     renderer.show()
     
-    print(f"Live2D桌面渲染器已启动")
-    print(f"窗口大小: {config.WINDOW_WIDTH}x{config.WINDOW_HEIGHT}")
-    print(f"API端口: {config.API_PORT}")
+    logger.info("Live2D桌面渲染器已启动")
+    logger.info("窗口大小: %dx%d", config.WINDOW_WIDTH, config.WINDOW_HEIGHT)
+    logger.info("API端口: %s", config.API_PORT)
     
     # 显示当前模式
     current_mode = "OBS 直播模式" if config.OBS_COMPATIBLE_MODE else "桌面宠物模式"
     click_through_status = "启用" if config.CLICK_THROUGH_ENABLED else "禁用"
     
-    print(f"当前模式: {current_mode}")
-    print(f"鼠标穿透: {click_through_status}")
-    print(f"调整模式: 禁用（可通过托盘菜单启用）")
+    logger.info("当前模式: %s", current_mode)
+    logger.info("鼠标穿透: %s", click_through_status)
+    logger.info("调整模式: 禁用（可通过托盘菜单启用）")
     
-    print("右键托盘图标可以:")
-    print("  - 显示/隐藏窗口")
-    print("  - 切换 OBS 模式")
-    print("  - 切换鼠标穿透")
-    print("  - 切换调整模式（拖拽边框调整大小）")
-    print("  - 退出程序")
+    logger.info("右键托盘图标可以:")
+    logger.info("  - 显示/隐藏窗口")
+    logger.info("  - 切换 OBS 模式")
+    logger.info("  - 切换鼠标穿透")
+    logger.info("  - 切换调整模式（拖拽边框调整大小）")
+    logger.info("  - 退出程序")
     
     sys.exit(app.exec_())
 
@@ -0,0 +1,98 @@
+"""
+参数平滑引擎
+用 (参数 × 窗口) 的二维环形缓冲区和预先计算的权重核，每帧一次性平滑所有活跃参数
+"""
+import numpy as np
+
+
+class SmoothingEngine:
+    """向量化、增量式的参数平滑"""
+
+    def __init__(self, window=5, epsilon=1e-4):
+        self.enabled = True
+        self.epsilon = epsilon
+        self.window = 1
+        self.head = 0
+        self._kernel = np.ones(1, dtype=np.float32)
+        self._ages = np.zeros(1, dtype=np.intp)
+        self.reset(np.zeros(0, dtype=np.float32))
+        self.set_window(window)
+
+    def reset(self, initial_values):
+        """按参数表的当前值重建所有缓冲区（模型加载后调用）"""
+        initial_values = np.asarray(initial_values, dtype=np.float32)
+        self.target = initial_values.copy()
+        self.output = initial_values.copy()
+        self.active = np.zeros(len(initial_values), dtype=bool)
+        self.ring = np.repeat(self.output[:, None], self.window, axis=1)
+        self.head = 0
+
+    def set_window(self, window):
+        """设置平滑窗口长度，并以当前输出值重新填充缓冲区"""
+        self.window = int(window)
+        # 越新的值权重越高：年龄为 k（0 为最新）的值权重为 (window - k) ** 1.5
+        weights = (self.window - np.arange(self.window, dtype=np.float64)) ** 1.5
+        self._kernel = (weights / weights.sum()).astype(np.float32)
+        self._ages = np.arange(self.window, dtype=np.intp)
+        self.ring = np.repeat(self.output[:, None], self.window, axis=1)
+        self.head = 0
+
+    def set_target(self, index, value):
+        """设置单个参数的目标值并将其加入活跃集合"""
+        if not self.active[index]:
+            self.ring[index, :] = self.output[index]
+            self.active[index] = True
+        self.target[index] = value
+
+    def set_targets(self, indices, values):
+        """批量设置目标值"""
+        indices = np.asarray(indices, dtype=np.intp)
+        waking = indices[~self.active[indices]]
+        if len(waking):
+            self.ring[waking, :] = self.output[waking, None]
+            self.active[waking] = True
+        self.target[indices] = values
+
+    def set_direct(self, index, value):
+        """直接设置输出值，不经过平滑窗口（用于本身已按帧采样的曲线，如口型）
+
+        缓冲区整行填充为该值，下一帧 step 即输出该值；之后改用 set_target 时从该值开始平滑
+        """
+        self.ring[index, :] = value
+        self.target[index] = value
+        self.output[index] = value
+        self.active[index] = True
+
+    def step(self):
+        """推进一帧，返回本帧输出发生变化的 (索引数组, 值数组)"""
+        rows = np.flatnonzero(self.active)
+        if not len(rows):
+            return rows, self.output[rows]
+
+        if not self.enabled:
+            # 平滑关闭时直接输出目标值
+            self.output[rows] = self.target[rows]
+            self.active[rows] = False
+            return rows, self.output[rows]
+
+        self.head = (self.head + 1) % self.window
+        targets = self.target[rows]
+        self.ring[rows, self.head] = targets
+
+        # 按各列的年龄取权重，一次矩阵乘法完成所有参数的加权平均
+        weights = self._kernel[(self.head - self._ages) % self.window]
+        smoothed = self.ring[rows] @ weights
+
+        # 输出已收敛到目标值的参数退出活跃集合
+        converged = np.abs(smoothed - targets) <= self.epsilon
+        smoothed[converged] = targets[converged]
+        self.output[rows] = smoothed
+        self.active[rows[converged]] = False
+        return rows, smoothed
+
+    @property
+    def active_count(self):
+        return int(np.count_nonzero(self.active))
+
+    def active_indices(self):
+        return np.flatnonzero(self.active)
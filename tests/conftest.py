@@ -0,0 +1,7 @@
+"""
+测试公共设置: 项目模块位于仓库根目录（平铺结构），加入导入路径
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
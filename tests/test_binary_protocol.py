@@ -0,0 +1,44 @@
+"""
+参数二进制编码测试
+"""
+import struct
+
+import numpy as np
+import pytest
+
+from binary_protocol import RECORD_DTYPE, decode_dense, decode_records, encode_values
+
+
+def test_encode_values_is_little_endian_float32():
+    assert encode_values([1.0, -2.5]) == struct.pack('<2f', 1.0, -2.5)
+
+
+def test_decode_dense_skips_nan():
+    payload = struct.pack('<4f', 0.5, float('nan'), 1.0, float('nan'))
+    indices, values = decode_dense(payload, 4)
+    assert indices.tolist() == [0, 2]
+    assert values.tolist() == [0.5, 1.0]
+    assert values.dtype == np.float32
+
+
+def test_decode_dense_rejects_wrong_length():
+    with pytest.raises(ValueError):
+        decode_dense(b'\0' * 12, 4)
+
+
+def test_decode_records_round_trip():
+    payload = struct.pack('<IfIf', 3, 0.25, 0, -1.0)
+    indices, values = decode_records(payload)
+    assert indices.tolist() == [3, 0]
+    assert values.tolist() == [0.25, -1.0]
+    assert RECORD_DTYPE.itemsize == 8
+
+
+def test_decode_records_rejects_partial_record():
+    with pytest.raises(ValueError):
+        decode_records(b'\0' * 12)
+
+
+def test_decode_empty_payloads():
+    assert decode_records(b'')[0].tolist() == []
+    assert decode_dense(b'', 0)[0].tolist() == []
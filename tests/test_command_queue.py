@@ -0,0 +1,75 @@
+"""
+帧同步命令队列测试
+"""
+import numpy as np
+import pytest
+
+from command_queue import CommandQueue
+
+
+def make_queue(size=4, generation=1):
+    queue = CommandQueue()
+    queue.reset(size, generation)
+    return queue
+
+
+def test_writes_in_one_frame_are_coalesced():
+    queue = make_queue()
+    assert queue.set_parameter(1, 2, 0.1)
+    assert queue.set_parameter(1, 2, 0.9, lock=False)
+    assert queue.set_parameters(1, [0, 1], [0.3, 0.4], lock=False)
+    assert queue.pending_count == 3
+
+    commands, indices, values, locking = queue.drain()
+    assert commands == []
+    assert indices.tolist() == [0, 1, 2]
+    assert values.tolist() == pytest.approx([0.3, 0.4, 0.9])
+    # 同一帧内任意一次写入要求锁定，则该参数锁定
+    assert locking.tolist() == [False, False, True]
+
+    _, indices, _, _ = queue.drain()
+    assert indices.tolist() == []
+    assert queue.pending_count == 0
+
+
+def test_generation_mismatch_is_rejected():
+    queue = make_queue(generation=7)
+    assert not queue.set_parameter(6, 0, 1.0)
+    assert not queue.set_parameters(8, [0], [1.0])
+    assert queue.pending_count == 0
+
+
+def test_reset_discards_pending_writes():
+    queue = make_queue()
+    queue.set_parameter(1, 0, 1.0)
+    queue.reset(2, 2)
+    assert queue.pending_count == 0
+    assert not queue.set_parameter(1, 0, 1.0)
+    assert queue.set_parameter(2, 1, 1.0)
+
+
+def test_commands_run_in_order_and_resolve_futures():
+    queue = make_queue()
+    notified = []
+    queue.listeners.append(lambda: notified.append(True))
+    calls = []
+    first = queue.submit(calls.append, 'a')
+    second = queue.submit(lambda: 1 / 0)
+    cancelled = queue.submit(calls.append, 'c')
+    cancelled.cancel()
+    assert len(notified) == 3
+
+    commands, _, _, _ = queue.drain()
+    CommandQueue.run(commands)
+    assert calls == ['a']
+    assert first.result() is None
+    with pytest.raises(ZeroDivisionError):
+        second.result()
+    assert cancelled.cancelled()
+
+
+def test_drain_returns_float32_values():
+    queue = make_queue()
+    queue.set_parameters(1, np.array([3]), np.array([0.25]))
+    _, _, values, _ = queue.drain()
+    assert values.dtype == np.float32
@@ -0,0 +1,65 @@
+"""
+自适应帧调度测试（使用可控时钟）
+"""
+from types import SimpleNamespace
+
+import pytest
+
+import frame_scheduler
+from frame_scheduler import MODE_ACTIVE, MODE_HEARTBEAT, MODE_IDLE, FrameScheduler
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(frame_scheduler, 'time', SimpleNamespace(monotonic=lambda: now[0]))
+    monkeypatch.setattr(frame_scheduler.config, 'ACTIVE_HOLD_TIME', 0.5)
+    monkeypatch.setattr(frame_scheduler.config, 'HEARTBEAT_DELAY', 10.0)
+    return now
+
+
+def test_modes_follow_activity(clock):
+    scheduler = FrameScheduler()
+    assert scheduler.frame_done(busy=True) == MODE_ACTIVE
+    clock[0] += 0.4
+    assert scheduler.frame_done(busy=False) == MODE_ACTIVE
+    clock[0] += 0.2
+    assert scheduler.frame_done(busy=False) == MODE_IDLE
+    clock[0] += 10.0
+    assert scheduler.frame_done(busy=False) == MODE_HEARTBEAT
+    scheduler.notify_activity()
+    assert scheduler.frame_done(busy=False) == MODE_ACTIVE
+    assert scheduler.frame_done(busy=True, visible=False) == MODE_HEARTBEAT
+    assert scheduler.frame_done(busy=True, has_model=False) == MODE_HEARTBEAT
+
+
+def test_wake_coalesces_until_next_frame(clock):
+    scheduler = FrameScheduler()
+    calls = []
+    scheduler.wake_callback = lambda: calls.append(True)
+    scheduler.wake()
+    assert calls == []  # 满帧模式下无需唤醒
+
+    clock[0] += 1.0
+    scheduler.frame_done(busy=False)
+    assert scheduler.mode == MODE_IDLE
+    scheduler.wake()
+    scheduler.wake()
+    assert len(calls) == 1
+    # 下一帧完成后可以再次唤醒；唤醒记为活动，回到满帧
+    assert scheduler.frame_done(busy=False) == MODE_ACTIVE
+    assert scheduler.wakeups == 1
+
+
+def test_interval_and_measured_fps(clock):
+    scheduler = FrameScheduler()
+    assert scheduler.interval_ms(MODE_ACTIVE) == max(1, int(1000 / frame_scheduler.config.FPS))
+    assert scheduler.measured_fps == 0.0
+    for _ in range(11):
+        scheduler.frame_done(busy=True)
+        clock[0] += 0.1
+    clock[0] -= 0.1
+    assert scheduler.measured_fps == pytest.approx(10.0)
+    stats = scheduler.get_stats()
+    assert stats['frames'] == 11
+    assert stats['mode_frames'][MODE_ACTIVE] == 11
@@ -0,0 +1,109 @@
+"""
+口型同步测试
+"""
+import io
+import wave
+from concurrent.futures import CancelledError
+
+import numpy as np
+import pytest
+
+import lip_sync
+from lip_sync import AudioCache, DecodedAudio, LipSyncClip, LipSyncEngine, decode_buffer, envelope, pcm_to_float
+
+
+def make_wav(samples, sample_rate=16000, channels=1):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes((np.asarray(samples) * 32767).astype('<i2').tobytes())
+    return buffer.getvalue()
+
+
+def test_pcm_to_float_widths_and_downmix():
+    assert pcm_to_float(bytes([0, 128, 255]), 1, 1).tolist() == pytest.approx([-1.0, 0.0, 127 / 128])
+    stereo = np.array([16384, -16384, 8192, 8192], dtype='<i2').tobytes()
+    assert pcm_to_float(stereo, 2, 2).tolist() == pytest.approx([0.0, 0.25])
+    assert pcm_to_float(b'\xff\xff\x7f', 3, 1).tolist() == pytest.approx([8388607 / 8388608])
+    with pytest.raises(ValueError):
+        pcm_to_float(b'\0' * 5, 5, 1)
+
+
+def test_decode_buffer_wav_and_raw_pcm():
+    audio = decode_buffer(make_wav(np.zeros(1600)))
+    assert audio.sample_rate == 16000
+    assert audio.duration == pytest.approx(0.1)
+    with pytest.raises(ValueError):
+        decode_buffer(b'\0' * 4)
+    assert len(decode_buffer(b'\0' * 4, sample_rate=8000).samples) == 2
+
+
+def test_envelope_follows_level():
+    rate = 16000
+    t = np.arange(rate) / rate
+    samples = np.where(t < 0.5, 0.0, 0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+    mouth_open, mouth_form = envelope(DecodedAudio(samples, rate), fps=50)
+    assert len(mouth_open) == 50
+    assert mouth_form is None
+    assert mouth_open[:25].max() == 0.0
+    assert mouth_open[30:].min() > 0.9
+
+    _, mouth_form = envelope(DecodedAudio(samples, rate), fps=50, mode='bands')
+    assert mouth_form.min() >= -1.0 and mouth_form.max() <= 1.0
+    assert mouth_form[:25].max() == 0.0
+
+
+def test_sample_follows_clock_and_closes_mouth():
+    engine = LipSyncEngine()
+    engine.clip = LipSyncClip(np.array([0.2, 0.6], dtype=np.float32), None, 10, 100.0, 'test')
+    assert engine.sample(99.0) is None
+    assert engine.sample(100.05) == (pytest.approx(0.2), None)
+    assert engine.sample(100.15) == (pytest.approx(0.6), None)
+    # 曲线结束时写入一次闭嘴值
+    assert engine.sample(100.25) == (0.0, None)
+    assert not engine.active
+
+
+def test_stop_discards_pending_analysis():
+    engine = LipSyncEngine()
+    engine.clip = LipSyncClip(np.ones(5, dtype=np.float32), np.zeros(5, dtype=np.float32), 10, 0.0, 'a')
+    engine.stop()
+    assert engine.sample(0.1) == (0.0, 0.0)
+    assert engine.sample(0.1) is None
+
+    # 停止后才完成的分析不再播放
+    sequence = engine._sequence
+    engine.stop()
+    with pytest.raises(CancelledError):
+        engine._analyze(sequence, lambda: DecodedAudio(np.zeros(160, np.float32), 16000), 'b', 0.0, 'rms')
+    assert engine.clip is None
+
+
+def test_submit_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        LipSyncEngine().submit(lambda: None, 'x', mode='visemes')
+
+
+def test_audio_cache_hits_and_evicts(tmp_path):
+    paths = []
+    for name in ('a.wav', 'b.wav'):
+        path = tmp_path / name
+        path.write_bytes(make_wav(np.zeros(1000)))
+        paths.append(str(path))
+    cache = AudioCache(max_bytes=6000)
+    cache.load(paths[0])
+    cache.load(paths[0])
+    cache.load(paths[1])
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (1, 2, 1)
+    assert stats['entries'] == 1
+
+
+def test_allowed_audio_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(lip_sync.config, 'MODELS_DIR', str(tmp_path))
+    inside = tmp_path / 'model' / 'voice.wav'
+    assert lip_sync.allowed_audio_path(str(inside)) == str(inside.resolve())
+    with pytest.raises(PermissionError):
+        lip_sync.allowed_audio_path(str(tmp_path.parent / 'other.wav'))
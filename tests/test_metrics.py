@@ -0,0 +1,86 @@
+"""
+Prometheus 指标测试
+"""
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+import metrics
+from frame_timing import FRAME_HISTOGRAM_BOUNDS_MS, FrameTimings
+from metrics import RequestMetrics, render_prometheus
+from smoothing_engine import SmoothingEngine
+
+
+def make_controller():
+    smoothing = SmoothingEngine()
+    smoothing.reset(np.zeros(2, dtype=np.float32))
+    smoothing.set_target(0, 1.0)
+    return SimpleNamespace(
+        scheduler=SimpleNamespace(measured_fps=59.5),
+        timings=FrameTimings(capacity=8),
+        smoothing=smoothing,
+        locked_parameters={'ParamAngleX': time.time() + 60, 'ParamAngleY': time.time() - 1},
+        load_duration=0.25,
+        load_count=3,
+    )
+
+
+def record(request_metrics, route, status, elapsed):
+    start = request_metrics.begin()
+    request_metrics.end(route, 'GET', status, start - elapsed)
+
+
+def test_requests_are_merged_across_thread_shards():
+    request_metrics = RequestMetrics()
+    threads = [threading.Thread(target=lambda: [record(request_metrics, '/a', 200, 0.0) for _ in range(10)])
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    record(request_metrics, '/a', 404, 0.0)
+
+    totals = request_metrics.snapshot()
+    assert totals.requests == {('/a', 'GET', 200): 40, ('/a', 'GET', 404): 1}
+    assert totals.in_flight == 0
+    # 已结束线程的分片在抓取时合并掉
+    assert len(request_metrics._shards) == 1
+
+
+def test_shards_are_compacted_past_threshold(monkeypatch):
+    monkeypatch.setattr(metrics, '_SHARD_COMPACT_THRESHOLD', 2)
+    request_metrics = RequestMetrics()
+    for _ in range(5):
+        thread = threading.Thread(target=record, args=(request_metrics, '/b', 200, 0.0))
+        thread.start()
+        thread.join()
+    assert len(request_metrics._shards) <= 2
+    assert request_metrics.snapshot().requests[('/b', 'GET', 200)] == 5
+
+
+def test_render_prometheus_histograms_and_gauges():
+    request_metrics = RequestMetrics(buckets=(0.01, 0.1))
+    record(request_metrics, '/x', 200, 0.005)
+    record(request_metrics, '/x', 200, 0.05)
+    record(request_metrics, '/x', 200, 1.0)
+    text = render_prometheus(request_metrics, make_controller())
+    lines = text.splitlines()
+
+    assert 'live2d_http_requests_total{route="/x",method="GET",status="200"} 3' in lines
+    assert 'live2d_http_request_duration_seconds_bucket{route="/x",method="GET",le="0.01"} 1' in lines
+    assert 'live2d_http_request_duration_seconds_bucket{route="/x",method="GET",le="0.1"} 2' in lines
+    assert 'live2d_http_request_duration_seconds_bucket{route="/x",method="GET",le="+Inf"} 3' in lines
+    assert 'live2d_http_request_duration_seconds_count{route="/x",method="GET"} 3' in lines
+    assert 'live2d_render_fps 59.5' in lines
+    assert 'live2d_smoothing_active_parameters 1' in lines
+    assert 'live2d_locked_parameters 1' in lines
+    assert 'live2d_model_loads_total 3' in lines
+    frame_buckets = [line for line in lines if line.startswith('live2d_frame_time_seconds_bucket')]
+    assert len(frame_buckets) == len(FRAME_HISTOGRAM_BOUNDS_MS) + 1
+    assert text.endswith('\n')
+
+
+def test_label_values_are_escaped():
+    assert metrics._labels(route='a"b\\c\nd') == '{route="a\\"b\\\\c\\nd"}'
@@ -0,0 +1,82 @@
+"""
+模型目录索引测试
+"""
+import json
+
+import pytest
+
+from model_catalog import ModelCatalog
+
+
+def add_model(models_dir, name, info=None):
+    model_dir = models_dir / name
+    model_dir.mkdir()
+    (model_dir / f'{name}.model3.json').write_text(json.dumps(info or {'Version': 3}), encoding='utf-8')
+    return model_dir
+
+
+@pytest.fixture
+def models_dir(tmp_path):
+    models_dir = tmp_path / 'models'
+    models_dir.mkdir()
+    for name in ('alpha', 'beta', 'gamma'):
+        add_model(models_dir, name)
+    (models_dir / 'empty').mkdir()
+    return models_dir
+
+
+def test_query_pages_filters_and_skips_models_without_json(models_dir):
+    catalog = ModelCatalog(str(models_dir))
+    total, models = catalog.query()
+    assert total == 3
+    assert sorted(model['name'] for model in models) == ['alpha', 'beta', 'gamma']
+    assert 'empty' in catalog.names()
+
+    total, models = catalog.query(name_filter='AL')
+    assert (total, [model['name'] for model in models]) == (1, ['alpha'])
+    _, models = catalog.query(offset=1, limit=1, include_info=False)
+    assert len(models) == 1 and 'info' not in models[0]
+
+
+@pytest.mark.parametrize('offset, limit, expected', [(0, -1, 0), (-2, 2, 2), (2, None, 1), (5, 2, 0)])
+def test_query_clamps_offset_and_limit(models_dir, offset, limit, expected):
+    total, models = ModelCatalog(str(models_dir)).query(offset, limit)
+    assert total == 3
+    assert len(models) == expected
+
+
+def test_refresh_is_incremental(models_dir):
+    catalog = ModelCatalog(str(models_dir))
+    catalog.query()
+    version = catalog.version
+    assert not catalog.refresh()
+    assert catalog.version == version
+
+    (models_dir / 'beta' / 'beta.model3.json').write_text(json.dumps({'Version': 3, 'Changed': True}),
+                                                          encoding='utf-8')
+    assert catalog.refresh()
+    assert catalog.get('beta')['info'] == {'Version': 3, 'Changed': True}
+
+    add_model(models_dir, 'delta')
+    assert catalog.refresh()
+    assert catalog.query()[0] == 4
+    assert catalog.version > version
+
+
+def test_cache_round_trip(models_dir, tmp_path):
+    cache_path = str(tmp_path / 'cache' / 'catalog.json')
+    ModelCatalog(str(models_dir), cache_path).query()
+
+    restored = ModelCatalog(str(models_dir), cache_path)
+    assert restored.load_cache()
+    assert sorted(restored.names()) == ['alpha', 'beta', 'empty', 'gamma']
+    # 缓存与磁盘一致时刷新不产生变化
+    assert not restored.refresh()
+
+
+def test_cache_for_other_directory_is_ignored(models_dir, tmp_path):
+    cache_path = str(tmp_path / 'catalog.json')
+    ModelCatalog(str(models_dir), cache_path).query()
+    other = tmp_path / 'other'
+    other.mkdir()
+    assert not ModelCatalog(str(other), cache_path).load_cache()
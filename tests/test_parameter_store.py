@@ -0,0 +1,78 @@
+"""
+参数表测试
+"""
+import json
+
+import numpy as np
+
+from parameter_store import ParameterStore
+
+ENTRIES = [
+    ('ParamAngleX', 0.0, -30.0, 30.0, 0.0),
+    ('ParamEyeLOpen', 1.0, 0.0, 1.0, 1.0),
+    ('ParamMouthOpenY', 0.0, 0.0, 1.0, 0.0),
+]
+
+
+def test_load_builds_index_and_arrays():
+    store = ParameterStore(ENTRIES)
+    assert len(store) == 3
+    assert store.index_of('ParamEyeLOpen') == 1
+    assert store.index_of('Missing') is None
+    assert 'ParamMouthOpenY' in store
+    assert store.value.dtype == np.float32
+    assert store.max.tolist() == [30.0, 1.0, 1.0]
+
+
+def test_clamp_uses_parameter_ranges():
+    store = ParameterStore(ENTRIES)
+    clamped = store.clamp(np.array([0, 1]), [100.0, -5.0])
+    assert clamped.tolist() == [30.0, 0.0]
+    assert store.clamp_one(2, 0.5) == 0.5
+    assert store.clamp_one(2, 2.0) == 1.0
+
+
+def test_generation_changes_on_every_load():
+    store = ParameterStore(ENTRIES)
+    first = store.generation
+    store.load(ENTRIES)
+    assert store.generation != first
+    assert store.generation < 2 ** 48
+    assert store.etag == f'params-{store.generation}'
+
+
+def test_take_dirty_skips_converged_parameters():
+    store = ParameterStore(ENTRIES)
+    indices = np.array([0, 1])
+    values = np.array([10.0, 0.5], dtype=np.float32)
+    store.value[indices] = values
+    pushed, pushed_values = store.take_dirty(indices, values, 1e-4)
+    assert pushed.tolist() == [0, 1]
+    assert pushed_values.tolist() == [10.0, 0.5]
+
+    # 相同的值不再推送
+    pushed, _ = store.take_dirty(indices, values, 1e-4)
+    assert pushed.tolist() == []
+    assert store.applied_count == 2
+
+
+def test_take_dirty_keeps_pushing_held_parameters():
+    store = ParameterStore(ENTRIES)
+    store.value[2] = 0.8
+    store.hold([2])
+    for _ in range(3):
+        pushed, values = store.take_dirty(np.array([], dtype=np.intp), np.array([], dtype=np.float32), 1e-4)
+        assert pushed.tolist() == [2]
+        assert values.tolist() == [np.float32(0.8)]
+
+
+def test_metadata_json_and_view():
+    store = ParameterStore(ENTRIES)
+    data = json.loads(store.metadata_json())
+    assert data['generation'] == store.generation
+    assert [p['id'] for p in data['parameters']] == [entry[0] for entry in ENTRIES]
+
+    view = store.view()
+    assert list(view) == store.ids
+    assert view['ParamEyeLOpen']['value'] == 1.0
+    assert view['ParamAngleX']['min'] == -30.0
@@ -0,0 +1,74 @@
+"""
+平滑引擎测试
+"""
+import numpy as np
+import pytest
+
+from smoothing_engine import SmoothingEngine
+
+
+def make_engine(size=3, window=5):
+    engine = SmoothingEngine(window=window)
+    engine.reset(np.zeros(size, dtype=np.float32))
+    return engine
+
+
+def test_kernel_weights_newest_highest():
+    engine = make_engine(window=4)
+    assert engine._kernel.sum() == pytest.approx(1.0)
+    assert list(engine._kernel) == sorted(engine._kernel, reverse=True)
+
+
+def test_step_converges_and_leaves_active_set():
+    engine = make_engine(window=5)
+    engine.set_target(1, 1.0)
+    assert engine.active_count == 1
+
+    outputs = []
+    for _ in range(5):
+        indices, values = engine.step()
+        assert indices.tolist() == [1]
+        outputs.append(float(values[0]))
+    # 输出单调逼近目标，窗口填满后收敛并退出活跃集合
+    assert outputs == sorted(outputs)
+    assert outputs[-1] == 1.0
+    assert engine.active_count == 0
+    assert engine.step()[0].tolist() == []
+
+
+def test_ring_wraparound_matches_reference_average():
+    window = 4
+    engine = make_engine(size=1, window=window)
+    history = [0.0] * window
+    for frame in range(11):
+        target = float(frame % 3)
+        engine.set_target(0, target)
+        _, values = engine.step()
+        history = history[1:] + [target]
+        weights = (window - np.arange(window)) ** 1.5
+        expected = np.dot(history[::-1], weights / weights.sum())
+        if abs(expected - target) <= engine.epsilon:
+            expected = target
+        assert float(values[0]) == pytest.approx(expected, abs=1e-5)
+
+
+def test_set_targets_batches_and_disabled_outputs_targets():
+    engine = make_engine(size=4)
+    engine.enabled = False
+    engine.set_targets([0, 2], [0.5, -0.5])
+    indices, values = engine.step()
+    assert indices.tolist() == [0, 2]
+    assert values.tolist() == [0.5, -0.5]
+    assert engine.active_count == 0
+
+
+def test_set_direct_bypasses_window():
+    engine = make_engine(window=8)
+    engine.set_direct(2, 0.7)
+    indices, values = engine.step()
+    assert indices.tolist() == [2]
+    assert values[0] == np.float32(0.7)
+    # 之后的目标值从直接写入的值开始平滑
+    engine.set_target(2, 0.0)
+    _, values = engine.step()
+    assert 0.0 < values[0] < 0.7
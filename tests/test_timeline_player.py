@@ -0,0 +1,107 @@
+"""
+关键帧时间轴测试
+"""
+import numpy as np
+import pytest
+
+from parameter_store import ParameterStore
+from timeline_player import Timeline, TimelinePlayer, bezier_ease
+
+
+@pytest.fixture
+def params():
+    return ParameterStore([
+        ('ParamAngleX', 0.0, -30.0, 30.0, 0.0),
+        ('ParamAngleY', 0.0, -30.0, 30.0, 0.0),
+        ('ParamMouthOpenY', 0.0, 0.0, 1.0, 0.0),
+    ])
+
+
+def play(params, spec, times):
+    """开始时间轴并在各时刻求值，返回 [{参数索引: 值}, ...]"""
+    player = TimelinePlayer()
+    timeline = Timeline(spec, params)
+    player.register(timeline)
+    player.start(timeline)
+    results = []
+    for now in times:
+        indices, values = player.evaluate(now, params.generation)
+        results.append(dict(zip(indices.tolist(), values.tolist())))
+    return results
+
+
+def test_linear_interpolation_across_tracks(params):
+    spec = {'tracks': {
+        'ParamAngleX': [[0, 0], [1, 10], [2, -10]],
+        'ParamAngleY': [[0, 20], [4, 0]],
+    }}
+    results = play(params, spec, [0.0, 0.5, 1.5, 2.0])
+    assert results[1] == {0: pytest.approx(5.0), 1: pytest.approx(17.5)}
+    assert results[2] == {0: pytest.approx(0.0), 1: pytest.approx(12.5)}
+    assert results[3][0] == pytest.approx(-10.0)
+
+
+def test_step_and_clamped_values(params):
+    spec = {'tracks': {'ParamMouthOpenY': [[0, 0, 'step'], [1, 5]]}}
+    results = play(params, spec, [0.0, 0.99, 1.0])
+    # 关键帧值在编译时按参数范围限制
+    assert [r[2] for r in results] == [0.0, 0.0, 1.0]
+
+
+def test_bezier_ease_endpoints_and_linear_curve():
+    u = np.array([0.0, 0.25, 0.5, 1.0])
+    linear = np.tile([0.0, 0.0, 1.0, 1.0], (4, 1))
+    assert bezier_ease(u, linear) == pytest.approx(u, abs=1e-4)
+    ease_in = np.tile([0.42, 0.0, 1.0, 1.0], (4, 1))
+    eased = bezier_ease(u, ease_in)
+    assert eased[0] == pytest.approx(0.0, abs=1e-4) and eased[-1] == pytest.approx(1.0, abs=1e-4)
+    assert eased[1] < 0.25
+
+
+def test_loop_wraps_and_finished_timeline_stops(params):
+    looping = {'tracks': {'ParamAngleX': [[0, 0], [1, 10]]}, 'loop': True}
+    results = play(params, looping, [0.0, 1.25])
+    assert results[1][0] == pytest.approx(2.5)
+
+    once = {'tracks': {'ParamAngleX': [[0, 0], [1, 10]]}}
+    results = play(params, once, [0.0, 2.0, 3.0])
+    assert results[1][0] == pytest.approx(10.0)
+    assert results[2] == {}
+
+
+def test_later_timeline_wins_and_weight_scales(params):
+    player = TimelinePlayer()
+    first = Timeline({'tracks': {'ParamAngleX': [[0, 10]], 'ParamAngleY': [[0, 10]]}}, params)
+    second = Timeline({'tracks': {'ParamAngleX': [[0, 24]]}, 'weight': 0.5}, params)
+    for timeline in (first, second):
+        player.register(timeline)
+        player.start(timeline)
+    indices, values = player.evaluate(0.0, params.generation)
+    assert dict(zip(indices.tolist(), values.tolist())) == {0: pytest.approx(12.0), 1: pytest.approx(10.0)}
+
+
+def test_generation_change_stops_timelines(params):
+    player = TimelinePlayer()
+    timeline = Timeline({'tracks': {'ParamAngleX': [[0, 1]]}}, params)
+    player.register(timeline)
+    player.start(timeline)
+    indices, _ = player.evaluate(0.0, params.generation + 1)
+    assert indices.tolist() == []
+    assert timeline.status == 'stopped'
+
+
+@pytest.mark.parametrize('spec', [
+    {'tracks': {}},
+    {'tracks': {'Missing': [[0, 1]]}},
+    {'tracks': {'ParamAngleX': [[-1, 1]]}},
+    {'tracks': {'ParamAngleX': [[0, float('nan')]]}},
+    {'tracks': {'ParamAngleX': [[float('inf'), 1]]}},
+    {'tracks': {'ParamAngleX': [[0, 1, 'cubic']]}},
+    {'tracks': {'ParamAngleX': [{'time': 0, 'value': 1, 'ease': [2, 0, 1, 1]}]}},
+    {'tracks': {'ParamAngleX': [[0, 1]]}, 'speed': 0},
+    {'tracks': {'ParamAngleX': [[0, 1]]}, 'weight': float('nan')},
+    {'tracks': {'ParamAngleX': [[0, 1]]}, 'loop': True},
+])
+def test_invalid_specs_raise_value_error(params, spec):
+    with pytest.raises(ValueError):
+        Timeline(spec, params)
@@ -0,0 +1,117 @@
+"""
+UDP 追踪数据解析测试（不打开套接字）
+"""
+import struct
+
+import pytest
+
+from parameter_store import ParameterStore
+from udp_listener import PACKET_MAGIC, TrackingListener, iter_osc_messages, parse_osc_message
+
+
+def osc_string(value):
+    data = value.encode('utf-8') + b'\0'
+    return data + b'\0' * (-len(data) % 4)
+
+
+def osc_message(address, *args):
+    tags = ','
+    payload = b''
+    for arg in args:
+        if isinstance(arg, bool):
+            tags += 'T' if arg else 'F'
+        elif isinstance(arg, int):
+            tags += 'i'
+            payload += struct.pack('>i', arg)
+        elif isinstance(arg, float):
+            tags += 'f'
+            payload += struct.pack('>f', arg)
+        else:
+            tags += 's'
+            payload += osc_string(arg)
+    return osc_string(address) + osc_string(tags) + payload
+
+
+def osc_bundle(timetag, *elements):
+    data = b'#bundle\0' + struct.pack('>Q', timetag)
+    for element in elements:
+        data += struct.pack('>i', len(element)) + element
+    return data
+
+
+class FakeController:
+    def __init__(self):
+        self.params = ParameterStore([
+            ('ParamAngleX', 0.0, -30.0, 30.0, 0.0),
+            ('ParamMouthOpenY', 0.0, 0.0, 1.0, 0.0),
+        ])
+        self.writes = []
+
+    def set_parameters_by_index(self, indices, values):
+        self.writes.append((indices.tolist(), values.tolist()))
+
+
+@pytest.fixture
+def listener():
+    return TrackingListener(FakeController(), '127.0.0.1', 0)
+
+
+def test_parse_osc_message_types():
+    address, args = parse_osc_message(osc_message('/live2d/param', 'ParamAngleX', 1.5, 7, True, False))
+    assert address == '/live2d/param'
+    assert args == ['ParamAngleX', 1.5, 7, True, False]
+
+
+def test_parse_osc_message_rejects_unknown_type():
+    message = osc_string('/x') + osc_string(',d') + b'\0' * 8
+    with pytest.raises(ValueError):
+        parse_osc_message(message)
+
+
+def test_iter_osc_messages_flattens_nested_bundles():
+    first = osc_message('/a', 1.0)
+    second = osc_message('/b', 2.0)
+    data = osc_bundle(5, first, osc_bundle(1, second))
+    assert list(iter_osc_messages(data)) == [first, second]
+    assert list(iter_osc_messages(first)) == [first]
+
+
+def test_osc_bundle_applies_named_and_indexed_parameters(listener):
+    data = osc_bundle(10,
+                      osc_message('/VMC/Ext/Blend/Val', 'ParamAngleX', 12.0),
+                      osc_message('/live2d/param', 1, 0.5),
+                      osc_message('/VMC/Ext/Blend/Val', 'Unknown', 1.0))
+    listener.handle_packet(data, ('127.0.0.1', 9000))
+    assert listener.controller.writes == [([0, 1], [12.0, 0.5])]
+    assert listener.accepted == 1
+
+
+def test_stale_bundle_timetag_is_dropped(listener):
+    sender = ('127.0.0.1', 9000)
+    listener.handle_packet(osc_bundle(10, osc_message('/live2d/param', 0, 1.0)), sender)
+    listener.handle_packet(osc_bundle(9, osc_message('/live2d/param', 0, 2.0)), sender)
+    listener.handle_packet(osc_bundle(10, osc_message('/live2d/param', 0, 3.0)), sender)
+    assert listener.dropped_stale == 2
+    # 时间标签 1（立即执行）不参与排序
+    listener.handle_packet(osc_bundle(1, osc_message('/live2d/param', 0, 4.0)), sender)
+    assert [values for _, values in listener.controller.writes] == [[1.0], [4.0]]
+
+
+def test_binary_packet_sequence_wraps_around(listener):
+    sender = ('127.0.0.1', 9001)
+
+    def packet(sequence, value):
+        return PACKET_MAGIC + struct.pack('<IIf', sequence, 1, value)
+
+    listener.handle_packet(packet(0xFFFFFFFF, 0.1), sender)
+    listener.handle_packet(packet(0, 0.2), sender)
+    listener.handle_packet(packet(0xFFFFFFFE, 0.3), sender)
+    assert [values for _, values in listener.controller.writes] == [[pytest.approx(0.1)], [pytest.approx(0.2)]]
+    assert listener.dropped_stale == 1
+
+
+def test_malformed_packet_counts_as_invalid(listener):
+    listener.handle_packet(PACKET_MAGIC + b'\0' * 7, ('127.0.0.1', 9002))
+    listener.handle_packet(b'/truncated', ('127.0.0.1', 9002))
+    assert listener.dropped_invalid == 2
+    assert listener.controller.writes == []
@@ -0,0 +1,325 @@
+"""
+服务端关键帧时间轴
+客户端一次上传整个动作（每个参数一条关键帧曲线，线性/贝塞尔/阶跃插值，可循环），渲染线程每帧对所有
+活跃时间轴的全部轨道做一次向量化求值: 所有轨道的关键帧拼接为一个按轨道偏移的有序数组，一次 searchsorted 定位区间，
+再按插值类型批量计算；结果作为平滑目标写入，与平滑和参数锁定机制共用同一条路径
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from config import config
+
+# 区间插值类型（取区间起点关键帧的设置）
+STEP = 0
+LINEAR = 1
+BEZIER = 2
+
+# 插值名称 -> (类型, 默认缓动控制点 x1, y1, x2, y2)
+INTERPOLATIONS = {
+    'step': (STEP, None),
+    'linear': (LINEAR, None),
+    'bezier': (BEZIER, (0.42, 0.0, 0.58, 1.0)),
+    'ease': (BEZIER, (0.25, 0.1, 0.25, 1.0)),
+    'ease_in': (BEZIER, (0.42, 0.0, 1.0, 1.0)),
+    'ease_out': (BEZIER, (0.0, 0.0, 0.58, 1.0)),
+    'ease_in_out': (BEZIER, (0.42, 0.0, 0.58, 1.0)),
+}
+
+# 贝塞尔缓动反解 x(s) = u 的二分次数（误差约 1.5e-5）
+_BEZIER_ITERATIONS = 16
+
+_ids = itertools.count(1)
+
+
+def bezier_ease(u, ease):
+    """三次贝塞尔缓动（与 CSS cubic-bezier 相同），u 与 ease 的每一行一一对应"""
+    x1, y1, x2, y2 = ease[:, 0], ease[:, 1], ease[:, 2], ease[:, 3]
+    lo = np.zeros_like(u)
+    hi = np.ones_like(u)
+    for _ in range(_BEZIER_ITERATIONS):
+        s = (lo + hi) * 0.5
+        r = 1.0 - s
+        x = 3.0 * r * r * s * x1 + 3.0 * r * s * s * x2 + s * s * s
+        below = x < u
+        lo = np.where(below, s, lo)
+        hi = np.where(below, hi, s)
+    s = (lo + hi) * 0.5
+    r = 1.0 - s
+    return 3.0 * r * r * s * y1 + 3.0 * r * s * s * y2 + s * s * s
+
+
+def _parse_keyframe(keyframe):
+    """关键帧: {"time", "value", "interp", "ease"} 或简写 [time, value(, interp)]"""
+    if isinstance(keyframe, (list, tuple)):
+        if len(keyframe) not in (2, 3):
+            raise ValueError(f'关键帧格式错误: {keyframe}')
+        keyframe = {'time': keyframe[0], 'value': keyframe[1],
+                    'interp': keyframe[2] if len(keyframe) == 3 else 'linear'}
+    elif not isinstance(keyframe, dict):
+        raise ValueError(f'关键帧格式错误: {keyframe}')
+
+    t = float(keyframe.get('time', keyframe.get('t', 0.0)))
+    if keyframe.get('value') is None:
+        raise ValueError('关键帧缺少value')
+    value = float(keyframe['value'])
+    # JSON 中的 NaN/Infinity 会破坏 searchsorted 的有序前提，或直接成为参数目标值
+    if not np.isfinite((t, value)).all():
+        raise ValueError('关键帧的time和value必须是有限数')
+    if t < 0:
+        raise ValueError('关键帧时间不能为负')
+    interp_name = keyframe.get('interp', 'linear')
+    if interp_name not in INTERPOLATIONS:
+        raise ValueError(f'未知的插值类型: {interp_name}（可选: {", ".join(INTERPOLATIONS)}）')
+    interp, ease = INTERPOLATIONS[interp_name]
+    if keyframe.get('ease') is not None:
+        ease = tuple(float(c) for c in keyframe['ease'])
+        if (len(ease) != 4 or not np.isfinite(ease).all()
+                or not (0.0 <= ease[0] <= 1.0 and 0.0 <= ease[2] <= 1.0)):
+            raise ValueError('ease 应为 [x1, y1, x2, y2]，x1/x2 在 0~1 之间')
+        interp = BEZIER
+    return t, value, interp, ease or (0.0, 0.0, 1.0, 1.0)
+
+
+class Timeline:
+    """一个已编译的时间轴（构建后只读，播放状态由渲染线程更新）"""
+
+    def __init__(self, spec, params):
+        tracks = spec.get('tracks')
+        if not isinstance(tracks, dict) or not tracks:
+            raise ValueError('tracks必须是非空字典: {参数名: [关键帧, ...]}')
+
+        self.id = next(_ids)
+        self.name = spec.get('name')
+        self.generation = params.generation
+        self.loop = bool(spec.get('loop', False))
+        self.weight = float(spec.get('weight', 1.0))
+        self.speed = float(spec.get('speed', 1.0))
+        if not np.isfinite((self.weight, self.speed)).all():
+            raise ValueError('weight和speed必须是有限数')
+        if self.speed <= 0:
+            raise ValueError('speed必须大于0')
+
+        self.parameters = []
+        indices, times, values, interps, eases, lengths = [], [], [], [], [], []
+        for param_name, keyframes in tracks.items():
+            index = params.index_of(param_name)
+            if index is None:
+                raise ValueError(f'参数不存在: {param_name}')
+            if not isinstance(keyframes, list) or not keyframes:
+                raise ValueError(f'参数 {param_name} 的关键帧列表为空')
+            parsed = sorted((_parse_keyframe(k) for k in keyframes), key=lambda k: k[0])
+            self.parameters.append(param_name)
+            indices.append(index)
+            lengths.append(len(parsed))
+            for t, value, interp, ease in parsed:
+                times.append(t)
+                values.append(value)
+                interps.append(interp)
+                eases.append(ease)
+        if len(times) > config.TIMELINE_MAX_KEYFRAMES:
+            raise ValueError(f'关键帧数量超过上限 {config.TIMELINE_MAX_KEYFRAMES}')
+
+        self.indices = np.asarray(indices, dtype=np.intp)
+        self.lengths = np.asarray(lengths, dtype=np.intp)
+        self.times = np.asarray(times, dtype=np.float64)
+        # 关键帧值在编译时按参数范围限制
+        track_of_key = np.repeat(self.indices, self.lengths)
+        self.values = params.clamp(track_of_key, values).astype(np.float64)
+        self.interps = np.asarray(interps, dtype=np.int8)
+        self.eases = np.asarray(eases, dtype=np.float64).reshape(-1, 4)
+
+        duration = spec.get('duration')
+        self.duration = float(duration) if duration is not None else float(self.times.max())
+        if not np.isfinite(self.duration):
+            raise ValueError('duration必须是有限数')
+        if self.duration < 0 or (self.loop and self.duration <= 0):
+            raise ValueError('循环播放的时间轴需要大于0的duration')
+        # 按参数默认值缩放幅度时使用
+        self.defaults = params.default[self.indices].astype(np.float64)
+
+        self.status = 'pending'
+        self.created_at = time.time()
+        self.started_at = None   # 渲染线程第一次求值时的 perf_counter
+        self.elapsed = 0.0
+        self.finished_at = None
+
+    def local_time(self, now):
+        """当前时刻在时间轴内的位置（秒），并返回是否已播放完毕"""
+        if self.started_at is None:
+            self.started_at = now
+            self.status = 'playing'
+        self.elapsed = (now - self.started_at) * self.speed
+        if self.loop:
+            return self.elapsed % self.duration, False
+        if self.elapsed >= self.duration:
+            return self.duration, True
+        return self.elapsed, False
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'parameters': self.parameters,
+            'keyframes': int(self.lengths.sum()),
+            'duration': self.duration,
+            'loop': self.loop,
+            'speed': self.speed,
+            'weight': self.weight,
+            'elapsed': round(self.elapsed, 4),
+            'loops': int(self.elapsed // self.duration) if self.loop else 0,
+            'progress': round(min(self.elapsed / self.duration, 1.0), 4) if self.duration > 0 and not self.loop else None,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at
+        }
+
+
+class TimelinePlayer:
+    """所有活跃时间轴的向量化求值
+
+    register 在 API 线程调用，start / cancel / clear / evaluate 只在渲染线程调用（经命令队列）
+    """
+
+    def __init__(self):
+        self.timelines = OrderedDict()   # {id: Timeline}，包含已结束的（供查询）
+        self._lock = threading.Lock()
+        self._active = []                # 按开始顺序排列，后开始的覆盖先开始的同名参数
+        self._dirty = True
+        self.evaluations = 0
+        self.last_track_count = 0
+
+    @property
+    def active_count(self):
+        return len(self._active)
+
+    def register(self, timeline):
+        """登记新时间轴并裁剪已结束的历史记录"""
+        with self._lock:
+            self.timelines[timeline.id] = timeline
+            finished = [tid for tid, t in self.timelines.items() if t.finished_at is not None]
+            for tid in finished[:max(0, len(finished) - config.TIMELINE_HISTORY)]:
+                del self.timelines[tid]
+
+    def get(self, timeline_id):
+        return self.timelines.get(timeline_id)
+
+    def all_timelines(self):
+        with self._lock:
+            return list(self.timelines.values())
+
+    def start(self, timeline):
+        if timeline.status != 'pending':
+            return False
+        self._active.append(timeline)
+        while len(self._active) > config.TIMELINE_MAX_ACTIVE:
+            self._stop(self._active[0], 'cancelled')
+        self._dirty = True
+        return True
+
+    def cancel(self, timeline_id):
+        timeline = self.timelines.get(timeline_id)
+        if timeline is None or timeline.finished_at is not None:
+            return False
+        if timeline in self._active:
+            self._stop(timeline, 'cancelled')
+        else:
+            # 尚在命令队列中，开始时会被跳过
+            timeline.status = 'cancelled'
+            timeline.finished_at = time.time()
+        return True
+
+    def clear(self, status='stopped'):
+        """参数表重建时停止所有时间轴"""
+        for timeline in list(self._active):
+            self._stop(timeline, status)
+
+    def _stop(self, timeline, status):
+        self._active.remove(timeline)
+        timeline.status = status
+        timeline.finished_at = time.time()
+        self._dirty = True
+
+    def _rebuild(self):
+        """把所有活跃时间轴的轨道拼接为一组数组"""
+        active = self._active
+        self._dirty = False
+        if not active:
+            self._tracks = 0
+            return
+        lengths = np.concatenate([t.lengths for t in active])
+        self._tracks = len(lengths)
+        self._track_timeline = np.repeat(np.arange(len(active)), [len(t.lengths) for t in active])
+        self._track_param = np.concatenate([t.indices for t in active])
+        self._track_default = np.concatenate([t.defaults for t in active])
+        self._track_weight = np.concatenate([np.full(len(t.lengths), t.weight) for t in active])
+        self._first = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        self._last = self._first + lengths - 1
+
+        self._times = np.concatenate([t.times for t in active])
+        self._values = np.concatenate([t.values for t in active])
+        self._interps = np.concatenate([t.interps for t in active])
+        self._eases = np.concatenate([t.eases for t in active])
+        # 每条轨道的关键帧时间加上轨道偏移后整体有序，一次 searchsorted 即可定位所有轨道的区间
+        stride = float(self._times.max()) + 1.0
+        self._track_base = np.arange(self._tracks, dtype=np.float64) * stride
+        self._keys = self._times + np.repeat(self._track_base, lengths)
+
+    def evaluate(self, now, generation):
+        """求值所有活跃时间轴，返回 (参数索引数组, 值数组)；同一参数只保留最后开始的时间轴的值"""
+        for timeline in [t for t in self._active if t.generation != generation]:
+            self._stop(timeline, 'stopped')
+        if not self._active:
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.float32)
+        if self._dirty:
+            self._rebuild()
+
+        local = np.empty(len(self._active))
+        finished = []
+        for i, timeline in enumerate(self._active):
+            local[i], done = timeline.local_time(now)
+            if done:
+                finished.append(timeline)
+
+        track_local = local[self._track_timeline]
+        seg = np.searchsorted(self._keys, self._track_base + track_local, side='right') - 1
+        seg = np.clip(seg, self._first, np.maximum(self._last - 1, self._first))
+        nxt = np.minimum(seg + 1, self._last)
+
+        t0 = self._times[seg]
+        span = self._times[nxt] - t0
+        u = np.clip(np.divide(track_local - t0, span, out=np.ones_like(span), where=span > 0), 0.0, 1.0)
+        interp = self._interps[seg]
+        # 阶跃: 到达下一个关键帧之前保持起点值
+        u = np.where(interp == STEP, (track_local >= self._times[nxt]).astype(np.float64), u)
+        bezier = interp == BEZIER
+        if bezier.any():
+            u[bezier] = bezier_ease(u[bezier], self._eases[seg[bezier]])
+
+        v0 = self._values[seg]
+        values = v0 + (self._values[nxt] - v0) * u
+        values = self._track_default + (values - self._track_default) * self._track_weight
+
+        indices = self._track_param
+        if len(np.unique(indices)) != len(indices):
+            # 倒序取唯一值得到每个参数最后一次出现的位置
+            _, last = np.unique(indices[::-1], return_index=True)
+            keep = np.sort(len(indices) - 1 - last)
+            indices, values = indices[keep], values[keep]
+
+        for timeline in finished:
+            self._stop(timeline, 'finished')
+        self.evaluations += 1
+        self.last_track_count = self._tracks
+        return indices, values.astype(np.float32)
+
+    def get_stats(self):
+        return {
+            'active': self.active_count,
+            'tracks': self.last_track_count,
+            'evaluations': self.evaluations,
+            'max_active': config.TIMELINE_MAX_ACTIVE
+        }
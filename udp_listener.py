@@ -0,0 +1,222 @@
+"""
+UDP 低延迟追踪数据监听
+面向面部追踪数据源：无需请求/响应，丢一个样本好过晚到一个样本
+
+支持的数据包:
+- 紧凑二进制: b'L2DP' + uint32 序列号（小端）+ 若干 (uint32 索引, float32 值) 记录
+- OSC 消息/包（VMC 风格）:
+    /VMC/Ext/Blend/Val  s(参数ID) f(值)
+    /live2d/param       s(参数ID) 或 i(参数索引), f(值)
+  OSC 包（#bundle）以时间标签作为序列号
+序列号不大于同一发送端上一个包的数据包视为过期或乱序，直接丢弃
+"""
+import socket
+import struct
+import threading
+import time
+
+import numpy as np
+
+from config import config
+import binary_protocol
+from log_utils import get_logger
+
+logger = get_logger('UDP')
+
+PACKET_MAGIC = b'L2DP'
+_HEADER = struct.Struct('<4sI')
+_OSC_IMMEDIATE = 1  # OSC 时间标签 1 表示“立即执行”，不参与排序
+
+
+def _read_osc_string(data, offset):
+    end = data.index(b'\0', offset)
+    value = data[offset:end].decode('utf-8')
+    # 字符串以 \0 结尾并按4字节对齐
+    return value, (end + 4) & ~3
+
+
+def parse_osc_message(data):
+    """解析单条 OSC 消息，返回 (地址, 参数列表)"""
+    address, offset = _read_osc_string(data, 0)
+    tags, offset = _read_osc_string(data, offset)
+    args = []
+    for tag in tags[1:]:
+        if tag == 'f':
+            args.append(struct.unpack_from('>f', data, offset)[0])
+            offset += 4
+        elif tag == 'i':
+            args.append(struct.unpack_from('>i', data, offset)[0])
+            offset += 4
+        elif tag == 's':
+            value, offset = _read_osc_string(data, offset)
+            args.append(value)
+        elif tag in 'TF':
+            args.append(tag == 'T')
+        else:
+            raise ValueError(f'不支持的OSC类型: {tag}')
+    return address, args
+
+
+def iter_osc_messages(data):
+    """展开 OSC 包，逐条产生消息数据"""
+    if data.startswith(b'#bundle\0'):
+        offset = 16  # '#bundle\0' + 8字节时间标签
+        while offset < len(data):
+            size = struct.unpack_from('>i', data, offset)[0]
+            offset += 4
+            yield from iter_osc_messages(data[offset:offset + size])
+            offset += size
+    else:
+        yield data
+
+
+class TrackingListener:
+    """UDP 追踪数据监听器"""
+
+    def __init__(self, controller, host, port):
+        self.controller = controller
+        self.host = host
+        self.port = port
+        self.running = False
+        self.sock = None
+        self._senders = {}  # {地址: (最后序列号, 最后接收时间)}
+
+        # 统计
+        self.packets = 0
+        self.accepted = 0
+        self.dropped_stale = 0
+        self.dropped_invalid = 0
+        self._window_start = time.time()
+        self._window_packets = 0
+        self._window_dropped = 0
+        self.packet_rate = 0.0
+        self.drop_rate = 0.0
+
+    def get_stats(self):
+        """获取收包速率和丢包率"""
+        self._roll_window(time.time())
+        return {
+            'address': f"udp://{self.host}:{self.port}",
+            'packets': self.packets,
+            'accepted': self.accepted,
+            'dropped_stale': self.dropped_stale,
+            'dropped_invalid': self.dropped_invalid,
+            'packets_per_second': self.packet_rate,
+            'drop_rate': self.drop_rate
+        }
+
+    def _count(self, dropped):
+        """更新计数，每秒滚动一次速率"""
+        self.packets += 1
+        self._window_packets += 1
+        if dropped:
+            self._window_dropped += 1
+        self._roll_window(time.time())
+
+    def _roll_window(self, now):
+        elapsed = now - self._window_start
+        if elapsed >= 1.0:
+            self.packet_rate = self._window_packets / elapsed
+            self.drop_rate = self._window_dropped / self._window_packets if self._window_packets else 0.0
+            self._window_start = now
+            self._window_packets = 0
+            self._window_dropped = 0
+
+    def _is_fresh(self, sender, sequence, bits):
+        """按序列号判断数据包是否比该发送端上一个包更新（支持回绕）"""
+        now = time.time()
+        last = self._senders.get(sender)
+        if last is not None and now - last[1] < config.UDP_SENDER_TIMEOUT:
+            diff = (sequence - last[0]) % (1 << bits)
+            if diff == 0 or diff >= (1 << (bits - 1)):
+                return False
+        # 发送端长时间无数据时视为重启，重新开始计数
+        self._senders[sender] = (sequence, now)
+        return True
+
+    def _decode_binary(self, data):
+        sequence = _HEADER.unpack_from(data)[1]
+        indices, values = binary_protocol.decode_records(data[_HEADER.size:])
+        return sequence, 32, indices, values
+
+    def _decode_osc(self, data):
+        sequence = None
+        if data.startswith(b'#bundle\0'):
+            timetag = struct.unpack_from('>Q', data, 8)[0]
+            if timetag != _OSC_IMMEDIATE:
+                sequence = timetag
+
+        index = self.controller.params.index
+        indices, values = [], []
+        for message in iter_osc_messages(data):
+            address, args = parse_osc_message(message)
+            if address in ('/VMC/Ext/Blend/Val', '/live2d/param') and len(args) >= 2:
+                target = args[0]
+                param_index = target if isinstance(target, int) else index.get(target)
+                if param_index is not None:
+                    indices.append(param_index)
+                    values.append(float(args[1]))
+        return sequence, 64, np.asarray(indices, dtype=np.intp), np.asarray(values, dtype=np.float32)
+
+    def handle_packet(self, data, sender):
+        """处理单个数据包"""
+        try:
+            if data.startswith(PACKET_MAGIC):
+                sequence, bits, indices, values = self._decode_binary(data)
+            else:
+                sequence, bits, indices, values = self._decode_osc(data)
+        except Exception:
+            self.dropped_invalid += 1
+            self._count(dropped=True)
+            return
+
+        if sequence is not None and not self._is_fresh(sender, sequence, bits):
+            self.dropped_stale += 1
+            self._count(dropped=True)
+            return
+
+        try:
+            if len(indices):
+                self.controller.set_parameters_by_index(indices, values)
+            self.accepted += 1
+            self._count(dropped=False)
+        except ValueError:
+            self.dropped_invalid += 1
+            self._count(dropped=True)
+
+    def run(self):
+        """接收循环（阻塞）"""
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # 较小的接收缓冲区，避免积压过期样本
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, config.UDP_RECEIVE_BUFFER)
+        self.sock.bind((self.host, self.port))
+        self.sock.settimeout(0.5)
+        self.running = True
+        logger.info("追踪数据监听已启动: udp://%s:%s", self.host, self.port)
+
+        while self.running:
+            try:
+                data, sender = self.sock.recvfrom(65535)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            self.handle_packet(data, sender)
+
+        self.sock.close()
+
+    def stop(self):
+        self.running = False
+
+
+# 当前运行的监听实例（供API查询状态）
+tracking_listener = None
+
+def start_udp_listener_thread(controller):
+    """在后台线程中启动 UDP 追踪数据监听"""
+    global tracking_listener
+    tracking_listener = TrackingListener(controller, config.UDP_HOST, config.UDP_PORT)
+
+    udp_thread = threading.Thread(target=tracking_listener.run, daemon=True)
+    udp_thread.start()
+    return udp_thread
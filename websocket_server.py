@@ -0,0 +1,135 @@
+"""
+WebSocket 参数流通道
+为口型同步、面部追踪等连续控制场景提供常驻连接，每条消息直接写入控制器的命令队列，无需HTTP请求/响应开销
+
+消息格式:
+- 文本(JSON): {"parameters": {"ParamAngleX": 10.0, ...}} 或 {"indices": [0, 3], "values": [10.0, 0.5]}
+  可选 "generation" 字段，与当前参数表代号不一致时丢弃
+- 二进制: 默认为 (uint32 索引, float32 值) 记录；连接地址带 ?layout=dense 时为稠密 float32 数组
+"""
+import asyncio
+import json
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+
+from config import config
+import binary_protocol
+from log_utils import get_logger
+
+logger = get_logger('WebSocket')
+
+# 尝试导入websockets库
+try:
+    import websockets
+    WEBSOCKETS_AVAILABLE = True
+except ImportError as e:
+    WEBSOCKETS_AVAILABLE = False
+    logger.warning("警告: websockets库未安装 - %s", e)
+
+
+class ParameterStreamServer:
+    """接收参数帧的 WebSocket 服务"""
+
+    def __init__(self, controller, host, port):
+        self.controller = controller
+        self.host = host
+        self.port = port
+        self.clients = 0
+        self.messages = 0
+        self.errors = 0
+        self.started_at = None
+
+    def get_stats(self):
+        """获取连接和消息统计"""
+        elapsed = time.time() - self.started_at if self.started_at else 0.0
+        return {
+            'url': f"ws://{self.host}:{self.port}/",
+            'clients': self.clients,
+            'messages': self.messages,
+            'errors': self.errors,
+            'messages_per_second': self.messages / elapsed if elapsed > 0 else 0.0
+        }
+
+    def _apply_json(self, message):
+        data = json.loads(message)
+        params = self.controller.params
+        generation = data.get('generation')
+
+        if 'parameters' in data:
+            index = params.index
+            names = data['parameters']
+            unknown = [name for name in names if name not in index]
+            if unknown:
+                raise ValueError(f'参数不存在: {unknown}')
+            indices = [index[name] for name in names]
+            values = list(names.values())
+        else:
+            indices = data.get('indices', [])
+            values = data.get('values', [])
+            if len(indices) != len(values):
+                raise ValueError('indices与values长度不一致')
+
+        return self.controller.set_parameters_by_index(indices, values, generation)
+
+    def _apply_binary(self, message, dense):
+        if dense:
+            indices, values = binary_protocol.decode_dense(message, len(self.controller.params))
+        else:
+            indices, values = binary_protocol.decode_records(message)
+        return self.controller.set_parameters_by_index(indices, values)
+
+    async def _handle(self, websocket, path=None):
+        """处理单个客户端连接"""
+        if path is None:
+            # websockets >= 10.1 不再传入 path
+            request = getattr(websocket, 'request', None)
+            path = request.path if request is not None else getattr(websocket, 'path', '/')
+        dense = parse_qs(urlparse(path).query).get('layout', ['indexed'])[0] == 'dense'
+
+        self.clients += 1
+        try:
+            async for message in websocket:
+                self.messages += 1
+                try:
+                    if isinstance(message, bytes):
+                        self._apply_binary(message, dense)
+                    else:
+                        self._apply_json(message)
+                except Exception as e:
+                    # 出错时才回复，正常消息不产生任何响应
+                    self.errors += 1
+                    await websocket.send(json.dumps({'success': False, 'error': str(e)}, ensure_ascii=False))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.clients -= 1
+
+    async def _serve(self):
+        async with websockets.serve(self._handle, self.host, self.port,
+                                    compression=None, max_size=config.WEBSOCKET_MAX_MESSAGE_SIZE):
+            self.started_at = time.time()
+            logger.info("参数流服务已启动: ws://%s:%s/", self.host, self.port)
+            await asyncio.Future()
+
+    def run(self):
+        """在当前线程运行事件循环（阻塞）"""
+        asyncio.run(self._serve())
+
+
+# 当前运行的服务实例（供API查询状态）
+stream_server = None
+
+def start_websocket_server_thread(controller):
+    """在后台线程中启动 WebSocket 参数流服务"""
+    global stream_server
+    if not WEBSOCKETS_AVAILABLE:
+        logger.warning("websockets库不可用，参数流服务未启动")
+        return None
+
+    port = config.WEBSOCKET_PORT or config.find_available_port(start_port=config.API_PORT + 1)
+    stream_server = ParameterStreamServer(controller, config.API_HOST, port)
+
+    ws_thread = threading.Thread(target=stream_server.run, daemon=True)
+    ws_thread.start()
+    return ws_thread